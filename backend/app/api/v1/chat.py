@@ -1,66 +1,138 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends, Query
 from sqlalchemy.orm import Session
 from sse_starlette.sse import EventSourceResponse
+from starlette.background import BackgroundTask
 from typing import AsyncGenerator
 import logging
 import random
+import re
 
 from fastapi import HTTPException
 
 from app.schemas.chat import ChatRequest, ChatResponse
-from app.services.rag_service import answer_question, build_prompt
-from app.services.vector_service import retrieve_with_sources
-from app.services.llm_service import get_chat_llm_streaming
-from app.repositories.message_repo import get_messages_by_session, create_message
+from app.services.rag_service import (
+    answer_question,
+    build_prompt,
+    coalesce_key,
+    join_stream,
+    lookup_cached_answer,
+    remember_answer,
+    scope_generation,
+    shared_query_embedding,
+)
+from app.services.vector_service import (
+    hydrate_source_refs,
+    resolve_document_ids,
+    retrieve_with_sources,
+)
+from app.services.memory_service import load_conversation_memory, refresh_conversation_memory
+from app.services.llm_service import ROLE_CHAT, astream_hedged, cooldown_remaining
+from app.core.config import settings
+from app.repositories.message_repo import get_messages_by_session, get_messages_page, create_message
 from app.repositories.session_repo import list_sessions, delete_session, get_session_summary
 from app.api.v1.deps import get_db
+from app.db.session import SessionLocal
 from app.utils.rate_limit import is_rate_limit_error, extract_wait_seconds_from_error
+from app.utils.pagination import decode_cursor, encode_cursor
+from datetime import datetime
 import asyncio
 import json
+import uuid
 
 
 router = APIRouter()
 
 
-def _load_conversation_history(db: Session, session_id: str, limit: int = 20) -> list[dict]:
-    """Load conversation history for a session."""
-    history_messages = get_messages_by_session(db, session_id, limit=limit)
-    return [
-        {"role": msg.role, "content": msg.content}
-        for msg in history_messages
-    ]
+def _load_conversation_history(db: Session, session_id: str, exclude_id: str | None = None) -> list[dict]:
+    """Load conversation history for a session (rolling summary + recent turns), minus exclude_id."""
+    return load_conversation_memory(db, session_id, exclude_id=exclude_id)
+
+
+# Fields returned by GET /chat/messages/{session_id}; select a subset with ?fields=
+_MESSAGE_FIELDS = ("id", "role", "content", "sources", "timestamp")
 
 
 @router.get("/chat/messages/{session_id}")
-async def get_chat_messages(session_id: str, db: Session = Depends(get_db)):
-    """Get all messages for a session."""
-    messages = get_messages_by_session(db, session_id)
-    return {
-        "messages": [
-            {
-                "id": msg.id,
-                "role": msg.role,
-                "content": msg.content,
-                "sources": msg.get_sources(),  # Include sources if available
-                "timestamp": msg.created_at.isoformat() if msg.created_at else None,
-            }
-            for msg in messages
-        ]
-    }
+async def get_chat_messages(
+    session_id: str,
+    fields: str | None = Query(None, description="Comma-separated subset of: " + ", ".join(_MESSAGE_FIELDS)),
+    limit: int | None = Query(None, ge=1, le=500, description="Page size; omit for the whole session"),
+    before: str | None = Query(None, description="Cursor: messages older than this (prev_cursor)"),
+    after: str | None = Query(None, description="Cursor: messages newer than this (next_cursor)"),
+    db: Session = Depends(get_db),
+):
+    """Get messages for a session, oldest first.
+
+    With limit, returns one keyset page: the latest messages, or those
+    before/after a cursor. prev_cursor/next_cursor are set when older/newer
+    messages exist. Sources are stored as refs and hydrated here in one
+    batched parent-store lookup; leave "sources" out of fields to skip that
+    entirely.
+    """
+    if fields:
+        wanted = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = sorted(set(wanted) - set(_MESSAGE_FIELDS))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    else:
+        wanted = list(_MESSAGE_FIELDS)
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    try:
+        before_key = decode_cursor(before) if before else None
+        after_key = decode_cursor(after) if after else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    prev_cursor = next_cursor = None
+    if limit is None and not (before_key or after_key):
+        messages = get_messages_by_session(db, session_id)
+    else:
+        messages, has_more = get_messages_page(
+            db,
+            session_id,
+            limit or 50,
+            before=before_key,
+            after=after_key,
+            with_sources="sources" in wanted,
+        )
+        if messages:
+            # Paging one way, the other way has at least the cursor message
+            if (after_key is None and has_more) or after_key is not None:
+                prev_cursor = encode_cursor(messages[0].created_at, messages[0].id)
+            if (after_key is not None and has_more) or before_key is not None:
+                next_cursor = encode_cursor(messages[-1].created_at, messages[-1].id)
+
+    sources = None
+    if "sources" in wanted:
+        sources = await asyncio.to_thread(hydrate_source_refs, [msg.get_sources() or [] for msg in messages])
+
+    result = []
+    for i, msg in enumerate(messages):
+        item = {
+            "id": msg.id,
+            "role": msg.role,
+            "content": msg.content,
+            "sources": (sources[i] or None) if sources is not None else None,
+            "timestamp": msg.created_at.isoformat() if msg.created_at else None,
+        }
+        result.append({f: item[f] for f in wanted})
+    return {"messages": result, "prev_cursor": prev_cursor, "next_cursor": next_cursor}
 
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest, db: Session = Depends(get_db)) -> ChatResponse:
+async def chat(req: ChatRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)) -> ChatResponse:
     # Load conversation history
     conversation_history = _load_conversation_history(db, req.sessionId)
     
     # Save user message
     create_message(db, session_id=req.sessionId, role="user", content=req.question)
     
-    # Get answer
-    result = answer_question(
+    # Get answer (runs in a worker thread; identical concurrent questions coalesce)
+    result = await answer_question(
         req.question,
         document_id=req.documentId,
+        document_ids=req.documentIds,
         session_id=req.sessionId,
         conversation_history=conversation_history,
         include_images=req.includeImages if req.includeImages is not None else True,
@@ -74,105 +146,236 @@ async def chat(req: ChatRequest, db: Session = Depends(get_db)) -> ChatResponse:
         content=result["answer"],
         sources=result["sources"]  # Save sources with the message
     )
+    # Fold older turns into the session summary once the response is sent
+    background_tasks.add_task(refresh_conversation_memory, req.sessionId)
     
     return ChatResponse(answer=result["answer"], sources=result["sources"])
 
 
+def _run_with_session(fn, *args, **kwargs):
+    """Run a repository/service call on its own DB session (safe in worker threads)."""
+    db = SessionLocal()
+    try:
+        return fn(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+async def _answer_events(
+    question: str,
+    document_ids: list[str] | None,
+    include_images: bool,
+    conversation_history: list[dict],
+    embedding_task: "asyncio.Task[list[float]]",
+    state: dict,
+) -> AsyncGenerator[str | dict, None]:
+    """Retrieval + generation for one question as SSE events.
+
+    Runs once per group of coalesced identical questions; every subscriber
+    gets the same events. Fills state["sources"] / state["completed"] and
+    stores completed answers in the answer cache.
+    """
+    logger = logging.getLogger(__name__)
+    max_retries = 3
+    retry_count = 0
+    state["sources"] = []
+    state["completed"] = False
+
+    try:
+        generation = await asyncio.to_thread(scope_generation, document_ids)
+        # Shielded: the embedding may be shared with other requests
+        query_embedding = await asyncio.shield(embedding_task)
+        # Off the event loop: the similarity scan must not stall other streams
+        cached = await asyncio.to_thread(
+            lookup_cached_answer,
+            question,
+            document_ids=document_ids,
+            include_images=include_images,
+            conversation_history=conversation_history,
+            query_embedding=query_embedding,
+            generation=generation,
+        )
+        if cached is not None:
+            bundle = {"sources": cached["sources"], "parents": []}
+        else:
+            bundle = await asyncio.to_thread(
+                retrieve_with_sources,
+                query=question,
+                k=5,
+                document_ids=document_ids,
+                include_images=include_images,
+                query_embedding=query_embedding,
+            )
+    except Exception as e:
+        logger.error(f"Error preparing chat stream: {str(e)}", exc_info=True)
+        yield f"[ERROR: {str(e)}]"
+        return
+
+    state["sources"] = bundle.get("sources", [])
+    # Sources go out before the first token so the UI can show them right away
+    yield {"event": "sources", "data": json.dumps(state["sources"], ensure_ascii=False)}
+
+    if cached is not None:
+        # Replay the cached answer in word-sized chunks like a live stream
+        for token in re.findall(r"\S+\s*", cached["answer"]):
+            yield token
+        state["completed"] = True
+        return
+
+    prompt = build_prompt(
+        question,
+        bundle.get("parents", []),
+        conversation_history=conversation_history,
+        include_images=False,
+        scores=[s.get("score") for s in state["sources"]],
+    )
+    answer_parts: list[str] = []
+    while retry_count <= max_retries:
+        try:
+            messages = prompt.format_messages()
+            # Tell the user if 429s (from any worker) have every chat route cooling down
+            shared_wait = await asyncio.to_thread(cooldown_remaining, ROLE_CHAT)
+            if shared_wait > 1:
+                rate_limit_event = {
+                    "wait_seconds": int(shared_wait),
+                    "retry_attempt": retry_count + 1,
+                    "max_retries": max_retries + 1,
+                    "type": "waiting",
+                }
+                yield f"event: rate_limit\ndata: {json.dumps(rate_limit_event)}\n\n"
+            async for chunk in astream_hedged(ROLE_CHAT, messages):
+                if hasattr(chunk, 'content') and chunk.content:
+                    content = str(chunk.content)
+                    answer_parts.append(content)
+                    yield content
+            # Success - break out of retry loop
+            state["completed"] = True
+            break
+        except Exception as e:
+            if is_rate_limit_error(e) and retry_count < max_retries and settings.quota_enabled:
+                # Every chat route is rate limited and paused with Gemini's hint;
+                # the retry announces the wait and acquire_async() sleeps it out
+                logger.warning(
+                    f"⚠️  Rate limit detected in streaming chat! Waiting on shared quota "
+                    f"(retry attempt {retry_count + 1}/{max_retries + 1})"
+                )
+                retry_count += 1
+                continue
+            elif is_rate_limit_error(e) and retry_count < max_retries:
+                wait_time = extract_wait_seconds_from_error(e)
+                if wait_time is None:
+                    wait_time = 60.0 * (1.5 ** retry_count)  # Exponential backoff
+                
+                # Add jitter (10-20%) to prevent synchronized retries
+                jitter_percent = random.uniform(0.1, 0.2)
+                jitter = wait_time * jitter_percent
+                total_wait = wait_time + jitter
+                
+                logger.warning(
+                    f"⚠️  Rate limit detected in streaming chat! "
+                    f"Gemini suggested: {wait_time:.1f}s | Jitter ({jitter_percent*100:.0f}%): +{jitter:.1f}s | "
+                    f"Total wait: {total_wait:.1f}s | Retry attempt {retry_count + 1}/{max_retries + 1}"
+                )
+                
+                # Send a single rate limit notification to frontend (no countdown spam)
+                rate_limit_event = {
+                    "wait_seconds": int(total_wait),
+                    "retry_attempt": retry_count + 1,
+                    "max_retries": max_retries + 1,
+                    "type": "waiting",
+                }
+                yield f"event: rate_limit\ndata: {json.dumps(rate_limit_event)}\n\n"
+                
+                # Wait silently without sending countdown updates every second
+                logger.info(f"⏳ Waiting {total_wait:.1f}s silently before retry...")
+                await asyncio.sleep(total_wait)
+                
+                logger.info(
+                    f"✅ Wait complete ({total_wait:.1f}s). Retrying streaming request now (attempt {retry_count + 2}/{max_retries + 1})..."
+                )
+                retry_count += 1
+                continue
+            else:
+                # Not a rate limit error or retries exhausted
+                logger.error(f"Error in chat stream: {str(e)}", exc_info=True)
+                yield f"[ERROR: {str(e)}]"
+                break
+
+    if state["completed"]:
+        remember_answer(
+            question,
+            "".join(answer_parts),
+            state["sources"],
+            document_ids=document_ids,
+            include_images=include_images,
+            conversation_history=conversation_history,
+            query_embedding=query_embedding,
+            generation=generation,
+        )
+
+
 @router.get("/chat/stream")
 async def chat_stream(
     question: str, 
     sessionId: str, 
     documentId: str | None = None, 
+    documentIds: list[str] | None = Query(default=None),
     includeImages: bool = True,
-    db: Session = Depends(get_db)
 ) -> EventSourceResponse:
-    # Load conversation history
-    conversation_history = _load_conversation_history(db, sessionId)
-    
-    # Save user message
-    create_message(db, session_id=sessionId, role="user", content=question)
-    
-    bundle = retrieve_with_sources(
-        query=question,
-        k=5,
-        document_id=documentId,
-        include_images=includeImages,
-    )
-    parents = bundle.get("parents", [])
-    prompt = build_prompt(question, parents, conversation_history=conversation_history, include_images=False)
-    
+    document_ids = resolve_document_ids(documentId, documentIds)
     # Store response for saving later
     response_buffer = []
 
-    async def event_generator() -> AsyncGenerator[str, None]:
+    async def event_generator() -> AsyncGenerator[str | dict, None]:
         logger = logging.getLogger(__name__)
-        max_retries = 3
-        retry_count = 0
+        flight = None
         
         try:
-            while retry_count <= max_retries:
-                try:
-                    llm = get_chat_llm_streaming()
-                    messages = prompt.format_messages()
-                    async for chunk in llm.astream(messages):
-                        if hasattr(chunk, 'content') and chunk.content:
-                            content = str(chunk.content)
-                            response_buffer.append(content)
-                            yield content
-                    # Success - break out of retry loop
-                    break
-                except Exception as e:
-                    if is_rate_limit_error(e) and retry_count < max_retries:
-                        wait_time = extract_wait_seconds_from_error(e)
-                        if wait_time is None:
-                            wait_time = 60.0 * (1.5 ** retry_count)  # Exponential backoff
-                        
-                        # Add jitter (10-20%) to prevent synchronized retries
-                        jitter_percent = random.uniform(0.1, 0.2)
-                        jitter = wait_time * jitter_percent
-                        total_wait = wait_time + jitter
-                        
-                        logger.warning(
-                            f"⚠️  Rate limit detected in streaming chat! "
-                            f"Gemini suggested: {wait_time:.1f}s | Jitter ({jitter_percent*100:.0f}%): +{jitter:.1f}s | "
-                            f"Total wait: {total_wait:.1f}s | Retry attempt {retry_count + 1}/{max_retries + 1}"
-                        )
-                        
-                        # Send a single rate limit notification to frontend (no countdown spam)
-                        rate_limit_event = {
-                            "wait_seconds": int(total_wait),
-                            "retry_attempt": retry_count + 1,
-                            "max_retries": max_retries + 1,
-                            "type": "waiting",
-                        }
-                        yield f"event: rate_limit\ndata: {json.dumps(rate_limit_event)}\n\n"
-                        
-                        # Wait silently without sending countdown updates every second
-                        logger.info(f"⏳ Waiting {total_wait:.1f}s silently before retry...")
-                        await asyncio.sleep(total_wait)
-                        
-                        logger.info(
-                            f"✅ Wait complete ({total_wait:.1f}s). Retrying streaming request now (attempt {retry_count + 2}/{max_retries + 1})..."
-                        )
-                        retry_count += 1
-                        continue
-                    else:
-                        # Not a rate limit error or retries exhausted
-                        logger.error(f"Error in chat stream: {str(e)}", exc_info=True)
-                        error_msg = f"[ERROR: {str(e)}]"
-                        response_buffer.append(error_msg)
-                        yield error_msg
-                        break
+            # History and the user-message write run in worker threads on their own
+            # DB sessions, concurrently with the query embedding, while the stream is open.
+            # The history read excludes the new message's id, whichever finishes first.
+            user_message_id = str(uuid.uuid4())
+            history_task = asyncio.create_task(
+                asyncio.to_thread(_run_with_session, _load_conversation_history, sessionId, user_message_id)
+            )
+            persist_task = asyncio.create_task(
+                asyncio.to_thread(
+                    _run_with_session, create_message,
+                    session_id=sessionId, role="user", content=question, message_id=user_message_id,
+                )
+            )
+            # Shared with identical questions already in flight, so coalesced requests embed once
+            embedding_task = shared_query_embedding(question)
+            try:
+                conversation_history, _ = await asyncio.gather(history_task, persist_task)
+            except Exception as e:
+                logger.error(f"Error preparing chat stream: {str(e)}", exc_info=True)
+                error_msg = f"[ERROR: {str(e)}]"
+                response_buffer.append(error_msg)
+                yield error_msg
+                return
+
+            # Identical concurrent questions share one retrieval + generation
+            key = coalesce_key(question, None, includeImages, conversation_history, document_ids=document_ids)
+            flight = join_stream(
+                key,
+                lambda state: _answer_events(
+                    question, document_ids, includeImages, conversation_history, embedding_task, state
+                ),
+            )
+            async for event in flight.subscribe():
+                if isinstance(event, str) and not event.startswith("event:"):
+                    response_buffer.append(event)
+                yield event
         finally:
             try:
                 # Save assistant response to database with sources
                 if response_buffer:
                     full_response = "".join(response_buffer)
                     if not full_response.startswith("[ERROR:"):
-                        # Retrieve sources for this query to save with the message
-                        sources = bundle.get("sources", [])
-                        create_message(
-                            db, 
+                        sources = flight.state.get("sources", []) if flight is not None else []
+                        _run_with_session(
+                            create_message,
                             session_id=sessionId, 
                             role="assistant", 
                             content=full_response,
@@ -183,14 +386,29 @@ async def chat_stream(
             finally:
                 yield "event: end"
 
-    return EventSourceResponse(event_generator())
+    return EventSourceResponse(
+        event_generator(),
+        background=BackgroundTask(refresh_conversation_memory, sessionId),
+    )
 
 
 @router.get("/chat/sessions")
-async def get_chat_sessions(db: Session = Depends(get_db)):
-    """Get all chat sessions with metadata."""
-    sessions = list_sessions(db)
-    return {"sessions": sessions}
+async def get_chat_sessions(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_db),
+):
+    """Get chat sessions with metadata, most recent first (keyset-paginated)."""
+    try:
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    sessions, has_more = list_sessions(db, limit=limit, before=before)
+    next_cursor = None
+    if has_more and sessions:
+        last = sessions[-1]
+        next_cursor = encode_cursor(datetime.fromisoformat(last["last_activity"]), last["id"])
+    return {"sessions": sessions, "next_cursor": next_cursor}
 
 
 @router.get("/chat/sessions/{session_id}")
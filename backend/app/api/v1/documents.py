@@ -3,9 +3,12 @@ from sqlalchemy.orm import Session
 from datetime import timezone
 from app.schemas.document import DocumentRead
 from app.api.v1.deps import get_db
-from app.repositories.document_repo import list_documents, delete_document
+from app.repositories.document_repo import list_documents, delete_document, get_document_by_id
 from app.core.config import settings
 from app.services.vector_service import delete_vectors_for_document
+from app.services.rag_service import invalidate_cached_answers
+from app.services.progress_service import forget_progress
+from app.services.ingest_service import cancel_ingest
 import os
 import shutil
 
@@ -27,15 +30,37 @@ def get_documents(db: Session = Depends(get_db)) -> dict:
             status=getattr(d, "status", "completed"),  # Default to completed for old records
             progress=getattr(d, "progress", 0),
             createdAt=d.created_at.replace(tzinfo=timezone.utc).isoformat(),
+            stats=d.get_stats(),
         )
         for d in docs
-        if getattr(d, "status", "completed") != "failed"  # Exclude failed documents
+        if getattr(d, "status", "completed") not in ("failed", "cancelled")  # Exclude failed/cancelled documents
     ]
     return {"documents": [item.model_dump() for item in items]}
 
 
+@router.post("/{doc_id}/cancel", response_model=dict)
+def cancel_document(doc_id: str, db: Session = Depends(get_db)) -> dict:
+    """Stop ingestion of a document that is still processing.
+
+    Queued work is dropped at once; a running job stops before its next
+    chunk and removes any vectors it already wrote.
+    """
+    doc = get_document_by_id(db, id=doc_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if doc.status != "processing":
+        raise HTTPException(status_code=409, detail=f"Document is not processing (status: {doc.status})")
+    jobs = cancel_ingest(doc_id)
+    return {"ok": True, "status": "cancelled", "jobs": jobs}
+
+
 @router.delete("/{doc_id}", response_model=dict)
 def remove_document(doc_id: str, db: Session = Depends(get_db)) -> dict:
+    # 0) stop ingestion first so it doesn't write vectors for a deleted document
+    doc = get_document_by_id(db, id=doc_id)
+    if doc is not None and doc.status == "processing":
+        cancel_ingest(doc_id)
+
     # 1) delete files: uploads dir and parents index
     uploads_dir = os.path.join(settings.uploads_dir, doc_id)
     if os.path.exists(uploads_dir):
@@ -50,6 +75,8 @@ def remove_document(doc_id: str, db: Session = Depends(get_db)) -> dict:
 
     # 2) delete vectors
     delete_vectors_for_document(doc_id)
+    invalidate_cached_answers(doc_id)
+    forget_progress(doc_id)
 
     # 3) delete DB row
     ok = delete_document(db, id=doc_id)
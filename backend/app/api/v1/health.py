@@ -1,17 +1,59 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 from app.core.config import settings
+from app.utils import quota
+from app.services.llm_service import client_pool_stats, hedge_stats
+from app.services.rag_service import answer_cache_stats, coalesce_stats
+from app.services.warmup_service import warmup_state
 
 
 router = APIRouter()
 
 
 @router.get("/health")
-def health() -> dict:
+def health(response: Response) -> dict:
+    """Readiness: 503 until the startup warm-up has finished ("degraded" if a warm-up step failed)."""
+    warmup = warmup_state()
+    if not warmup["ready"]:
+        response.status_code = 503
+        status = "warming_up"
+    else:
+        status = "ok" if warmup["status"] == "ready" else "degraded"
     return {
-        "status": "ok",
+        "status": status,
         "google_api_key_loaded": bool(settings.google_api_key),
         "google_api_key_length": len(settings.google_api_key) if settings.google_api_key else 0,
         "chat_model": settings.chat_model_id,
+        "warmup": warmup,
     }
 
 
+@router.get("/health/live")
+def health_live() -> dict:
+    """Liveness: the process is up (ready or not)."""
+    return {"status": "ok"}
+
+
+@router.get("/health/quota")
+def health_quota() -> dict:
+    """Remaining shared Gemini quota per model id."""
+    return {
+        "enabled": settings.quota_enabled,
+        "models": quota.snapshot() if settings.quota_enabled else {},
+    }
+
+
+@router.get("/health/llm")
+def health_llm() -> dict:
+    """LLM client statistics (chat client pools, hedging, answer cache, coalescing, Ollama embeddings)."""
+    stats = {
+        "client_pools": client_pool_stats(),
+        "hedging": hedge_stats(),
+        "answer_cache": answer_cache_stats(),
+        "coalescing": coalesce_stats(),
+    }
+    if settings.use_ollama_embeddings and settings.embedding_provider != "fake":
+        # Imported here so the module (and LangChain) only loads when Ollama embeddings are in use
+        from app.services.ollama_embeddings import embedding_stats
+
+        stats["embeddings"] = embedding_stats()
+    return stats
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, HTTPException, Query
+
+from app.services.job_queue import get_job, list_jobs, queue_stats
+
+
+router = APIRouter()
+
+
+@router.get("/jobs")
+def get_jobs_overview() -> dict:
+    """Queue depth, running jobs and p50/p95 wait/run times of recent jobs."""
+    return queue_stats()
+
+
+@router.get("/jobs/list")
+def get_jobs_list(
+    status: str | None = Query(None, description="queued, running, succeeded, failed or cancelled"),
+    limit: int = Query(50, ge=1, le=500),
+) -> dict:
+    """Most recent jobs, newest first."""
+    return {"jobs": list_jobs(status=status, limit=limit)}
+
+
+@router.get("/jobs/{job_id}")
+def get_job_detail(job_id: str) -> dict:
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
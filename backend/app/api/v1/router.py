@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from . import health, documents, upload, chat
+from . import health, documents, upload, chat, jobs
 
 
 api_router_v1 = APIRouter()
@@ -9,5 +9,6 @@ api_router_v1.include_router(health.router, tags=["health"])
 api_router_v1.include_router(documents.router, prefix="/documents", tags=["documents"])
 api_router_v1.include_router(upload.router, tags=["upload"])
 api_router_v1.include_router(chat.router, tags=["chat"])
+api_router_v1.include_router(jobs.router, tags=["jobs"])
 
 
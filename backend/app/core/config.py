@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field, field_validator, model_validator
-from typing import List, Union
+from typing import Dict, List, Union
 import os
 from dotenv import load_dotenv
 
@@ -55,11 +55,18 @@ class Settings(BaseSettings):
     data_dir: str = Field(default_factory=lambda: os.path.join(os.getcwd(), "data"))
     uploads_dir: str = Field(default_factory=lambda: os.path.join(os.getcwd(), "data", "uploads"))
     chroma_dir: str = Field(default_factory=lambda: os.path.join(os.getcwd(), "chroma_db"))
+    # Chroma server (empty = embedded store in chroma_dir, which only one process may use)
+    chroma_host: str = Field(default="")
+    chroma_port: int = Field(default=8000)
 
     # Embedding Provider Configuration
     use_ollama_embeddings: bool = Field(default=True)
     ollama_base_url: str = Field(default="http://localhost:11434")
     embedding_model_id: str = Field(default="embeddinggemma:latest")
+    ollama_embed_batch_size: int = Field(default=32)  # Texts per /api/embed request
+    ollama_embed_parallelism: int = Field(default=2)  # Concurrent /api/embed requests per process
+    ollama_keep_alive: str = Field(default="30m")  # How long Ollama keeps the model loaded ("-1" = forever)
+    ollama_embed_timeout_s: float = Field(default=120.0)
 
     # Google Gemini API Configuration
     google_api_key: str = Field(default="")
@@ -68,11 +75,129 @@ class Settings(BaseSettings):
     image_summarizer_model_id: str = Field(default="gemini-2.0-flash")
     embedding_api_model_id: str = Field(default="models/text-embedding-004")
 
+    # Fallback routing: on a 429 (or latency budget overrun) requests move to the next
+    # model id / API key instead of sleeping. Lists are JSON, e.g. ["gemini-2.0-flash-lite"]
+    chat_fallback_model_ids: List[str] = Field(default=[])
+    text_summarizer_fallback_model_ids: List[str] = Field(default=[])
+    image_summarizer_fallback_model_ids: List[str] = Field(default=[])
+    google_api_key_fallbacks: List[str] = Field(default=[])  # Extra keys tried after GOOGLE_API_KEY
+    chat_latency_budget_s: float = Field(default=0.0)  # 0 = no budget (first token for streaming)
+    text_summarizer_latency_budget_s: float = Field(default=0.0)
+    image_summarizer_latency_budget_s: float = Field(default=0.0)
+    llm_slow_cooldown_s: float = Field(default=60.0)  # Cooldown for a route that exceeded its budget
+
+    chat_client_pool_size: int = Field(default=4)  # Reused chat clients (connections) per route
+
+    # Hedged chat requests: send a duplicate when the first token is slower than the
+    # observed latency percentile; the first response wins
+    chat_hedging_enabled: bool = Field(default=False)
+    chat_hedge_percentile: float = Field(default=95.0)
+    chat_hedge_default_delay_s: float = Field(default=4.0)  # Used until enough latency samples exist
+    chat_hedge_min_delay_s: float = Field(default=1.0)
+    chat_hedge_max_per_minute: int = Field(default=10)  # Caps extra quota spent on hedges
+
+    # Retrieval
+    retrieval_max_parallel: int = Field(default=5)  # Concurrent per-document searches for multi-document chat
+
+    # Chat prompt context (token-budgeted, deduplicated retrieved text)
+    chat_context_max_tokens: int = Field(default=2000)  # ~8000 characters
+    chat_context_min_block_tokens: int = Field(default=64)  # Smaller allowances drop the block instead
+
+    # Rolling conversation memory: recent turns verbatim, older turns summarized
+    chat_memory_enabled: bool = Field(default=True)  # false = last 10 raw messages
+    chat_memory_recent_tokens: int = Field(default=1200)  # Budget for verbatim recent turns
+    chat_memory_max_message_tokens: int = Field(default=400)  # Long answers are clipped in history
+    chat_memory_summary_max_tokens: int = Field(default=300)
+    chat_memory_fold_max_tokens: int = Field(default=4000)  # Turns folded per summarization call
+
+    # Semantic answer cache (per document scope, invalidated when the index changes)
+    answer_cache_enabled: bool = Field(default=True)
+    answer_cache_similarity: float = Field(default=0.95)  # Cosine similarity for near-duplicate questions
+    answer_cache_max_entries: int = Field(default=1000)
+    answer_cache_max_entries_per_scope: int = Field(default=200)  # Bounds the similarity scan per lookup
+    answer_cache_ttl_s: float = Field(default=86400.0)
+    answer_cache_with_history: bool = Field(default=False)  # Also cache follow-ups (answers may depend on history)
+
+    # Provider selection ("fake" = deterministic offline stand-ins for load testing)
+    llm_provider: str = Field(default="gemini")  # gemini | fake
+    embedding_provider: str = Field(default="auto")  # auto (USE_OLLAMA_EMBEDDINGS decides) | fake
+    fake_latency_ms: int = Field(default=200)
+    fake_jitter_ms: int = Field(default=100)
+    fake_stream_token_delay_ms: int = Field(default=20)
+    fake_error_rate: float = Field(default=0.0)  # Fraction of LLM calls that raise a simulated 429
+    fake_retry_after_s: float = Field(default=2.0)
+    fake_embedding_dim: int = Field(default=768)  # Matches embeddinggemma
+
+    # Shared Gemini quota (token buckets shared by all processes via SQLite)
+    quota_enabled: bool = Field(default=True)
+    quota_db_path: str = Field(default="")  # Defaults to <data_dir>/quota.db
+    gemini_rpm: int = Field(default=15)  # Requests per minute per model id
+    gemini_tpm: int = Field(default=1_000_000)  # Tokens per minute per model id
+    quota_model_limits: Dict[str, List[int]] = Field(default={})  # {"model-id": [rpm, tpm]} overrides
+    quota_default_pause_s: float = Field(default=60.0)  # Pause after a 429 without a retry hint
+    # Priority lanes: fraction of the bucket lower lanes must leave for chat
+    quota_interactive_reserve: float = Field(default=0.2)  # Background lane reserve
+    quota_active_background_reserve: float = Field(default=0.5)  # Background reserve while chat is active
+    quota_batch_reserve: float = Field(default=0.4)  # Batch lane reserve (batch also pauses during chat)
+    quota_interactive_active_s: float = Field(default=15.0)  # Chat counts as active this long after a request
+
+    # Database (SQLite tuning; applied to every pooled connection)
+    db_wal_enabled: bool = Field(default=True)  # WAL: readers don't block the writer
+    db_synchronous: str = Field(default="NORMAL")  # OFF | NORMAL | FULL | EXTRA
+    db_busy_timeout_ms: int = Field(default=5000)  # Wait this long for a lock before "database is locked"
+    db_cache_size_mb: int = Field(default=64)  # Page cache per connection
+    db_mmap_size_mb: int = Field(default=256)  # 0 disables memory-mapped reads
+    db_pool_size: int = Field(default=10)
+    db_max_overflow: int = Field(default=10)
+    db_pool_timeout_s: float = Field(default=30.0)
+
+    # Ingestion progress (pushed over /upload/events; DB writes throttled)
+    progress_persist_interval_s: float = Field(default=2.0)  # Persist at most this often...
+    progress_persist_min_delta: int = Field(default=5)  # ...unless progress moved this many percent
+    progress_events_poll_s: float = Field(default=5.0)  # DB re-read when no live events in this process
+
+    # Startup warm-up (/api/health reports 503 until it finishes)
+    warmup_enabled: bool = Field(default=True)  # Embed a probe, open the collection and query it before reporting ready
+    warmup_layout_models: bool = Field(default=False)  # Also preload unstructured layout models where ingestion runs (slow, memory-heavy)
+
+    # Durable job queue (ingestion runs as jobs; see app.services.job_queue)
+    job_worker_threads: int = Field(default=1)  # Workers inside the web app; 0 when running `python -m app.worker`
+    job_worker_processes: int = Field(default=2)  # Default for `python -m app.worker`
+    job_poll_interval_s: float = Field(default=1.0)
+    job_lease_s: float = Field(default=120.0)  # Renewed while running; an expired lease makes the job claimable again
+    job_max_attempts: int = Field(default=3)
+    job_retry_base_s: float = Field(default=30.0)  # Backoff doubles per attempt...
+    job_retry_max_s: float = Field(default=600.0)  # ...up to this
+    job_priority_upload: int = Field(default=10)  # Higher runs first
+    job_priority_bulk: int = Field(default=0)  # Bulk ingestion (/upload/bulk, `python -m app.ingest`)
+    # Admission control: running jobs are capped across all workers; uploads get 429 + Retry-After when the queue is full
+    job_max_running: int = Field(default=4)  # 0 = no cap (one job per worker)
+    job_max_queued: int = Field(default=200)  # Queued jobs before /upload is refused (0 = unlimited)
+    job_max_queued_bulk: int = Field(default=20000)  # Same for /upload/bulk (bulk requests add many jobs at once)
+    cancel_check_interval_s: float = Field(default=1.0)  # How often a running ingestion re-reads its document for cancellation
+
+    # Bulk ingestion
+    bulk_max_files: int = Field(default=2000)  # PDFs per /upload/bulk request (zip members included)
+    bulk_ingest_processes: int = Field(default=0)  # Worker processes for `python -m app.ingest` (0 = one per CPU core)
+
     # Performance & Limits
     text_summarizer_max_workers: int = Field(default=4)
     max_upload_mb: int = Field(default=25)
+    upload_chunk_kb: int = Field(default=1024)  # Read size when streaming uploads to disk
+    index_batch_size: int = Field(default=64)  # Vectors per add_documents call (cancellation is checked between batches)
     allowed_mime_types: List[str] = Field(default=["application/pdf"])
 
+    # Image Preprocessing (before vision summarization)
+    image_preprocess_enabled: bool = Field(default=True)
+    image_max_edge_px: int = Field(default=1024)  # Downscale longest edge to this (0 = no resize)
+    image_output_format: str = Field(default="JPEG")  # JPEG or WEBP
+    image_output_quality: int = Field(default=85)
+    image_min_bytes: int = Field(default=2048)  # Skip images smaller than this (encoded size)
+    image_min_area_px: int = Field(default=4096)  # Skip images with width*height below this
+    image_min_side_px: int = Field(default=24)  # Skip thin rules/lines
+    image_min_entropy: float = Field(default=2.0)  # Skip near-blank images (grayscale entropy in bits)
+    image_uniform_ratio: float = Field(default=0.95)  # Skip if one color covers this fraction of pixels
+
     # (Inner Config not needed with model_config in pydantic v2)
 
 
@@ -84,7 +209,7 @@ if os.getenv("CORS_ALLOW_ALL", "").lower() in ("true", "1", "yes"):
     settings.cors_allow_origins = ["*"]
 
 # Debug: Log if API key is missing (only log first time to avoid spam)
-if not settings.google_api_key:
+if not settings.google_api_key and settings.llm_provider != "fake":
     import logging
     logger = logging.getLogger(__name__)
     checked_paths = [
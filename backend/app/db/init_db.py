@@ -5,11 +5,18 @@ from app.core.config import settings
 from app.db.migrate_add_sources import migrate_add_sources_column
 from app.db.migrate_add_status import migrate_add_status_column
 from app.db.migrate_add_progress import migrate_add_progress_column
+from app.db.migrate_backfill_sessions import migrate_backfill_sessions
+from app.db.migrate_add_message_index import migrate_add_message_index
+from app.db.migrate_add_sha256 import migrate_add_sha256_column
+from app.db.migrate_add_stats import migrate_add_stats_column
 import logging
 
 # Import models to ensure they're registered with Base.metadata before table creation
 from app.models.document import Document  # noqa: F401
 from app.models.message import Message  # noqa: F401
+from app.models.session_memory import SessionMemory  # noqa: F401
+from app.models.chat_session import ChatSession  # noqa: F401
+from app.models.job import Job  # noqa: F401
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +42,10 @@ def init_db() -> None:
         migrate_add_sources_column()
         migrate_add_status_column()
         migrate_add_progress_column()
+        migrate_backfill_sessions()
+        migrate_add_message_index()
+        migrate_add_sha256_column()
+        migrate_add_stats_column()
         logger.info("Database migrations completed")
     except Exception as e:
         logger.error(f"Error running database migrations: {e}", exc_info=True)
@@ -0,0 +1,67 @@
+"""
+Migration script to add the (session_id, created_at, id) index to messages.
+
+Run this script once to add the index to existing databases.
+For new databases, the index will be created automatically via SQLAlchemy.
+
+Usage:
+    python -m app.db.migrate_add_message_index
+"""
+import sqlite3
+import os
+
+_INDEX_NAME = "ix_messages_session_created"
+
+
+def migrate_add_message_index():
+    """Create the composite session/time index on messages if it doesn't exist."""
+    db_url = os.getenv("DATABASE_URL", "sqlite:///./data/app.db")
+
+    if db_url.startswith("sqlite:///"):
+        db_path = db_url.replace("sqlite:///", "")
+        if not os.path.isabs(db_path):
+            db_path = os.path.normpath(os.path.join(os.getcwd(), db_path))
+    else:
+        print(f"Migration only supports SQLite databases. Got: {db_url}")
+        return False
+
+    if not os.path.exists(db_path):
+        print(f"Database file not found at {db_path}. It will be created with the index automatically.")
+        return True
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("PRAGMA index_list(messages)")
+        indexes = [row[1] for row in cursor.fetchall()]
+
+        if _INDEX_NAME in indexes:
+            print(f"Index '{_INDEX_NAME}' already exists in {db_path}. Migration not needed.")
+            conn.close()
+            return True
+
+        print(f"Adding '{_INDEX_NAME}' index to messages table in {db_path}...")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {_INDEX_NAME} ON messages (session_id, created_at, id)")
+        # Let the query planner know about the new index
+        cursor.execute("ANALYZE messages")
+        conn.commit()
+        conn.close()
+
+        print("Migration completed successfully!")
+        return True
+
+    except sqlite3.Error as e:
+        print(f"Error during migration: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    migrate_add_message_index()
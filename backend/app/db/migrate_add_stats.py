@@ -0,0 +1,65 @@
+"""
+Migration script to add the stats_json column to the documents table.
+
+Run this script once to add the column to existing databases.
+For new databases, the column will be created automatically via SQLAlchemy.
+Documents ingested before this migration have no stored statistics (NULL).
+
+Usage:
+    python -m app.db.migrate_add_stats
+"""
+import sqlite3
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_add_stats_column() -> bool:
+    """Add stats_json column to documents table if it doesn't exist."""
+    db_url = os.getenv("DATABASE_URL", "sqlite:///./data/app.db")
+
+    if db_url.startswith("sqlite:///"):
+        db_path = db_url.replace("sqlite:///", "")
+        if not os.path.isabs(db_path):
+            db_path = os.path.normpath(os.path.join(os.getcwd(), db_path))
+    else:
+        logger.warning(f"Migration only supports SQLite databases. Got: {db_url}")
+        return False
+
+    # If database doesn't exist yet, SQLAlchemy will create it with the column
+    if not os.path.exists(db_path):
+        logger.info(f"Database file not found at {db_path}. It will be created with the column automatically.")
+        return True
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("PRAGMA table_info(documents)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if not columns:
+            conn.close()
+            return True
+
+        if "stats_json" in columns:
+            logger.info(f"Column 'stats_json' already exists in {db_path}. Migration not needed.")
+            conn.close()
+            return True
+
+        logger.info(f"Adding 'stats_json' column to documents table in {db_path}...")
+        cursor.execute("ALTER TABLE documents ADD COLUMN stats_json TEXT")
+        conn.commit()
+        conn.close()
+        return True
+
+    except sqlite3.Error as e:
+        logger.error(f"Error during migration: {e}", exc_info=True)
+        return False
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}", exc_info=True)
+        return False
+
+
+if __name__ == "__main__":
+    migrate_add_stats_column()
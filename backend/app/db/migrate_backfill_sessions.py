@@ -0,0 +1,87 @@
+"""
+Migration script to fill the sessions table from existing messages.
+
+The sessions table (title, message count, timestamps per chat session) is
+created automatically via SQLAlchemy and kept current by create_message.
+Databases that already have messages need it backfilled once; this runs
+only while the sessions table is still empty.
+
+Usage:
+    python -m app.db.migrate_backfill_sessions
+"""
+import sqlite3
+import os
+
+# Must match session_repo.session_title()
+_TITLE_SQL = """
+    CASE WHEN length(t.content) > 50 THEN substr(t.content, 1, 50) || '...' ELSE t.content END
+"""
+
+
+def migrate_backfill_sessions():
+    """Create a sessions row for every session found in messages."""
+    db_url = os.getenv("DATABASE_URL", "sqlite:///./data/app.db")
+
+    if db_url.startswith("sqlite:///"):
+        db_path = db_url.replace("sqlite:///", "")
+        if not os.path.isabs(db_path):
+            db_path = os.path.normpath(os.path.join(os.getcwd(), db_path))
+    else:
+        print(f"Migration only supports SQLite databases. Got: {db_url}")
+        return False
+
+    if not os.path.exists(db_path):
+        print(f"Database file not found at {db_path}. Nothing to backfill.")
+        return True
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        tables = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        if "sessions" not in tables or "messages" not in tables:
+            print("sessions or messages table missing. Migration not needed.")
+            conn.close()
+            return True
+
+        if cursor.execute("SELECT 1 FROM sessions LIMIT 1").fetchone():
+            print("sessions table already populated. Migration not needed.")
+            conn.close()
+            return True
+        if not cursor.execute("SELECT 1 FROM messages LIMIT 1").fetchone():
+            conn.close()
+            return True
+
+        print(f"Backfilling sessions table in {db_path}...")
+        cursor.execute(f"""
+            INSERT INTO sessions (id, title, message_count, created_at, last_activity)
+            SELECT m.session_id,
+                   (SELECT {_TITLE_SQL} FROM messages t
+                     WHERE t.session_id = m.session_id AND t.role = 'user'
+                     ORDER BY t.created_at ASC LIMIT 1),
+                   COUNT(*), MIN(m.created_at), MAX(m.created_at)
+              FROM messages m
+             WHERE m.session_id IS NOT NULL
+             GROUP BY m.session_id
+        """)
+        count = cursor.rowcount
+        conn.commit()
+        conn.close()
+
+        print(f"Migration completed successfully! ({count} sessions)")
+        return True
+
+    except sqlite3.Error as e:
+        print(f"Error during migration: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    migrate_backfill_sessions()
@@ -0,0 +1,103 @@
+"""
+Migration script to compact stored message sources into refs.
+
+Messages saved before sources were stored as refs carry full payloads (text,
+table HTML, base64 images) in sources_json. This rewrites them to the compact
+form written by Message.set_sources, looking up each parent's document in the
+parents indexes. Sources whose document no longer exists are left as they are.
+
+Usage:
+    python -m app.db.migrate_compact_sources
+"""
+import sqlite3
+import os
+import json
+from app.core.config import settings
+from app.models.message import source_ref
+
+
+def _parent_documents() -> dict:
+    """Map parent_id -> doc_id over all parents indexes."""
+    index_dir = os.path.join(settings.data_dir, "parents_index")
+    mapping = {}
+    if not os.path.isdir(index_dir):
+        return mapping
+    for name in os.listdir(index_dir):
+        if not name.endswith(".json"):
+            continue
+        doc_id = name[: -len(".json")]
+        try:
+            with open(os.path.join(index_dir, name), "r", encoding="utf-8") as f:
+                for parent_id in json.load(f):
+                    mapping[parent_id] = doc_id
+        except (OSError, ValueError) as e:
+            print(f"Skipping unreadable parents index {name}: {e}")
+    return mapping
+
+
+def migrate_compact_sources():
+    """Rewrite full sources in messages.sources_json as compact refs."""
+    db_url = os.getenv("DATABASE_URL", "sqlite:///./data/app.db")
+
+    if db_url.startswith("sqlite:///"):
+        db_path = db_url.replace("sqlite:///", "")
+        if not os.path.isabs(db_path):
+            db_path = os.path.normpath(os.path.join(os.getcwd(), db_path))
+    else:
+        print(f"Migration only supports SQLite databases. Got: {db_url}")
+        return False
+
+    if not os.path.exists(db_path):
+        print(f"Database file not found at {db_path}. Nothing to compact.")
+        return True
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        # Full sources always carry a summary; refs never do
+        cursor.execute("SELECT id, sources_json FROM messages WHERE sources_json LIKE '%\"summary\"%'")
+        rows = cursor.fetchall()
+        if not rows:
+            print("No full sources found in messages. Migration not needed.")
+            conn.close()
+            return True
+
+        parents = _parent_documents()
+        compacted = 0
+        for message_id, sources_json in rows:
+            try:
+                sources = json.loads(sources_json)
+            except (ValueError, TypeError):
+                continue
+            refs = []
+            for src in sources:
+                if isinstance(src, dict) and not src.get("doc_id") and src.get("parent_id") in parents:
+                    src = {**src, "doc_id": parents[src["parent_id"]]}
+                refs.append(source_ref(src) if isinstance(src, dict) else src)
+            if refs != sources:
+                cursor.execute(
+                    "UPDATE messages SET sources_json = ? WHERE id = ?",
+                    (json.dumps(refs, ensure_ascii=False), message_id),
+                )
+                compacted += 1
+        conn.commit()
+        conn.close()
+
+        print(f"Compacted sources of {compacted} of {len(rows)} messages. Run VACUUM to reclaim the space.")
+        return True
+
+    except sqlite3.Error as e:
+        print(f"Error during migration: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    migrate_compact_sources()
@@ -1,11 +1,139 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from typing import Any, Dict, Optional
+import logging
 import os
 
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
 
 DB_URL = os.getenv("DATABASE_URL", "sqlite:///./data/app.db")
 
-engine = create_engine(DB_URL, connect_args={"check_same_thread": False} if DB_URL.startswith("sqlite") else {})
+_IS_SQLITE = DB_URL.startswith("sqlite")
+_IS_SQLITE_MEMORY = _IS_SQLITE and (DB_URL.split("?")[0] in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in DB_URL)
+_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def _sqlite_pragmas() -> Dict[str, Any]:
+    """PRAGMAs applied to every new SQLite connection."""
+    synchronous = settings.db_synchronous.upper()
+    if synchronous not in _SYNCHRONOUS_MODES:
+        logger.warning("Unknown DB_SYNCHRONOUS=%s; using NORMAL", settings.db_synchronous)
+        synchronous = "NORMAL"
+    pragmas: Dict[str, Any] = {
+        "busy_timeout": int(settings.db_busy_timeout_ms),
+        "synchronous": synchronous,
+        "cache_size": -int(settings.db_cache_size_mb * 1024),  # negative = KiB
+        "mmap_size": int(settings.db_mmap_size_mb * 1024 * 1024),
+        "temp_store": "MEMORY",
+    }
+    if settings.db_wal_enabled and not _IS_SQLITE_MEMORY:
+        pragmas = {"journal_mode": "WAL", **pragmas}
+    return pragmas
+
+
+def _apply_sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in _sqlite_pragmas().items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def _engine_kwargs() -> Dict[str, Any]:
+    if not _IS_SQLITE:
+        return {
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout_s,
+            "pool_pre_ping": True,
+        }
+    kwargs: Dict[str, Any] = {
+        # Driver-level wait as well, so lock waits also apply before the PRAGMA runs
+        "connect_args": {"check_same_thread": False, "timeout": settings.db_busy_timeout_ms / 1000},
+    }
+    if not _IS_SQLITE_MEMORY:
+        kwargs.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout_s,
+        )
+    return kwargs
+
+
+engine = create_engine(DB_URL, **_engine_kwargs())
+if _IS_SQLITE:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+_async_engine: Optional[Any] = None
+_async_sessionmaker: Optional[Any] = None
+
+
+def get_async_engine() -> Any:
+    """Async engine on the same database (sqlite+aiosqlite), created on first use.
+
+    Requires the optional aiosqlite package for SQLite URLs.
+    """
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        return _async_engine
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    url = DB_URL
+    if _IS_SQLITE:
+        try:
+            import aiosqlite  # noqa: F401
+        except ImportError as e:
+            raise ImportError("aiosqlite is required for the async database engine. Install with: pip install aiosqlite") from e
+        url = DB_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    _async_engine = create_async_engine(url, **_engine_kwargs())
+    if _IS_SQLITE:
+        event.listen(_async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    _async_sessionmaker = async_sessionmaker(_async_engine, expire_on_commit=False)
+    return _async_engine
+
+
+def get_async_session() -> Any:
+    """New AsyncSession bound to the async engine (use as `async with get_async_session() as db`)."""
+    get_async_engine()
+    return _async_sessionmaker()
+
+
+def check_database() -> Dict[str, Any]:
+    """Effective database settings as seen by a pooled connection.
+
+    Logged at startup so a misconfigured deployment (e.g. WAL refused on a
+    network filesystem) is visible before it shows up as lock errors.
+    """
+    info: Dict[str, Any] = {
+        "url": engine.url.render_as_string(hide_password=True),
+        "pool": engine.pool.status(),
+    }
+    if not _IS_SQLITE:
+        return info
+
+    with engine.connect() as conn:
+        raw = conn.connection.dbapi_connection
+        cursor = raw.cursor()
+        try:
+            for name in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size"):
+                row = cursor.execute(f"PRAGMA {name}").fetchone()
+                info[name] = row[0] if row else None
+        finally:
+            cursor.close()
+
+    # synchronous is reported as a number: 0=OFF 1=NORMAL 2=FULL 3=EXTRA
+    modes = {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"}
+    info["synchronous"] = modes.get(info.get("synchronous"), info.get("synchronous"))
+
+    expected = _sqlite_pragmas()
+    if expected.get("journal_mode") and str(info.get("journal_mode")).upper() != "WAL":
+        logger.warning("SQLite journal_mode is %s, not WAL; concurrent writers may block readers", info.get("journal_mode"))
+    if info["synchronous"] != expected["synchronous"]:
+        logger.warning("SQLite synchronous is %s, expected %s", info["synchronous"], expected["synchronous"])
+    return info
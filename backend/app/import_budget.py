@@ -0,0 +1,129 @@
+"""Import-time budget check for API startup.
+
+Usage:
+    python -m app.import_budget                     # app.main within 2000 ms, no heavy libraries
+    python -m app.import_budget --budget-ms 1500 --runs 5 --top 20
+
+Imports the module in a fresh interpreter under `python -X importtime`
+(best of --runs, so a cold disk cache doesn't count), prints the slowest
+top-level imports and exits non-zero when the total exceeds the budget or
+any of the heavy libraries (PDF parsing, layout models, Chroma, LangChain)
+got imported. Those must only load on first use; see pdf_service,
+vector_service and the lazy imports in the LLM services.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Must not be imported just by starting the API
+HEAVY_MODULES = (
+    "unstructured",
+    "unstructured_inference",
+    "torch",
+    "transformers",
+    "chromadb",
+    "langchain_chroma",
+    "langchain_core",
+    "langchain_google_genai",
+    "langchain_ollama",
+    "pypdf",
+    "PIL",
+)
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module: str) -> Tuple[int, Dict[str, int], List[str]]:
+    """Import module in a new interpreter.
+
+    Returns (total microseconds, microseconds per package, heavy modules
+    that ended up in sys.modules). Packages imported by our code are
+    charged their cumulative time; our own package gets its self time.
+    """
+    code = (
+        f"import sys, json, {module}; "
+        f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))"
+    )
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (_BACKEND_DIR, env.get("PYTHONPATH")) if p)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=_BACKEND_DIR, env=env,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n" + "\n".join(proc.stderr.splitlines()[-15:]))
+
+    # importtime prints children before their parent, indented two spaces per level
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, name.strip(), int(self_us), int(cumulative)))
+
+    total = 0
+    start = None
+    for i, (depth, name, _, cumulative) in enumerate(rows):
+        if depth == 0 and name == module:
+            total, start = cumulative, i
+            break
+    if start is None:
+        raise RuntimeError(f"{module} not found in importtime output")
+
+    own = module.split(".")[0]
+    packages: Dict[str, int] = {}
+    # Walk the module's subtree parent-first so each import knows which package imported it
+    parents: List[str] = []
+    for i in range(start, -1, -1):
+        depth, name, self_us, cumulative = rows[i]
+        if depth == 0 and i != start:
+            break
+        del parents[depth:]
+        package = name.split(".")[0]
+        if package == own:
+            packages[own] = packages.get(own, 0) + self_us
+        elif parents and parents[-1] == own:
+            # Third-party/stdlib package entered from our code: its whole subtree
+            packages[package] = packages.get(package, 0) + cumulative
+        parents.append(package)
+    heavy = json.loads(proc.stdout.strip().splitlines()[-1])
+    return total, packages, heavy
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Fail if importing the API exceeds a time budget")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=2000.0)
+    parser.add_argument("--runs", type=int, default=3, help="best of N fresh interpreters")
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level packages to list")
+    args = parser.parse_args(argv)
+
+    best = None
+    for _ in range(max(1, args.runs)):
+        result = measure(args.module)
+        if best is None or result[0] < best[0]:
+            best = result
+    total, packages, heavy = best
+
+    print(f"import {args.module}: {total / 1000:.0f} ms (budget {args.budget_ms:.0f} ms, best of {args.runs})")
+    for package, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {package}")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if total / 1000 > args.budget_ms:
+        print(f"FAIL: over budget by {total / 1000 - args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
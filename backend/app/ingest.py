@@ -0,0 +1,127 @@
+"""Bulk-ingest a directory of PDFs.
+
+Usage:
+    python -m app.ingest ./pdfs                      # one worker process per CPU core
+    python -m app.ingest ./pdfs --processes 4 --report report.json
+    python -m app.ingest ./pdfs --no-wait            # only queue; running workers pick the jobs up
+
+Walks the directory for PDFs (and zip archives of PDFs), skips files whose
+content is already ingested, and queues the rest as bulk ingest jobs (see
+app.services.bulk_ingest_service). Unless --no-wait is given it starts
+worker processes so parsing runs on every core while summarization is paced
+by the shared quota, waits for the batch to finish and writes a JSON report
+with per-document status, timings and errors.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logging import setup_logging
+
+
+def _find_files(root: str) -> List[str]:
+    if os.path.isfile(root):
+        return [root]
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith((".pdf", ".zip")) and not name.startswith("."):
+                found.append(os.path.join(dirpath, name))
+    return found
+
+
+def _register_path(path: str, root: str, batch_id: str) -> List[Dict[str, Any]]:
+    from app.services.bulk_ingest_service import register_pdf, register_zip
+
+    label = os.path.relpath(path, root) if os.path.isdir(root) else os.path.basename(path)
+    try:
+        with open(path, "rb") as f:
+            if path.lower().endswith(".zip"):
+                return register_zip(f, label, batch_id=batch_id)
+            entry = register_pdf(f, os.path.basename(path), batch_id=batch_id)
+    except OSError as e:
+        return [{"name": label, "doc_id": None, "status": "rejected", "error": f"Failed to read file: {e}"}]
+    entry["name"] = label
+    return [entry]
+
+
+def _log_progress(report: Dict[str, Any]) -> None:
+    counts = report["counts"]
+    logging.info("📦 Batch %s: %s", report["batch_id"],
+                 ", ".join(f"{status}={count}" for status, count in sorted(counts.items())))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory of PDFs")
+    parser.add_argument("path", help="directory (searched recursively), PDF or zip file")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes to start (default BULK_INGEST_PROCESSES, 0 there = CPU cores)")
+    parser.add_argument("--no-wait", action="store_true", help="queue the files and exit")
+    parser.add_argument("--report", default=None, help="report path (default <data_dir>/batches/<batch>.report.json)")
+    parser.add_argument("--poll-s", type=float, default=5.0, help="seconds between progress checks")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    from app.db.init_db import init_db, init_directories
+    from app.services.bulk_ingest_service import batch_report, batches_dir, new_batch_id, save_batch, wait_for_batch
+    from app.worker import spawn_workers, stop_workers, warn_if_embedded_chroma
+
+    root = os.path.abspath(args.path)
+    if not os.path.exists(root):
+        logging.error("Not found: %s", root)
+        return 2
+    init_directories()
+    init_db()
+
+    files = _find_files(root)
+    if not files:
+        logging.warning("No PDF or zip files under %s", root)
+        return 0
+
+    count = args.processes if args.processes is not None else settings.bulk_ingest_processes
+    if count <= 0:
+        count = os.cpu_count() or 1
+    processes = []
+    if not args.no_wait:
+        warn_if_embedded_chroma()
+        # Start workers first so parsing begins while the rest is still being copied
+        processes = spawn_workers(count)
+
+    batch_id = new_batch_id()
+    logging.info("📥 Registering %d files from %s (batch %s)", len(files), root, batch_id)
+    try:
+        # Copying and hashing is I/O bound (hashlib releases the GIL)
+        with ThreadPoolExecutor(max_workers=min(8, len(files))) as pool:
+            entries = [entry for result in pool.map(lambda p: _register_path(p, root, batch_id), files)
+                       for entry in result]
+        save_batch(batch_id, entries, source=root)
+        report = batch_report(batch_id)
+        _log_progress(report)
+        if not args.no_wait:
+            report = wait_for_batch(batch_id, poll_s=args.poll_s, on_poll=_log_progress)
+    except KeyboardInterrupt:
+        logging.warning("Interrupted; queued jobs stay in the queue and run on the next workers")
+        report = batch_report(batch_id)
+    finally:
+        stop_workers(processes)
+        for process in processes:
+            process.join()
+
+    if report is None:
+        return 1
+    report_path = args.report or os.path.join(batches_dir(), f"{batch_id}.report.json")
+    os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logging.info("📝 Report written to %s", report_path)
+    return 1 if report["counts"].get("failed") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,8 +9,10 @@ os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
 from app.core.config import settings
 from app.api.v1.router import api_router_v1
 from app.db.init_db import init_db, init_directories
+from app.db.session import check_database
+from app.services.job_queue import start_in_process_workers, stop_in_process_workers
 from app.core.logging import setup_logging
-from app.services.llm_service import get_text_summarizer_llm, get_image_summarizer_llm, get_chat_llm
+from app.services.warmup_service import start_warmup
 import logging
 import httpx
 import subprocess
@@ -121,12 +123,26 @@ def on_startup() -> None:
     logging.info("="*70)
     logging.info("CORS Origins: %s", settings.cors_allow_origins)
     logging.info("="*70 + "\n")
+
+    # Database self-check: effective pragmas and pool
+    logging.info("DATABASE CONFIGURATION")
+    logging.info("="*70)
+    try:
+        for name, value in check_database().items():
+            logging.info("   %s: %s", name, value)
+    except Exception as e:
+        logging.warning("Database self-check failed: %s", e)
+    logging.info("="*70 + "\n")
     
     # Display embedding provider configuration
     logging.info("EMBEDDING PROVIDER CONFIGURATION")
     logging.info("="*70)
     
-    if settings.use_ollama_embeddings:
+    if settings.embedding_provider == "fake":
+        logging.info("🔧 Provider: FAKE (Deterministic hashed-feature embeddings)")
+        logging.info("   Dimension: %d", settings.fake_embedding_dim)
+        logging.info("   Mode: %s", "MULTIMODAL" if settings.use_ollama_embeddings else "TEXT-ONLY")
+    elif settings.use_ollama_embeddings:
         logging.info("🔧 Provider: OLLAMA (Local Embeddings)")
         logging.info("   Model: %s", settings.embedding_model_id)
         logging.info("   URL: %s", settings.ollama_base_url)
@@ -165,6 +181,9 @@ def on_startup() -> None:
     # Display LLM models configuration
     logging.info("LLM MODELS CONFIGURATION")
     logging.info("="*70)
+    if settings.llm_provider == "fake":
+        logging.info("   Provider: FAKE (latency=%dms ±%dms, 429 rate=%.2f)",
+                     settings.fake_latency_ms, settings.fake_jitter_ms, settings.fake_error_rate)
     logging.info("   Chat Model: %s", settings.chat_model_id)
     logging.info("   Text Summarizer: %s", settings.text_summarizer_model_id)
     if settings.use_ollama_embeddings:
@@ -173,30 +192,28 @@ def on_startup() -> None:
         logging.info("   Image Summarizer: DISABLED (text-only mode)")
     logging.info("="*70 + "\n")
 
-    # Warm-up LLM models to avoid first-request latency
-    try:
-        get_text_summarizer_llm()
-        logging.info("✓ Text summarizer model warm-up successful")
-    except Exception as e:
-        logging.warning("Text summarizer model warm-up failed: %s", e)
-    
-    if settings.use_ollama_embeddings:
-        try:
-            get_image_summarizer_llm()
-            logging.info("✓ Image summarizer model warm-up successful")
-        except Exception as e:
-            logging.warning("Image summarizer model warm-up failed: %s", e)
+    # Warm-up (LLM clients, embedding model, vector index; layout models if enabled) runs in
+    # the background; /api/health answers 503 until it is done
+    start_warmup()
+
+    # Job workers for ingestion (dedicated `python -m app.worker` processes may run instead)
+    if settings.job_worker_threads > 0:
+        start_in_process_workers(settings.job_worker_threads)
+        logging.info("👷 Started %d in-process job worker(s)", settings.job_worker_threads)
     else:
-        logging.info("⏭️  Image summarizer warm-up skipped (text-only mode)")
-    
-    try:
-        get_chat_llm()
-        logging.info("✓ Chat model warm-up successful")
-    except Exception as e:
-        logging.warning("Chat model warm-up failed: %s", e)
+        logging.info("⏭️  No in-process job workers (JOB_WORKER_THREADS=0); run python -m app.worker")
     
     logging.info("\n" + "="*70)
     logging.info("🚀 Application startup complete!")
     logging.info("="*70 + "\n")
 
 
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    stop_in_process_workers()
+    if settings.use_ollama_embeddings:
+        from app.services.ollama_embeddings import close_client
+
+        close_client()
+
+
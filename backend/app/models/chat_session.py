@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, Integer, DateTime, Index
+from datetime import datetime
+
+from app.db.base import Base
+
+
+class ChatSession(Base):
+    """Per-session metadata, kept current by create_message so listing never scans messages."""
+
+    __tablename__ = "sessions"
+
+    id = Column(String, primary_key=True, index=True)
+    title = Column(String, nullable=True)  # From the first user message; None until there is one
+    message_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_activity = Column(DateTime, default=datetime.utcnow)
+
+    # Keyset order for the session list (most recent first)
+    __table_args__ = (Index("ix_sessions_last_activity_id", "last_activity", "id"),)
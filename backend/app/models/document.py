@@ -1,5 +1,7 @@
-from sqlalchemy import Column, String, Integer, DateTime
+from sqlalchemy import Column, String, Integer, DateTime, Text
 from datetime import datetime
+from typing import Optional, Dict, Any
+import json
 
 from app.db.base import Base
 
@@ -12,6 +14,19 @@ class Document(Base):
     pages = Column(Integer, default=0)
     status = Column(String, default="processing")  # processing, completed, failed
     progress = Column(Integer, default=0)  # 0-100 percentage
+    sha256 = Column(String, nullable=True, index=True)  # Hex digest of the uploaded file
+    stats_json = Column(Text, nullable=True)  # JSON ingest statistics (element counts, images, timings)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    def set_stats(self, stats: Optional[Dict[str, Any]]) -> None:
+        self.stats_json = json.dumps(stats, ensure_ascii=False) if stats else None
+
+    def get_stats(self) -> Optional[Dict[str, Any]]:
+        if not self.stats_json:
+            return None
+        try:
+            return json.loads(self.stats_json)
+        except (json.JSONDecodeError, TypeError):
+            return None
+
 
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, String, Integer, DateTime, Text, Index
+from datetime import datetime
+from typing import Any, Dict
+import json
+
+from app.db.base import Base
+
+
+class Job(Base):
+    """Durable background job (see app.services.job_queue)."""
+
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # Handler name, e.g. "ingest"
+    doc_id = Column(String, nullable=True, index=True)
+    payload_json = Column(Text, default="{}")
+    status = Column(String, default="queued")  # queued, running, succeeded, failed, cancelled
+    priority = Column(Integer, default=0)  # Higher runs first
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime, default=datetime.utcnow)  # Not claimed before this (retry backoff)
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)  # Start of the latest attempt
+    finished_at = Column(DateTime, nullable=True)
+
+    # Claim order: runnable jobs by priority, oldest first
+    __table_args__ = (Index("ix_jobs_status_priority", "status", "priority", "created_at"),)
+
+    def get_payload(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.payload_json or "{}")
+        except (json.JSONDecodeError, TypeError):
+            return {}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Text
+from sqlalchemy import Column, String, DateTime, Text, Index
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 import json
@@ -6,6 +6,17 @@ import json
 from app.db.base import Base
 
 
+# Fields stored per source; text, tables and images are re-read from the parent store
+SOURCE_REF_FIELDS = ("parent_id", "doc_id", "type", "page_number", "score")
+
+
+def source_ref(source: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact reference for a retrieved source (kept whole if it can't be resolved later)."""
+    if not source.get("doc_id") or not source.get("parent_id"):
+        return source
+    return {k: source.get(k) for k in SOURCE_REF_FIELDS}
+
+
 class Message(Base):
     __tablename__ = "messages"
 
@@ -15,16 +26,19 @@ class Message(Base):
     content = Column(Text)
     sources_json = Column(Text, nullable=True)  # JSON string of sources list
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    # History reads and keyset pages scan one session in time order
+    __table_args__ = (Index("ix_messages_session_created", "session_id", "created_at", "id"),)
     
     def set_sources(self, sources: Optional[List[Dict[str, Any]]]) -> None:
-        """Store sources as JSON string."""
+        """Store sources as a JSON string of compact refs (payloads stay in the parent store)."""
         if sources:
-            self.sources_json = json.dumps(sources, ensure_ascii=False)
+            self.sources_json = json.dumps([source_ref(s) for s in sources], ensure_ascii=False)
         else:
             self.sources_json = None
     
     def get_sources(self) -> Optional[List[Dict[str, Any]]]:
-        """Retrieve sources from JSON string."""
+        """Retrieve stored source refs from JSON string (see hydrate_source_refs)."""
         if not self.sources_json:
             return None
         try:
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Integer, DateTime, Text
+from datetime import datetime
+
+from app.db.base import Base
+
+
+class SessionMemory(Base):
+    """Rolling summary of the older part of a chat session."""
+
+    __tablename__ = "session_memory"
+
+    session_id = Column(String, primary_key=True, index=True)
+    summary = Column(Text, default="")
+    summarized_until = Column(DateTime, nullable=True)  # created_at of the last message folded into summary
+    summarized_count = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -1,10 +1,10 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from app.models.document import Document
 
-def create_document(db: Session, *, id: str, name: str, pages: int, status: str = "processing", created_at: datetime | None = None) -> Document:
-    doc = Document(id=id, name=name, pages=pages, status=status, created_at=created_at or datetime.utcnow())
+def create_document(db: Session, *, id: str, name: str, pages: int, status: str = "processing", created_at: datetime | None = None, sha256: str | None = None) -> Document:
+    doc = Document(id=id, name=name, pages=pages, status=status, sha256=sha256, created_at=created_at or datetime.utcnow())
     db.add(doc)
     db.commit()
     db.refresh(doc)
@@ -24,6 +24,16 @@ def update_document_status(db: Session, *, id: str, status: str, progress: int |
     return True
 
 
+def update_document_stats(db: Session, *, id: str, stats: Dict[str, Any]) -> bool:
+    """Store a document's ingest statistics."""
+    doc = db.query(Document).filter(Document.id == id).first()
+    if not doc:
+        return False
+    doc.set_stats(stats)
+    db.commit()
+    return True
+
+
 def get_document_by_id(db: Session, *, id: str) -> Optional[Document]:
     """Get a document by ID."""
     return db.query(Document).filter(Document.id == id).first()
@@ -0,0 +1,32 @@
+from typing import Optional
+from sqlalchemy.orm import Session
+from datetime import datetime
+
+from app.models.session_memory import SessionMemory
+
+
+def get_session_memory(db: Session, session_id: str) -> Optional[SessionMemory]:
+    return db.query(SessionMemory).filter(SessionMemory.session_id == session_id).first()
+
+
+def save_session_memory(
+    db: Session,
+    *,
+    session_id: str,
+    summary: str,
+    summarized_until: datetime,
+    summarized_count: int,
+) -> SessionMemory:
+    """Create or update the rolling summary for a session."""
+    memory = get_session_memory(db, session_id)
+    if memory is None:
+        memory = SessionMemory(session_id=session_id)
+        db.add(memory)
+    memory.summary = summary
+    memory.summarized_until = summarized_until
+    memory.summarized_count = summarized_count
+    memory.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(memory)
+    return memory
+
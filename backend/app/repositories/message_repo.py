@@ -1,19 +1,91 @@
-from typing import List, Optional, Dict
-from sqlalchemy.orm import Session
+from typing import List, Optional, Dict, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, defer
 from datetime import datetime
 import uuid
 
 from app.models.message import Message
+from app.repositories.session_repo import touch_session
 
 
 def get_messages_by_session(db: Session, session_id: str, limit: Optional[int] = None) -> List[Message]:
     """Get all messages for a session, ordered by creation time."""
-    query = db.query(Message).filter(Message.session_id == session_id).order_by(Message.created_at.asc())
+    query = (
+        db.query(Message)
+        .filter(Message.session_id == session_id)
+        .order_by(Message.created_at.asc(), Message.id.asc())
+    )
     if limit:
         query = query.limit(limit)
     return query.all()
 
 
+def get_messages_page(
+    db: Session,
+    session_id: str,
+    limit: int,
+    *,
+    before: Optional[Tuple[datetime, str]] = None,
+    after: Optional[Tuple[datetime, str]] = None,
+    with_sources: bool = True,
+) -> Tuple[List[Message], bool]:
+    """One page of a session's messages (oldest first), keyset-paginated on (created_at, id).
+
+    before/after are the (created_at, id) of a message: the page holds the
+    `limit` messages just older than `before`, or just newer than `after`;
+    with neither, the latest `limit` messages. Returns the page and whether
+    more messages exist beyond it in the direction paged.
+    """
+    key = tuple_(Message.created_at, Message.id)
+    query = db.query(Message).filter(Message.session_id == session_id)
+    if not with_sources:
+        query = query.options(defer(Message.sources_json))
+    if after is not None:
+        rows = query.filter(key > tuple_(*after)).order_by(Message.created_at.asc(), Message.id.asc()).limit(limit + 1).all()
+        return rows[:limit], len(rows) > limit
+    if before is not None:
+        query = query.filter(key < tuple_(*before))
+    rows = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1).all()
+    return list(reversed(rows[:limit])), len(rows) > limit
+
+
+def get_recent_messages(
+    db: Session,
+    session_id: str,
+    limit: int,
+    after: Optional[datetime] = None,
+    exclude_id: Optional[str] = None,
+) -> List[Message]:
+    """Get the most recent messages for a session (oldest first), optionally only those after a timestamp.
+
+    exclude_id leaves one message out (the question being answered, which may
+    be written concurrently with this read).
+
+    Reads the (session_id, created_at) index backwards and skips sources_json,
+    so the cost depends on limit, not on the session length.
+    """
+    query = db.query(Message).options(defer(Message.sources_json)).filter(Message.session_id == session_id)
+    if after is not None:
+        query = query.filter(Message.created_at > after)
+    if exclude_id is not None:
+        query = query.filter(Message.id != exclude_id)
+    recent = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit).all()
+    return list(reversed(recent))
+
+
+def get_oldest_messages(
+    db: Session,
+    session_id: str,
+    limit: int,
+    after: Optional[datetime] = None,
+) -> List[Message]:
+    """Get the oldest messages for a session (oldest first), optionally only those after a timestamp."""
+    query = db.query(Message).options(defer(Message.sources_json)).filter(Message.session_id == session_id)
+    if after is not None:
+        query = query.filter(Message.created_at > after)
+    return query.order_by(Message.created_at.asc(), Message.id.asc()).limit(limit).all()
+
+
 def create_message(
     db: Session,
     *,
@@ -23,7 +95,7 @@ def create_message(
     message_id: Optional[str] = None,
     sources: Optional[List[Dict]] = None
 ) -> Message:
-    """Create a new message in the database."""
+    """Create a new message in the database (and update its session row)."""
     msg = Message(
         id=message_id or str(uuid.uuid4()),
         session_id=session_id,
@@ -34,6 +106,7 @@ def create_message(
     if sources is not None:
         msg.set_sources(sources)
     db.add(msg)
+    touch_session(db, session_id, role=role, content=content, created_at=msg.created_at)
     db.commit()
     db.refresh(msg)
     return msg
@@ -1,81 +1,90 @@
 """Repository for managing chat sessions."""
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime
 
+from app.models.chat_session import ChatSession
 from app.models.message import Message
+from app.models.session_memory import SessionMemory
 
+# Titles are the first user message, cut to this many characters
+_TITLE_LENGTH = 50
 
-def list_sessions(db: Session, limit: Optional[int] = None) -> List[dict]:
-    """List all chat sessions with metadata."""
-    # Get unique session IDs with their latest message timestamp
-    query = (
-        db.query(
-            Message.session_id,
-            func.max(Message.created_at).label("last_activity"),
-            func.count(Message.id).label("message_count"),
-            func.min(Message.created_at).label("created_at"),
-        )
-        .group_by(Message.session_id)
-        .order_by(func.max(Message.created_at).desc())
+
+def session_title(content: str) -> str:
+    """Session title derived from its first user message."""
+    return content[:_TITLE_LENGTH] + "..." if len(content) > _TITLE_LENGTH else content
+
+
+def touch_session(db: Session, session_id: str, *, role: str, content: str, created_at: datetime) -> None:
+    """Count a new message against its session row, creating the row if needed.
+
+    Runs as a single upsert in the caller's transaction (committed together
+    with the message).
+    """
+    stmt = sqlite_insert(ChatSession).values(
+        id=session_id,
+        title=session_title(content) if role == "user" else None,
+        message_count=1,
+        created_at=created_at,
+        last_activity=created_at,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ChatSession.id],
+        set_={
+            "message_count": ChatSession.message_count + 1,
+            "last_activity": func.max(ChatSession.last_activity, stmt.excluded.last_activity),
+            "title": func.coalesce(ChatSession.title, stmt.excluded.title),
+        },
     )
-    
+    db.execute(stmt)
+
+
+def _to_dict(row: ChatSession) -> dict:
+    return {
+        "id": row.id,
+        "title": row.title or "New Chat",
+        "last_activity": row.last_activity.isoformat() if row.last_activity else None,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "message_count": row.message_count or 0,
+    }
+
+
+def list_sessions(
+    db: Session,
+    limit: Optional[int] = None,
+    before: Optional[Tuple[datetime, str]] = None,
+) -> Tuple[List[dict], bool]:
+    """List chat sessions, most recent activity first.
+
+    before is the (last_activity, id) of the last session of the previous
+    page. Returns the page and whether more sessions follow.
+    """
+    query = db.query(ChatSession)
+    if before is not None:
+        query = query.filter(tuple_(ChatSession.last_activity, ChatSession.id) < tuple_(*before))
+    query = query.order_by(ChatSession.last_activity.desc(), ChatSession.id.desc())
+
     if limit:
-        query = query.limit(limit)
-    
-    sessions = query.all()
-    
-    # Get first user message for each session as title
-    result = []
-    for session_id, last_activity, message_count, created_at in sessions:
-        first_message = (
-            db.query(Message)
-            .filter(Message.session_id == session_id, Message.role == "user")
-            .order_by(Message.created_at.asc())
-            .first()
-        )
-        
-        title = first_message.content[:50] + "..." if first_message and len(first_message.content) > 50 else (first_message.content if first_message else "New Chat")
-        
-        result.append({
-            "id": session_id,
-            "title": title,
-            "last_activity": last_activity.isoformat() if last_activity else None,
-            "created_at": created_at.isoformat() if created_at else None,
-            "message_count": message_count,
-        })
-    
-    return result
+        rows = query.limit(limit + 1).all()
+        return [_to_dict(r) for r in rows[:limit]], len(rows) > limit
+    return [_to_dict(r) for r in query.all()], False
 
 
 def delete_session(db: Session, session_id: str) -> bool:
     """Delete all messages for a session."""
     deleted = db.query(Message).filter(Message.session_id == session_id).delete()
+    db.query(SessionMemory).filter(SessionMemory.session_id == session_id).delete()
+    db.query(ChatSession).filter(ChatSession.id == session_id).delete()
     db.commit()
     return deleted > 0
 
 
 def get_session_summary(db: Session, session_id: str) -> Optional[dict]:
     """Get summary information for a session."""
-    messages = (
-        db.query(Message)
-        .filter(Message.session_id == session_id)
-        .order_by(Message.created_at.asc())
-        .all()
-    )
-    
-    if not messages:
+    row = db.get(ChatSession, session_id)
+    if not row or not row.message_count:
         return None
-    
-    first_message = next((m for m in messages if m.role == "user"), None)
-    last_message = messages[-1] if messages else None
-    
-    return {
-        "id": session_id,
-        "message_count": len(messages),
-        "created_at": messages[0].created_at.isoformat() if messages else None,
-        "last_activity": last_message.created_at.isoformat() if last_message else None,
-        "title": first_message.content[:50] + "..." if first_message and len(first_message.content) > 50 else (first_message.content if first_message else "New Chat"),
-    }
-
+    return _to_dict(row)
@@ -18,6 +18,7 @@ class ChatRequest(BaseModel):
     question: str
     sessionId: str
     documentId: Optional[str] = None
+    documentIds: Optional[List[str]] = None  # Compare several documents (merged with documentId)
     includeImages: Optional[bool] = True
     stream: Optional[bool] = False
 
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Dict, Any
 
 
 class DocumentRead(BaseModel):
@@ -9,5 +9,6 @@ class DocumentRead(BaseModel):
     status: Optional[str] = "completed"
     progress: Optional[int] = 0  # 0-100 percentage
     createdAt: str
+    stats: Optional[Dict[str, Any]] = None  # Ingest statistics (counts, image preprocessing, timings)
 
 
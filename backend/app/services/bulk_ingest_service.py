@@ -0,0 +1,233 @@
+"""Bulk ingestion: register many PDFs at once and report on the batch.
+
+Used by POST /upload/bulk and `python -m app.ingest`. Each PDF is streamed
+into uploads_dir (hashed on the way), skipped when a document with the same
+sha256 already exists, and otherwise queued as an ingest job with
+JOB_PRIORITY_BULK in the batch quota lane, so interactive uploads and chat
+keep precedence. Parsing then runs on however many job workers are
+available. A batch manifest in <data_dir>/batches/ ties the files to their
+documents; batch_report() joins it with document and job state.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.document import Document
+from app.repositories.document_repo import create_document
+from app.services.ingest_service import INGEST_JOB, count_pages
+from app.services.job_queue import enqueue, latest_jobs_for_docs
+from app.utils import quota
+from app.utils.file import FileTooLargeError, load_json, save_json, save_stream
+
+logger = logging.getLogger(__name__)
+
+# Serializes "is this hash known?" + "create document" so identical files in one batch are caught
+_register_lock = threading.Lock()
+
+
+def batches_dir() -> str:
+    return os.path.join(settings.data_dir, "batches")
+
+
+def new_batch_id() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+
+
+def _find_existing(db, sha256: str) -> Optional[Document]:
+    """A document with this content that is ingested or still in progress (failed ones may be retried)."""
+    return (
+        db.query(Document)
+        .filter(Document.sha256 == sha256, Document.status != "failed")
+        .order_by(Document.created_at.asc())
+        .first()
+    )
+
+
+def register_pdf(src: BinaryIO, filename: str, *, batch_id: str) -> Dict[str, Any]:
+    """Store one PDF and queue it for ingestion unless its content is already known.
+
+    Blocking (disk I/O, hashing, page count); call from a thread. Returns
+    the manifest entry: status is "queued", "duplicate" or "rejected".
+    """
+    name = os.path.basename(filename.replace("\\", "/")) or "document.pdf"
+    entry: Dict[str, Any] = {"name": filename, "doc_id": None, "status": "rejected", "error": None}
+    if not name.lower().endswith(".pdf"):
+        entry["error"] = "Not a PDF"
+        return entry
+
+    doc_id = str(uuid.uuid4())
+    doc_dir = os.path.join(settings.uploads_dir, doc_id)
+    file_path = os.path.join(doc_dir, name)
+    try:
+        size, sha256 = save_stream(
+            src, file_path,
+            max_bytes=settings.max_upload_mb * 1024 * 1024,
+            chunk_size=settings.upload_chunk_kb * 1024,
+            temp_dir=settings.uploads_dir,
+        )
+    except FileTooLargeError:
+        entry["error"] = f"File too large. Max {settings.max_upload_mb}MB"
+        return entry
+    except (OSError, zipfile.BadZipFile) as e:
+        shutil.rmtree(doc_dir, ignore_errors=True)
+        entry["error"] = f"Failed to read file: {e}"
+        return entry
+    entry.update(size=size, sha256=sha256)
+
+    pages = count_pages(file_path)
+    db = SessionLocal()
+    try:
+        with _register_lock:
+            existing = _find_existing(db, sha256)
+            existing_id = existing.id if existing is not None else None
+            if existing_id is None:
+                create_document(db, id=doc_id, name=name, pages=pages, status="processing",
+                                created_at=datetime.now(timezone.utc), sha256=sha256)
+    finally:
+        db.close()
+
+    if existing_id is not None:
+        shutil.rmtree(doc_dir, ignore_errors=True)
+        logger.info("⏭️  Skipping %s: same content as document %s", filename, existing_id)
+        entry.update(status="duplicate", doc_id=existing_id)
+        return entry
+
+    enqueue(
+        INGEST_JOB,
+        {"doc_id": doc_id, "file_path": file_path, "doc_dir": doc_dir, "filename": name, "pages": pages,
+         "lane": quota.BATCH, "batch_id": batch_id},
+        doc_id=doc_id,
+        priority=settings.job_priority_bulk,
+    )
+    entry.update(status="queued", doc_id=doc_id, pages=pages)
+    return entry
+
+
+def iter_zip_pdfs(archive: BinaryIO) -> Iterator[Tuple[str, Optional[BinaryIO], Optional[str]]]:
+    """Yield (member name, open file, None) for each PDF in a zip, or (name, None, error) for rejects.
+
+    Members declaring more than MAX_UPLOAD_MB are rejected without reading;
+    save_stream still enforces the limit on the real (decompressed) size.
+    """
+    max_bytes = settings.max_upload_mb * 1024 * 1024
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                continue
+            if not info.filename.lower().endswith(".pdf"):
+                yield info.filename, None, "Not a PDF"
+            elif info.file_size > max_bytes:
+                yield info.filename, None, f"File too large. Max {settings.max_upload_mb}MB"
+            else:
+                with zf.open(info) as member:
+                    yield info.filename, member, None
+
+
+def register_zip(archive: BinaryIO, archive_name: str, *, batch_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Register every PDF inside a zip archive (blocking), at most limit entries."""
+    entries: List[Dict[str, Any]] = []
+    try:
+        for name, member, error in iter_zip_pdfs(archive):
+            label = f"{archive_name}/{name}"
+            if limit is not None and len(entries) >= limit:
+                entries.append({"name": archive_name, "doc_id": None, "status": "rejected",
+                                "error": f"File limit reached at {label}; remaining members skipped"})
+                break
+            if member is None:
+                entries.append({"name": label, "doc_id": None, "status": "rejected", "error": error})
+                continue
+            entry = register_pdf(member, name, batch_id=batch_id)
+            entry["name"] = label
+            entries.append(entry)
+    except zipfile.BadZipFile as e:
+        entries.append({"name": archive_name, "doc_id": None, "status": "rejected", "error": f"Bad zip file: {e}"})
+    return entries
+
+
+def save_batch(batch_id: str, entries: List[Dict[str, Any]], *, source: str) -> None:
+    save_json(os.path.join(batches_dir(), f"{batch_id}.json"), {
+        "batch_id": batch_id,
+        "source": source,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "entries": entries,
+    })
+
+
+def batch_report(batch_id: str) -> Optional[Dict[str, Any]]:
+    """Per-document status, timings and errors for a batch (None if unknown)."""
+    path = os.path.join(batches_dir(), f"{os.path.basename(batch_id)}.json")
+    manifest = load_json(path)
+    if not manifest:
+        return None
+
+    entries = manifest.get("entries", [])
+    queued_ids = [e["doc_id"] for e in entries if e.get("status") == "queued" and e.get("doc_id")]
+    jobs = latest_jobs_for_docs(queued_ids, kind=INGEST_JOB)
+    db = SessionLocal()
+    try:
+        statuses: Dict[str, str] = {}
+        for i in range(0, len(queued_ids), 500):
+            chunk = queued_ids[i:i + 500]
+            statuses.update(db.query(Document.id, Document.status).filter(Document.id.in_(chunk)).all())
+    finally:
+        db.close()
+
+    documents = []
+    counts: Dict[str, int] = {}
+    for entry in entries:
+        item = dict(entry)
+        if entry.get("status") == "queued":
+            job = jobs.get(entry["doc_id"]) or {}
+            doc_status = statuses.get(entry["doc_id"])
+            if doc_status is None:
+                item["status"] = "deleted"
+            elif doc_status in ("completed", "failed", "cancelled"):
+                item["status"] = doc_status
+            elif job.get("status") == "cancelled":
+                item["status"] = "cancelled"
+            else:
+                item["status"] = "processing" if job.get("status") == "running" else "queued"
+            item.update(
+                attempts=job.get("attempts"),
+                wait_s=job.get("wait_s"),
+                run_s=job.get("run_s"),
+            )
+            if item["status"] == "failed":
+                item["error"] = job.get("last_error") or item.get("error")
+        counts[item["status"]] = counts.get(item["status"], 0) + 1
+        documents.append(item)
+
+    run_times = [d["run_s"] for d in documents if d.get("status") == "completed" and d.get("run_s") is not None]
+    return {
+        "batch_id": manifest.get("batch_id", batch_id),
+        "source": manifest.get("source"),
+        "created_at": manifest.get("created_at"),
+        "total": len(documents),
+        "counts": counts,
+        "done": not any(d["status"] in ("queued", "processing") for d in documents),
+        "run_s_total": round(sum(run_times), 2),
+        "documents": documents,
+    }
+
+
+def wait_for_batch(batch_id: str, *, poll_s: float = 5.0, on_poll=None) -> Dict[str, Any]:
+    """Block until every queued document of the batch completed, failed or was cancelled; returns the final report."""
+    while True:
+        report = batch_report(batch_id)
+        if report is None:
+            raise ValueError(f"Unknown batch: {batch_id}")
+        if on_poll:
+            on_poll(report)
+        if report["done"]:
+            return report
+        time.sleep(poll_s)
@@ -0,0 +1,213 @@
+"""Token-budgeted context assembly for the chat prompt.
+
+Retrieved parents are deduplicated, adjacent chunks from the same page are
+merged, and a token budget is spread across the remaining blocks in
+proportion to their retrieval score. Blocks are trimmed at sentence
+boundaries so the best evidence survives intact and the prompt size tracks
+what Gemini bills.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.utils.tokens import count_tokens, truncate_to_tokens
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+_WORD_RE = re.compile(r"\w+")
+
+# Shingle overlap above which two parents count as near-duplicates
+_NEAR_DUPLICATE_JACCARD = 0.8
+# Shortest shared boundary between neighbouring chunks worth stripping
+_MIN_OVERLAP_CHARS = 40
+_MAX_OVERLAP_CHARS = 1000
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _strip_overlap(previous: str, following: str) -> str:
+    """Remove the start of `following` that repeats the end of `previous`."""
+    longest = min(len(previous), len(following), _MAX_OVERLAP_CHARS)
+    for size in range(longest, _MIN_OVERLAP_CHARS - 1, -1):
+        if following.startswith(previous[-size:]):
+            return following[size:].lstrip()
+    return following
+
+
+def _candidates(parents: List[Dict[str, Any]], scores: Optional[List[float]]) -> List[Dict[str, Any]]:
+    """Text/table parents with a score (rank-based when no scores are given)."""
+    items: List[Dict[str, Any]] = []
+    for rank, p in enumerate(parents):
+        if not isinstance(p, dict) or p.get("type") not in {"text", "table"}:
+            continue
+        text = (p.get("text") or "").strip()
+        if not text:
+            continue
+        if scores is not None and rank < len(scores) and scores[rank] is not None:
+            score = float(scores[rank])
+        else:
+            score = 1.0 / (rank + 1)
+        items.append({
+            "type": p.get("type"),
+            "text": text,
+            "page_number": p.get("page_number"),
+            "source": p.get("source"),
+            "chunk_index": p.get("chunk_index"),
+            "score": score,
+            "rank": rank,
+        })
+    return items
+
+
+def _dedupe(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop exact, contained and near-duplicate parents, keeping the best scored copy."""
+    kept: List[Dict[str, Any]] = []
+    for item in sorted(items, key=lambda x: x["score"], reverse=True):
+        norm = _normalize(item["text"])
+        shingles = _shingles(item["text"])
+        duplicate = False
+        for other in kept:
+            other_norm = other["_norm"]
+            if norm in other_norm:
+                duplicate = True
+            elif other_norm in norm:
+                # The new parent is a superset: keep its text under the better score
+                other.update({k: v for k, v in item.items() if k not in ("score", "rank")})
+                other["_norm"], other["_shingles"] = norm, shingles
+                duplicate = True
+            else:
+                union = len(shingles | other["_shingles"])
+                duplicate = bool(union) and len(shingles & other["_shingles"]) / union >= _NEAR_DUPLICATE_JACCARD
+            if duplicate:
+                break
+        if not duplicate:
+            kept.append({**item, "_norm": norm, "_shingles": shingles})
+    for item in kept:
+        item.pop("_norm", None)
+        item.pop("_shingles", None)
+    return kept
+
+
+def _merge_neighbours(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge text chunks from the same source and page into one block.
+
+    Chunks with a chunk_index are merged only when consecutive; older indexes
+    without it merge on page alone. The block keeps the best score.
+    """
+    blocks: List[Dict[str, Any]] = []
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for item in items:
+        if item["type"] != "text" or item["page_number"] is None:
+            blocks.append(item)
+            continue
+        groups.setdefault((item["source"], item["page_number"]), []).append(item)
+
+    for group in groups.values():
+        group.sort(key=lambda x: (x["chunk_index"] is None, x["chunk_index"] or 0, x["rank"]))
+        current = dict(group[0])
+        for item in group[1:]:
+            consecutive = (
+                current["chunk_index"] is None
+                or item["chunk_index"] is None
+                or item["chunk_index"] == current["chunk_index"] + 1
+            )
+            if consecutive:
+                current["text"] = current["text"] + "\n" + _strip_overlap(current["text"], item["text"])
+                current["score"] = max(current["score"], item["score"])
+                current["rank"] = min(current["rank"], item["rank"])
+                if item["chunk_index"] is not None:
+                    current["chunk_index"] = item["chunk_index"]
+            else:
+                blocks.append(current)
+                current = dict(item)
+        blocks.append(current)
+    return blocks
+
+
+def _trim_to_sentences(text: str, max_tokens: int) -> str:
+    """Longest prefix of whole sentences within max_tokens (hard cut if the first sentence is too long)."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    kept: List[str] = []
+    used = 0
+    for sentence in _SENTENCE_END_RE.split(text):
+        tokens = count_tokens(sentence) + 1
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    if kept:
+        return " ".join(kept)
+    return truncate_to_tokens(text, max_tokens).rstrip() + "…"
+
+
+def _label(block: Dict[str, Any]) -> str:
+    parts = ["Table" if block["type"] == "table" else "Text"]
+    if block.get("source"):
+        parts.append(str(block["source"]))
+    if block.get("page_number") is not None:
+        parts.append(f"page {block['page_number']}")
+    return "[" + ", ".join(parts) + "]"
+
+
+def _allocate(needs: List[int], weights: List[float], budget: int) -> List[int]:
+    """Split budget in proportion to weights, never giving a block more than it needs.
+
+    Blocks that fit within their share get exactly what they need and the
+    surplus is redistributed among the rest (water-filling).
+    """
+    allocation = [0] * len(needs)
+    active = set(range(len(needs)))
+    left = budget
+    while active and left > 0:
+        total_weight = sum(weights[i] for i in active)
+        satisfied = [i for i in active if needs[i] <= left * weights[i] / total_weight]
+        if not satisfied:
+            for i in active:
+                allocation[i] = int(left * weights[i] / total_weight)
+            break
+        for i in satisfied:
+            allocation[i] = needs[i]
+            left -= needs[i]
+            active.remove(i)
+    return allocation
+
+
+def build_context(
+    parents: List[Dict[str, Any]],
+    scores: Optional[List[float]] = None,
+    *,
+    max_tokens: Optional[int] = None,
+) -> str:
+    """Assemble prompt context from retrieved parents within a token budget.
+
+    scores are the retrieval scores aligned with parents (higher = better).
+    Blocks are emitted best-first, each under a short source/page label.
+    """
+    budget = max_tokens if max_tokens is not None else settings.chat_context_max_tokens
+    blocks = _merge_neighbours(_dedupe(_candidates(parents, scores)))
+    blocks.sort(key=lambda b: (-b["score"], b["rank"]))
+
+    labels = [_label(b) for b in blocks]
+    overheads = [count_tokens(label) + 2 for label in labels]
+    needs = [count_tokens(b["text"]) for b in blocks]
+    weights = [max(b["score"], 1e-6) for b in blocks]
+    allocation = _allocate(needs, weights, max(0, budget - sum(overheads)))
+
+    sections: List[str] = []
+    for block, label, allowance in zip(blocks, labels, allocation):
+        if allowance < min(settings.chat_context_min_block_tokens, count_tokens(block["text"])):
+            continue
+        sections.append(f"{label}\n{_trim_to_sentences(block['text'], allowance)}")
+
+    return "\n\n".join(sections)
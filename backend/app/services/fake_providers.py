@@ -0,0 +1,200 @@
+"""Deterministic local stand-ins for the LLM and embedding providers.
+
+Selected with LLM_PROVIDER=fake / EMBEDDING_PROVIDER=fake so the ingest and
+chat pipelines can be benchmarked and soak-tested without network access or
+API quota. Outputs are derived from a hash of the input, so the same input
+always yields the same summary, answer or embedding. Latency, jitter and
+injected 429 errors are configurable in Settings.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import math
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.core.config import settings
+
+# Random source for latency jitter and error injection only - never for outputs
+_rng = random.Random()
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class FakeRateLimitError(Exception):
+    """Simulated Gemini quota error, formatted so rate_limit.py recognises it."""
+
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(
+            f"429 Resource has been exhausted (e.g. check quota). Please retry in {retry_after:.1f}s."
+        )
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _simulated_delay() -> float:
+    """Configured latency plus uniform jitter, in seconds."""
+    jitter = _rng.uniform(-settings.fake_jitter_ms, settings.fake_jitter_ms)
+    return max(0.0, settings.fake_latency_ms + jitter) / 1000.0
+
+
+def _maybe_raise_rate_limit() -> None:
+    if settings.fake_error_rate > 0 and _rng.random() < settings.fake_error_rate:
+        raise FakeRateLimitError(settings.fake_retry_after_s)
+
+
+def _message_text(messages: List[BaseMessage]) -> tuple[str, int]:
+    """Flatten message contents to text and count attached images."""
+    parts: List[str] = []
+    images = 0
+    for message in messages:
+        content = message.content
+        if isinstance(content, str):
+            parts.append(content)
+            continue
+        for block in content:
+            if isinstance(block, str):
+                parts.append(block)
+            elif block.get("type") == "text":
+                parts.append(block.get("text", ""))
+            elif block.get("type") == "image_url":
+                images += 1
+    return "\n".join(parts), images
+
+
+def _after_marker(text: str, marker: str) -> str:
+    idx = text.rfind(marker)
+    return text[idx + len(marker):].strip() if idx >= 0 else text.strip()
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model returning templated, input-derived responses."""
+
+    role: str = "chat"
+    model_name: str = "fake"
+
+    @property
+    def _llm_type(self) -> str:
+        return f"fake-{self.role}"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"role": self.role, "model_name": self.model_name}
+
+    def _respond(self, messages: List[BaseMessage]) -> str:
+        text, images = _message_text(messages)
+        tag = _digest(text)
+        if self.role == "image_summarizer" or (images and self.role != "chat"):
+            return (
+                f"The image shows a figure from the document (ref {tag}). "
+                f"It contains labelled visual elements, axes or diagram components, "
+                f"and supporting text that relates to the surrounding section."
+            )
+        if self.role == "text_summarizer":
+            content = _after_marker(text.split("Summary:")[0], "Content:")
+            words = content.split()
+            lead = " ".join(words[:40]) if words else "empty content"
+            return f"{lead} (summary {tag}, {len(words)} words)"
+        question = _after_marker(text, "Current Question:")
+        return (
+            f"Based on the provided context, here is an answer to: {question} "
+            f"The relevant sections describe the topic in detail, covering its main components, "
+            f"how they interact, and the results reported in the document. "
+            f"Key points are summarised above with reference {tag}."
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(_simulated_delay())
+        _maybe_raise_rate_limit()
+        message = AIMessage(content=self._respond(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(_simulated_delay())
+        _maybe_raise_rate_limit()
+        message = AIMessage(content=self._respond(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(_simulated_delay())
+        _maybe_raise_rate_limit()
+        for token in re.findall(r"\S+\s*", self._respond(messages)):
+            time.sleep(settings.fake_stream_token_delay_ms / 1000.0)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(_simulated_delay())
+        _maybe_raise_rate_limit()
+        for token in re.findall(r"\S+\s*", self._respond(messages)):
+            await asyncio.sleep(settings.fake_stream_token_delay_ms / 1000.0)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+class FakeEmbeddings(Embeddings):
+    """Hashed-feature embeddings: words and bigrams hashed into a fixed dimension.
+
+    Texts sharing vocabulary end up close in cosine space, so retrieval still
+    behaves sensibly in benchmarks.
+    """
+
+    def __init__(self, dim: int | None = None):
+        self.dim = dim or settings.fake_embedding_dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        words = _WORD_RE.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for feature in features:
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+            vector[h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm == 0:
+            vector[0] = 1.0
+            return vector
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(_simulated_delay())
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(_simulated_delay())
+        return self._embed(text)
@@ -0,0 +1,208 @@
+"""Image preprocessing before vision summarization.
+
+Extracted PDF images are downscaled, recompressed and filtered before they are
+sent to the image summarizer, so decorative images (icons, rules, logos, blank
+areas) never cost a Gemini request.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import io
+import logging
+import math
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from app.core.config import settings
+
+# Pillow is imported on first use (only ingestion needs it)
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+_MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "GIF": "image/gif",
+}
+
+# Thumbnail size used for entropy / histogram checks (cheap and good enough)
+_ANALYSIS_SIZE = (64, 64)
+
+
+def _empty_stats() -> Dict[str, int]:
+    return {
+        "total": 0,
+        "kept": 0,
+        "skipped": 0,
+        "skipped_small": 0,
+        "skipped_low_entropy": 0,
+        "skipped_uniform": 0,
+        "skipped_invalid": 0,
+        "resized": 0,
+        "recompressed": 0,
+        "bytes_in": 0,
+        "bytes_out": 0,
+    }
+
+
+def _grayscale_entropy(img: Image.Image) -> float:
+    """Shannon entropy (bits) of the grayscale histogram of a thumbnail."""
+    histogram = img.convert("L").histogram()
+    total = sum(histogram)
+    if total == 0:
+        return 0.0
+    entropy = 0.0
+    for count in histogram:
+        if count:
+            p = count / total
+            entropy -= p * math.log2(p)
+    return entropy
+
+
+def _dominant_color_ratio(img: Image.Image) -> float:
+    """Fraction of pixels that fall into the most common (quantized) color bin."""
+    # Drop the 4 low bits per channel so JPEG noise doesn't split a flat area
+    quantized = img.convert("RGB").point(lambda v: v & 0xF0)
+    colors = quantized.getcolors(maxcolors=4096)
+    if not colors:
+        # More than 4096 distinct colors - definitely not uniform
+        return 0.0
+    total = sum(count for count, _ in colors)
+    return max(count for count, _ in colors) / total if total else 1.0
+
+
+def _flatten_alpha(img: Image.Image) -> Image.Image:
+    """Composite transparent images onto white so they can be saved as JPEG."""
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        from PIL import Image
+
+        rgba = img.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.split()[-1])
+        return background
+    return img.convert("RGB")
+
+
+def _skip_reason(raw: bytes, img: Image.Image) -> Optional[str]:
+    """Return why an image should be skipped, or None to keep it."""
+    width, height = img.size
+    if (
+        len(raw) < settings.image_min_bytes
+        or width * height < settings.image_min_area_px
+        or min(width, height) < settings.image_min_side_px
+    ):
+        return "small"
+
+    thumb = img.copy()
+    thumb.thumbnail(_ANALYSIS_SIZE)
+    if _grayscale_entropy(thumb) < settings.image_min_entropy:
+        return "low_entropy"
+    if _dominant_color_ratio(thumb) >= settings.image_uniform_ratio:
+        return "uniform"
+    return None
+
+
+def preprocess_image(b64: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    """Filter, downscale and recompress a single base64 image.
+
+    Returns (image, status) where image is None when the image was skipped.
+    status is one of: "kept", "resized", "small", "low_entropy", "uniform", "invalid".
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        raw = base64.b64decode(b64, validate=False)
+        img = Image.open(io.BytesIO(raw))
+        img.load()
+    except (binascii.Error, ValueError, UnidentifiedImageError, OSError) as e:
+        logger.debug("Could not decode image for preprocessing: %s", e)
+        return None, "invalid"
+
+    reason = _skip_reason(raw, img)
+    if reason:
+        return None, reason
+
+    source_format = (img.format or "JPEG").upper()
+    status = "kept"
+    max_edge = settings.image_max_edge_px
+    if max_edge > 0 and max(img.size) > max_edge:
+        img = img.copy()
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        status = "resized"
+
+    out_format = settings.image_output_format.upper()
+    if out_format not in ("JPEG", "WEBP"):
+        out_format = "JPEG"
+
+    buffer = io.BytesIO()
+    _flatten_alpha(img).save(buffer, format=out_format, quality=settings.image_output_quality)
+    encoded = buffer.getvalue()
+
+    # Keep the original bytes if recompression didn't help and nothing was resized
+    if status == "kept" and len(encoded) >= len(raw):
+        encoded = raw
+        out_format = source_format
+
+    return {
+        "b64": base64.b64encode(encoded).decode("ascii"),
+        "mime_type": _MIME_TYPES.get(out_format, "image/jpeg"),
+        "width": img.size[0],
+        "height": img.size[1],
+        "bytes": len(encoded),
+        "original_bytes": len(raw),
+    }, status
+
+
+def preprocess_images(images: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Preprocess normalized image parents before summarization.
+
+    Returns the images that should be summarized (with b64 replaced by the
+    processed payload) and statistics about what was skipped or resized.
+    """
+    stats = _empty_stats()
+    kept: List[Dict[str, Any]] = []
+
+    for image in images:
+        b64 = image.get("b64")
+        if not b64:
+            continue
+        stats["total"] += 1
+
+        if not settings.image_preprocess_enabled:
+            kept.append(image)
+            stats["kept"] += 1
+            continue
+
+        processed, status = preprocess_image(b64)
+        if processed is None:
+            stats["skipped"] += 1
+            stats[f"skipped_{status}"] += 1
+            continue
+
+        stats["kept"] += 1
+        stats["bytes_in"] += processed["original_bytes"]
+        stats["bytes_out"] += processed["bytes"]
+        if status == "resized":
+            stats["resized"] += 1
+        if processed["bytes"] != processed["original_bytes"]:
+            stats["recompressed"] += 1
+
+        kept.append({
+            **image,
+            "b64": processed["b64"],
+            "mime_type": processed["mime_type"],
+            "width": processed["width"],
+            "height": processed["height"],
+        })
+
+    logger.info(
+        "Image preprocessing: total=%d kept=%d skipped=%d (small=%d, low_entropy=%d, uniform=%d, invalid=%d) "
+        "resized=%d bytes %d -> %d",
+        stats["total"], stats["kept"], stats["skipped"], stats["skipped_small"],
+        stats["skipped_low_entropy"], stats["skipped_uniform"], stats["skipped_invalid"],
+        stats["resized"], stats["bytes_in"], stats["bytes_out"],
+    )
+    return kept, stats
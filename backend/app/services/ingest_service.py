@@ -0,0 +1,274 @@
+"""Document ingestion: parse, summarize and index an uploaded PDF.
+
+Runs as an "ingest" job on the durable job queue (see job_queue), either in
+a worker thread of the web app or in `python -m app.worker` processes.
+
+cancel_ingest() stops a document's ingestion: queued jobs are dropped and
+a running one stops at its next chunk. The document status "cancelled" is
+the signal across processes; ingestion in this process is also told
+directly. A cancelled or deleted document gets no vectors.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, cast
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.repositories.document_repo import get_document_by_id, update_document_stats, update_document_status
+from app.services.job_queue import PermanentJobError, TransientJobError, cancel_jobs, register_handler
+from app.services.pdf_service import process_pdf
+from app.services.progress_service import IngestProgress
+from app.services.summary_service import build_summaries, persist_summaries
+from app.services.vector_service import discard_document_index, index_multivector
+from app.utils import quota
+from app.utils.cancellation import CancelToken, OperationCancelled
+
+# Job kind for document ingestion
+INGEST_JOB = "ingest"
+
+# Cancel tokens of ingestions running in this process
+_active: Dict[str, CancelToken] = {}
+_active_lock = threading.Lock()
+
+
+def count_pages(file_path: str) -> int:
+    """Page count of a PDF (0 if it can't be read). Blocking; call from a thread."""
+    from pypdf import PdfReader
+
+    try:
+        reader = PdfReader(file_path)
+        return len(cast(list, reader.pages))
+    except Exception:
+        return 0
+
+
+def _cancel_requested(doc_id: str) -> bool:
+    """Cancelled or deleted (possibly from another process)."""
+    db = SessionLocal()
+    try:
+        doc = get_document_by_id(db, id=doc_id)
+        return doc is None or doc.status == "cancelled"
+    finally:
+        db.close()
+
+
+def _persister(db, doc_id: str):
+    return lambda status, percent: update_document_status(db, id=doc_id, status=status, progress=percent)
+
+
+def cancel_ingest(doc_id: str) -> Dict[str, int]:
+    """Cancel a document's ingestion; returns the number of queued/running jobs affected."""
+    db = SessionLocal()
+    try:
+        # Marks the document "cancelled" (what workers in other processes look for) and tells subscribers
+        IngestProgress(doc_id, _persister(db, doc_id)).cancel()
+    finally:
+        db.close()
+    jobs = cancel_jobs(doc_id)
+    with _active_lock:
+        token = _active.get(doc_id)
+    if token is not None:
+        token.cancel()
+    logging.info("⏹️  Cancellation requested for doc_id=%s (queued jobs dropped=%d, running=%d)",
+                 doc_id, jobs["queued"], jobs["running"])
+    return jobs
+
+
+def process_upload_background(doc_id: str, file_path: str, doc_dir: str, filename: str, pages: int,
+                              lane: str = quota.BACKGROUND):
+    """Process an uploaded PDF: parse, summarize, index (runs as an "ingest" job).
+
+    lane is the quota lane for the summarization calls (bulk ingestion uses
+    the batch lane so it yields to uploads and chat).
+    """
+    db = SessionLocal()
+    start_time = time.time()
+    # Pushes events to /upload/events subscribers; DB writes are throttled
+    progress = IngestProgress(doc_id, _persister(db, doc_id))
+    cancel_token = CancelToken(lambda: _cancel_requested(doc_id), probe_interval_s=settings.cancel_check_interval_s)
+    with _active_lock:
+        _active[doc_id] = cancel_token
+    try:
+        cancel_token.raise_if_cancelled()
+        logging.info("Starting background processing for doc_id=%s", doc_id)
+        
+        # 1) Extract PDF and chunk (0-10%)
+        logging.info("[STEP 1/5] Starting PDF parsing and chunking...")
+        progress.stage("parsing", 0)
+        pdf_start = time.time()
+        
+        parents = process_pdf(file_path, doc_dir)
+        
+        pdf_elapsed = time.time() - pdf_start
+        num_texts = len(parents.get("texts", []))
+        num_tables = len(parents.get("tables", []))
+        num_images = len(parents.get("images", []))
+        logging.info("[STEP 1/5] PDF parsing completed in %.1f seconds: texts=%d, tables=%d, images=%d", 
+                    pdf_elapsed, num_texts, num_tables, num_images)
+        progress.set_counts(texts=num_texts, tables=num_tables, images=num_images)
+        cancel_token.raise_if_cancelled()
+
+        # 2) Build summaries (10-80% - progress updates per chunk)
+        logging.info("[STEP 2/5] Starting summarization (texts: %d, images: %d)...", num_texts + num_tables, num_images)
+        progress.stage("summarizing", 10)
+        summary_start = time.time()
+        
+        # Progress callback to update during summarization (10-80% range)
+        def update_summary_progress(percent: int, done: int, total: int):
+            progress.update(percent, done=done, total=total)
+        
+        try:
+            # Summaries run in the background (or batch) lane so chat traffic keeps priority on quota
+            with quota.use_lane(lane):
+                summaries = build_summaries(
+                    parents, progress_callback=update_summary_progress, cancel_token=cancel_token
+                )
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            # Short error message
+            error_str = str(e).lower()
+            if "api key" in error_str or "api_key" in error_str:
+                # Permanent failure - API key is invalid
+                error_msg = "API key invalid - check GOOGLE_API_KEY in .env"
+                logging.error(error_msg)
+                progress.fail(error_msg)
+                raise PermanentJobError(error_msg)
+            elif "rate limit" in error_str or "quota" in error_str or "resource exhausted" in error_str:
+                # Temporary failure - rate limit hit after retries exhausted
+                # Note: LangChain should have retried, but if we're here, retries failed
+                error_msg = "Rate limit/quota exceeded after retries - check Google API quotas or try later"
+                logging.error(error_msg)
+                # The job queue retries later with backoff (and marks the document failed when it gives up)
+                raise TransientJobError(error_msg)
+            else:
+                # Other errors
+                short_error = str(e)[:150] + "..." if len(str(e)) > 150 else str(e)
+                error_msg = f"Summary generation failed: {short_error}"
+                logging.error(error_msg)
+                progress.fail(error_msg)
+                raise PermanentJobError(error_msg)
+        
+        summary_elapsed = time.time() - summary_start
+        image_stats = summaries.get("image_stats") or {}
+        logging.info("[STEP 2/5] Summarization completed in %.1f seconds: text_table=%d, images=%d "
+                    "(images skipped=%d, resized=%d)",
+                    summary_elapsed,
+                    len(summaries.get("text_table_summaries", [])), 
+                    len(summaries.get("image_summaries", [])),
+                    image_stats.get("skipped", 0),
+                    image_stats.get("resized", 0))
+        
+        # 3) Save summaries (80-90%)
+        logging.info("[STEP 3/5] Saving summaries to JSON...")
+        progress.stage("saving", 80)
+        persist_summaries(doc_dir, summaries)
+        logging.info("[STEP 3/5] Persisted summaries to %s", os.path.join(doc_dir, "summaries.json"))
+        
+        # 4) Index document (90-100%)
+        logging.info("[STEP 4/5] Indexing document into vector database...")
+        progress.stage("indexing", 90)
+        index_start = time.time()
+        
+        try:
+            index_multivector(doc_id, parents, summaries, cancel_token=cancel_token)
+            index_elapsed = time.time() - index_start
+            logging.info("[STEP 4/5] Indexing completed in %.1f seconds: doc_id=%s", index_elapsed, doc_id)
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            # Short error message
+            error_str = str(e).lower()
+            if "ollama" in error_str or "connection" in error_str:
+                error_msg = f"Ollama connection failed - check if Ollama is running at {settings.ollama_base_url}"
+                logging.error(error_msg)
+                raise TransientJobError(error_msg)
+            elif "chroma" in error_str or "chromadb" in error_str:
+                error_msg = "ChromaDB error - check configuration"
+                logging.error(error_msg)
+            else:
+                short_error = str(e)[:150] + "..." if len(str(e)) > 150 else str(e)
+                error_msg = f"Indexing failed: {short_error}"
+                logging.error(error_msg)
+            progress.fail(error_msg)
+            raise PermanentJobError(error_msg)
+
+        # 5) Mark as completed (100%)
+        total_elapsed = time.time() - start_time
+        logging.info("[STEP 5/5] Finalizing document...")
+        try:
+            # Cancelled (or deleted) while the last batch was written
+            cancel_token.raise_if_cancelled()
+        except OperationCancelled:
+            discard_document_index(doc_id)
+            raise
+        # Kept with the document so GET /api/documents can report them
+        update_document_stats(db, id=doc_id, stats={
+            "texts": num_texts,
+            "tables": num_tables,
+            "images": image_stats or {"total": num_images},
+            "timings_s": {
+                "parsing": round(pdf_elapsed, 1),
+                "summarizing": round(summary_elapsed, 1),
+                "indexing": round(index_elapsed, 1),
+                "total": round(total_elapsed, 1),
+            },
+        })
+        progress.complete()
+        
+        logging.info("✓ Document processing completed in %.1f seconds: id=%s", total_elapsed, doc_id)
+        logging.info("  Breakdown: PDF parsing=%.1fs, Summarization=%.1fs, Indexing=%.1fs", 
+                    pdf_elapsed, summary_elapsed, index_elapsed)
+        if image_stats:
+            logging.info("  Images: extracted=%d, summarized=%d, skipped=%d, resized=%d, bytes %d -> %d",
+                        image_stats.get("total", 0), image_stats.get("kept", 0),
+                        image_stats.get("skipped", 0), image_stats.get("resized", 0),
+                        image_stats.get("bytes_in", 0), image_stats.get("bytes_out", 0))
+    except (TransientJobError, PermanentJobError):
+        raise
+    except OperationCancelled:
+        logging.info("⏹️  Processing cancelled for doc_id=%s after %.1f seconds", doc_id, time.time() - start_time)
+        progress.cancel()
+        raise
+    except Exception as e:
+        # Short error message
+        error_str = str(e).lower()
+        if "api key" in error_str:
+            error_msg = "CRITICAL: API key invalid - set GOOGLE_API_KEY in .env"
+            logging.error(error_msg)
+        elif "ollama" in error_str:
+            error_msg = "CRITICAL: Ollama not accessible - start Ollama service"
+            logging.error(error_msg)
+        else:
+            short_error = str(e)[:150] + "..." if len(str(e)) > 150 else str(e)
+            error_msg = f"Background processing failed: {short_error}"
+            logging.error(error_msg)
+        progress.fail(error_msg)
+        raise PermanentJobError(error_msg) from e
+    finally:
+        with _active_lock:
+            if _active.get(doc_id) is cancel_token:
+                del _active[doc_id]
+        db.close()
+
+
+def _mark_failed(payload: Dict[str, Any], error: str) -> None:
+    """Give-up hook: the ingest job failed for good."""
+    db = SessionLocal()
+    try:
+        doc_id = payload["doc_id"]
+        IngestProgress(doc_id, _persister(db, doc_id)).fail(error)
+    finally:
+        db.close()
+
+
+def run_ingest_job(payload: Dict[str, Any]) -> None:
+    process_upload_background(
+        payload["doc_id"], payload["file_path"], payload["doc_dir"], payload["filename"], payload.get("pages", 0),
+        lane=payload.get("lane", quota.BACKGROUND),
+    )
+
+
+register_handler(INGEST_JOB, run_ingest_job, on_give_up=_mark_failed)
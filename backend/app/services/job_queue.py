@@ -0,0 +1,521 @@
+"""Durable job queue backed by the application database.
+
+Jobs are rows in the jobs table. Workers (threads in the web process and/or
+`python -m app.worker` processes) claim the highest-priority runnable job
+with a single atomic UPDATE and hold a lease that is renewed while the
+handler runs. A failed job is requeued with exponential backoff until
+max_attempts, then given up. A job whose worker died becomes claimable
+again once its lease expires, so queued work survives restarts.
+
+Admission control: at most JOB_MAX_RUNNING jobs run at once across all
+workers (enforced inside the claim), and retry_after_s() tells producers
+to back off while JOB_MAX_QUEUED jobs are waiting. A handler that raises
+OperationCancelled ends its job as "cancelled" without retries.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, func, or_, select, update
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.job import Job
+from app.utils.cancellation import OperationCancelled
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs considered for the timing statistics
+_STATS_WINDOW = 200
+
+
+class TransientJobError(Exception):
+    """Raised by a handler for a failure worth retrying later (rate limits, unreachable services)."""
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for a failure retrying won't fix, after it has recorded the failure itself.
+
+    The job is marked failed at once, without further attempts or the give-up hook.
+    """
+
+
+@dataclass
+class _Handler:
+    run: Callable[[Dict[str, Any]], None]
+    on_give_up: Optional[Callable[[Dict[str, Any], str], None]] = None
+
+
+_handlers: Dict[str, _Handler] = {}
+
+# Wakes in-process workers as soon as a job is enqueued here
+_wakeup = threading.Event()
+
+
+def register_handler(
+    kind: str,
+    run: Callable[[Dict[str, Any]], None],
+    on_give_up: Optional[Callable[[Dict[str, Any], str], None]] = None,
+) -> None:
+    """Register the function that runs jobs of this kind.
+
+    run(payload) raising any exception fails the attempt; on_give_up(payload,
+    error) is called once the job has failed for good.
+    """
+    _handlers[kind] = _Handler(run=run, on_give_up=on_give_up)
+
+
+def new_worker_id(prefix: str = "worker") -> str:
+    return f"{prefix}-{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def enqueue(
+    kind: str,
+    payload: Dict[str, Any],
+    *,
+    doc_id: Optional[str] = None,
+    priority: int = 0,
+    max_attempts: Optional[int] = None,
+) -> str:
+    """Add a job to the queue and return its id."""
+    db = SessionLocal()
+    try:
+        job = Job(
+            id=str(uuid.uuid4()),
+            kind=kind,
+            doc_id=doc_id,
+            payload_json=json.dumps(payload, ensure_ascii=False),
+            status="queued",
+            priority=priority,
+            attempts=0,
+            max_attempts=max_attempts or settings.job_max_attempts,
+            run_after=datetime.utcnow(),
+            created_at=datetime.utcnow(),
+        )
+        db.add(job)
+        db.commit()
+        logger.info("📥 Enqueued %s job %s (priority=%d, doc_id=%s)", kind, job.id, priority, doc_id)
+        _wakeup.set()
+        return job.id
+    finally:
+        db.close()
+
+
+def _runnable(now: datetime):
+    return or_(
+        and_(Job.status == "queued", Job.run_after <= now),
+        # Worker died or stalled: its lease ran out
+        and_(Job.status == "running", Job.lease_expires_at < now, Job.attempts < Job.max_attempts),
+    )
+
+
+def claim(worker_id: str) -> Optional[Dict[str, Any]]:
+    """Atomically take the next runnable job this process has a handler for."""
+    if not _handlers:
+        return None
+    now = datetime.utcnow()
+    candidate = (
+        select(Job.id)
+        .where(_runnable(now), Job.kind.in_(list(_handlers)))
+        .order_by(Job.priority.desc(), Job.created_at.asc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    conditions = [Job.id == candidate, _runnable(now)]
+    if settings.job_max_running > 0:
+        # Counted in the same statement, so concurrent claims can't overshoot the cap
+        running = (
+            select(func.count(Job.id))
+            .where(Job.status == "running", Job.lease_expires_at >= now)
+            .scalar_subquery()
+        )
+        conditions.append(running < settings.job_max_running)
+    stmt = (
+        update(Job)
+        .where(*conditions)
+        .values(
+            status="running",
+            lease_owner=worker_id,
+            lease_expires_at=now + timedelta(seconds=settings.job_lease_s),
+            attempts=Job.attempts + 1,
+            started_at=now,
+        )
+        .returning(Job.id, Job.kind, Job.doc_id, Job.payload_json, Job.attempts, Job.max_attempts)
+        .execution_options(synchronize_session=False)
+    )
+    db = SessionLocal()
+    try:
+        row = db.execute(stmt).first()
+        db.commit()
+    finally:
+        db.close()
+    if row is None:
+        return None
+    return {
+        "id": row.id,
+        "kind": row.kind,
+        "doc_id": row.doc_id,
+        "payload": json.loads(row.payload_json or "{}"),
+        "attempts": row.attempts,
+        "max_attempts": row.max_attempts,
+    }
+
+
+def _update_owned(job_id: str, worker_id: str, **values: Any) -> bool:
+    """Update a job only while this worker still holds its lease."""
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.lease_owner == worker_id, Job.status == "running")
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount == 1
+    finally:
+        db.close()
+
+
+def heartbeat(job_id: str, worker_id: str) -> bool:
+    """Extend the lease; False if the job is no longer ours."""
+    expires = datetime.utcnow() + timedelta(seconds=settings.job_lease_s)
+    return _update_owned(job_id, worker_id, lease_expires_at=expires)
+
+
+def _backoff_s(attempts: int) -> float:
+    delay = min(settings.job_retry_max_s, settings.job_retry_base_s * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _give_up(kind: str, payload: Dict[str, Any], error: str) -> None:
+    handler = _handlers.get(kind)
+    if handler and handler.on_give_up:
+        try:
+            handler.on_give_up(payload, error)
+        except Exception as e:
+            logger.warning("Give-up hook for %s job failed: %s", kind, e)
+
+
+def _finish_attempt(
+    job: Dict[str, Any], worker_id: str, error: Optional[str], cancelled: bool = False, permanent: bool = False
+) -> None:
+    now = datetime.utcnow()
+    if cancelled:
+        _update_owned(job["id"], worker_id, status="cancelled", last_error="Cancelled", finished_at=now,
+                      lease_owner=None, lease_expires_at=None)
+        return
+    if error is None:
+        _update_owned(job["id"], worker_id, status="succeeded", finished_at=now,
+                      lease_owner=None, lease_expires_at=None)
+        return
+    if permanent:
+        if _update_owned(job["id"], worker_id, status="failed", last_error=error, finished_at=now,
+                         lease_owner=None, lease_expires_at=None):
+            logger.error("❌ %s job %s failed: %s", job["kind"], job["id"], error)
+        return
+    if job["attempts"] < job["max_attempts"]:
+        delay = _backoff_s(job["attempts"])
+        if _update_owned(job["id"], worker_id, status="queued", last_error=error,
+                         run_after=now + timedelta(seconds=delay), lease_owner=None, lease_expires_at=None):
+            logger.warning("🔁 %s job %s failed (attempt %d/%d), retrying in %.0fs: %s",
+                           job["kind"], job["id"], job["attempts"], job["max_attempts"], delay, error)
+        return
+    if _update_owned(job["id"], worker_id, status="failed", last_error=error, finished_at=now,
+                     lease_owner=None, lease_expires_at=None):
+        logger.error("❌ %s job %s failed after %d attempts: %s", job["kind"], job["id"], job["attempts"], error)
+        _give_up(job["kind"], job["payload"], error)
+
+
+def cancel_jobs(doc_id: str) -> Dict[str, int]:
+    """Cancel a document's queued jobs; returns {"queued": n, "running": m}.
+
+    Running jobs can't be stopped from here: their handler has to notice the
+    cancellation itself (ingestion re-reads the document status).
+    """
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(Job)
+            .where(Job.doc_id == doc_id, Job.status == "queued")
+            .values(status="cancelled", last_error="Cancelled", finished_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        running = db.query(func.count(Job.id)).filter(Job.doc_id == doc_id, Job.status == "running").scalar()
+        db.commit()
+        return {"queued": result.rowcount, "running": running or 0}
+    finally:
+        db.close()
+
+
+def retry_after_s(max_queued: int) -> Optional[int]:
+    """Seconds a producer should wait when max_queued jobs are already waiting, else None.
+
+    Estimated from the queue depth, the median run time of recent jobs and
+    how many jobs run at once, clamped to 5 s .. JOB_RETRY_MAX_S.
+    """
+    if max_queued <= 0:
+        return None
+    db = SessionLocal()
+    try:
+        depth = db.query(func.count(Job.id)).filter(Job.status == "queued").scalar() or 0
+        if depth < max_queued:
+            return None
+        recent = (
+            db.query(Job.started_at, Job.finished_at)
+            .filter(Job.status == "succeeded", Job.finished_at.isnot(None))
+            .order_by(Job.finished_at.desc())
+            .limit(50)
+            .all()
+        )
+        running = db.query(func.count(Job.id)).filter(Job.status == "running").scalar() or 0
+    finally:
+        db.close()
+    runs = [s for s in (_seconds(start, end) for start, end in recent) if s is not None]
+    per_job = _percentile(runs, 0.5) or settings.job_retry_base_s
+    parallel = settings.job_max_running or max(1, running)
+    # Time until the queue drops back below the limit
+    wait = (depth - max_queued + 1) * per_job / parallel
+    return int(min(settings.job_retry_max_s, max(5.0, wait)))
+
+
+def reap_expired() -> int:
+    """Fail jobs whose lease expired on their last attempt (worker died every time)."""
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        jobs = (
+            db.query(Job)
+            .filter(Job.status == "running", Job.lease_expires_at < now, Job.attempts >= Job.max_attempts)
+            .all()
+        )
+        reaped = []
+        for job in jobs:
+            result = db.execute(
+                update(Job)
+                .where(Job.id == job.id, Job.status == "running", Job.lease_expires_at < now)
+                .values(status="failed", finished_at=now, last_error="Worker lost (lease expired)",
+                        lease_owner=None, lease_expires_at=None)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                reaped.append((job.kind, job.get_payload()))
+        db.commit()
+    finally:
+        db.close()
+    for kind, payload in reaped:
+        _give_up(kind, payload, "Worker lost (lease expired)")
+    return len(reaped)
+
+
+def _heartbeat_loop(job_id: str, worker_id: str, stop: threading.Event) -> None:
+    interval = max(1.0, settings.job_lease_s / 3)
+    while not stop.wait(interval):
+        try:
+            if not heartbeat(job_id, worker_id):
+                logger.warning("Lost the lease on job %s", job_id)
+                return
+        except Exception as e:
+            logger.warning("Heartbeat for job %s failed: %s", job_id, e)
+
+
+def run_next(worker_id: str) -> bool:
+    """Claim and run one job. Returns False when nothing was runnable."""
+    job = claim(worker_id)
+    if job is None:
+        return False
+
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat_loop, args=(job["id"], worker_id, stop), daemon=True)
+    beat.start()
+    start = time.monotonic()
+    error: Optional[str] = None
+    cancelled = permanent = False
+    try:
+        logger.info("▶️  %s running %s job %s (attempt %d/%d)",
+                    worker_id, job["kind"], job["id"], job["attempts"], job["max_attempts"])
+        _handlers[job["kind"]].run(job["payload"])
+    except OperationCancelled:
+        cancelled = True
+    except PermanentJobError as e:
+        error = str(e)[:500] or type(e).__name__
+        permanent = True
+    except Exception as e:
+        error = str(e)[:500] or type(e).__name__
+    finally:
+        stop.set()
+        beat.join()
+    _finish_attempt(job, worker_id, error, cancelled=cancelled, permanent=permanent)
+    if cancelled:
+        logger.info("⏹️  %s job %s cancelled after %.1fs", job["kind"], job["id"], time.monotonic() - start)
+    elif error is None:
+        logger.info("✓ %s job %s finished in %.1fs", job["kind"], job["id"], time.monotonic() - start)
+    return True
+
+
+def work(worker_id: str, stop: threading.Event) -> None:
+    """Worker loop: run jobs until stop is set, polling every JOB_POLL_INTERVAL_S when idle."""
+    logger.info("👷 Job worker %s started (handlers: %s)", worker_id, ", ".join(sorted(_handlers)) or "none")
+    last_reap = 0.0
+    while not stop.is_set():
+        try:
+            if run_next(worker_id):
+                continue
+            if time.monotonic() - last_reap > settings.job_lease_s:
+                last_reap = time.monotonic()
+                reap_expired()
+        except Exception as e:
+            logger.error("Job worker %s error: %s", worker_id, e)
+        _wakeup.wait(settings.job_poll_interval_s)
+        _wakeup.clear()
+    logger.info("Job worker %s stopped", worker_id)
+
+
+_threads: List[threading.Thread] = []
+_threads_stop = threading.Event()
+
+
+def start_in_process_workers(count: int) -> None:
+    """Run `count` worker threads inside this process (e.g. the web app)."""
+    _threads_stop.clear()
+    for i in range(count):
+        thread = threading.Thread(
+            target=work, args=(new_worker_id(f"web{i}"), _threads_stop), name=f"job-worker-{i}", daemon=True
+        )
+        thread.start()
+        _threads.append(thread)
+
+
+def stop_in_process_workers(timeout: float = 5.0) -> None:
+    """Ask in-process workers to stop after their current job."""
+    _threads_stop.set()
+    _wakeup.set()
+    for thread in _threads:
+        thread.join(timeout)
+    _threads.clear()
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        return _job_dict(job, datetime.utcnow()) if job else None
+    finally:
+        db.close()
+
+
+def list_jobs(status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        query = db.query(Job)
+        if status:
+            query = query.filter(Job.status == status)
+        now = datetime.utcnow()
+        return [_job_dict(job, now) for job in query.order_by(Job.created_at.desc()).limit(limit).all()]
+    finally:
+        db.close()
+
+
+def latest_jobs_for_docs(doc_ids: List[str], kind: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Most recent job per document (optionally of one kind), keyed by doc_id."""
+    result: Dict[str, Dict[str, Any]] = {}
+    if not doc_ids:
+        return result
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        # Chunked to stay under SQLite's bound-parameter limit
+        for i in range(0, len(doc_ids), 500):
+            query = db.query(Job).filter(Job.doc_id.in_(doc_ids[i:i + 500]))
+            if kind:
+                query = query.filter(Job.kind == kind)
+            for job in query.order_by(Job.created_at.asc()).all():
+                result[job.doc_id] = _job_dict(job, now)
+        return result
+    finally:
+        db.close()
+
+
+def _seconds(start: Optional[datetime], end: Optional[datetime]) -> Optional[float]:
+    if start is None or end is None:
+        return None
+    return round((end - start).total_seconds(), 2)
+
+
+def _job_dict(job: Job, now: datetime) -> Dict[str, Any]:
+    running = job.status == "running"
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "doc_id": job.doc_id,
+        "status": job.status,
+        "priority": job.priority,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "worker": job.lease_owner,
+        "last_error": job.last_error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "run_after": job.run_after.isoformat() if job.run_after and job.status == "queued" else None,
+        "wait_s": _seconds(job.created_at, job.started_at),
+        "run_s": _seconds(job.started_at, now if running else job.finished_at),
+    }
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(pct * len(ordered)))], 2)
+
+
+def queue_stats() -> Dict[str, Any]:
+    """Queue depth, running jobs and timings of recently finished jobs."""
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        queued = (
+            db.query(Job.priority, func.count(Job.id))
+            .filter(Job.status == "queued")
+            .group_by(Job.priority)
+            .all()
+        )
+        delayed = db.query(func.count(Job.id)).filter(Job.status == "queued", Job.run_after > now).scalar()
+        running = db.query(Job).filter(Job.status == "running").order_by(Job.started_at.asc()).all()
+        finished = (
+            db.query(Job)
+            .filter(Job.status.in_(("succeeded", "failed", "cancelled")), Job.finished_at.isnot(None))
+            .order_by(Job.finished_at.desc())
+            .limit(_STATS_WINDOW)
+            .all()
+        )
+        waits = [s for s in (_seconds(j.created_at, j.started_at) for j in finished) if s is not None]
+        runs = [s for s in (_seconds(j.started_at, j.finished_at) for j in finished if j.status != "cancelled")
+                if s is not None]
+        return {
+            "depth": sum(count for _, count in queued),
+            "depth_by_priority": {str(priority): count for priority, count in sorted(queued, reverse=True)},
+            "delayed_retries": delayed or 0,
+            "running": [_job_dict(job, now) for job in running],
+            "recent": {
+                "count": len(finished),
+                "succeeded": sum(1 for j in finished if j.status == "succeeded"),
+                "failed": sum(1 for j in finished if j.status == "failed"),
+                "cancelled": sum(1 for j in finished if j.status == "cancelled"),
+                "wait_s": {"p50": _percentile(waits, 0.5), "p95": _percentile(waits, 0.95)},
+                "run_s": {"p50": _percentile(runs, 0.5), "p95": _percentile(runs, 0.95)},
+            },
+            "in_process_workers": len(_threads),
+        }
+    finally:
+        db.close()
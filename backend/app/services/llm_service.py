@@ -1,8 +1,32 @@
-"""Centralized LLM service for managing Google Gemini models."""
-from typing import Optional, TYPE_CHECKING, Any
+"""Centralized LLM service for managing Google Gemini models.
+
+LLM_PROVIDER=fake swaps every model for a deterministic local stand-in
+(see fake_providers) for offline benchmarking.
+
+Each role (chat, text summarizer, image summarizer) has an ordered route
+chain: the primary model id followed by the configured fallback model ids,
+each tried with the primary API key and then any fallback keys. On a 429, or
+when a route exceeds the role's latency budget, the request moves straight to
+the next eligible route instead of sleeping. A route is eligible again once
+its cooldown ends: rate limits use the shared quota pause (see
+app.utils.quota); slow routes use a local cooldown.
+
+Chat clients come from a small per-route pool (CHAT_CLIENT_POOL_SIZE) shared
+by the streaming and non-streaming paths, so connections are reused across
+requests and retries.
+"""
+from typing import Optional, TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterator, List, Set, Tuple
+from collections import deque
+from contextlib import contextmanager
+import asyncio
+import concurrent.futures
 import logging
+import threading
+import time
 
 from app.core.config import settings
+from app.utils import quota
+from app.utils.rate_limit import is_rate_limit_error, extract_wait_seconds_from_error
 
 logger = logging.getLogger(__name__)
 
@@ -10,11 +34,51 @@ logger = logging.getLogger(__name__)
 if TYPE_CHECKING:
     from langchain_google_genai import ChatGoogleGenerativeAI
 
-# Global LLM instances (singleton pattern)
-_chat_llm: Optional[Any] = None
+ROLE_CHAT = "chat"
+ROLE_TEXT_SUMMARIZER = "text_summarizer"
+ROLE_IMAGE_SUMMARIZER = "image_summarizer"
+
+# Model construction parameters per role
+_ROLE_KWARGS: Dict[str, Dict[str, Any]] = {
+    ROLE_CHAT: {"temperature": 0.7},
+    ROLE_TEXT_SUMMARIZER: {
+        "temperature": 0.3,
+        "max_tokens": 512,
+        "max_retries": 0,  # Disable LangChain's automatic retries - we handle rate limits ourselves
+    },
+    ROLE_IMAGE_SUMMARIZER: {
+        "temperature": 0.3,
+        "max_retries": 0,  # Disable LangChain's automatic retries - we handle rate limits ourselves
+    },
+}
+
+# A route is (model_id, api_key_index)
+Route = Tuple[str, int]
+
+# Global LLM instances (singleton pattern); chat uses pooled clients instead
 _text_summarizer_llm: Optional[Any] = None
 _image_summarizer_llm: Optional[Any] = None
 
+# Non-primary route instances, keyed by (role, model_id, key_index)
+_route_llms: Dict[Tuple[str, str, int], Any] = {}
+_route_llms_lock = threading.Lock()
+
+# Local cooldowns for routes that blew their latency budget: bucket -> monotonic deadline
+_slow_until: Dict[str, float] = {}
+# Local cooldowns for routes that answered 429 (the shared quota pause is off with QUOTA_ENABLED=false)
+_limited_until: Dict[str, float] = {}
+
+# Runs non-streaming calls that have a latency budget so we can stop waiting on them
+_budget_executor = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-budget")
+# Runs hedged primary/hedge calls. Separate from _budget_executor because these
+# calls submit their budgeted route calls there and wait on them: sharing one
+# pool deadlocks once every worker is a hedged call waiting on a queued child
+_hedge_executor = concurrent.futures.ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+
+
+class LatencyBudgetExceeded(Exception):
+    """A route did not answer within its role's latency budget."""
+
 
 def _get_chat_google_generative_ai():
     """Lazy import of ChatGoogleGenerativeAI."""
@@ -38,44 +102,152 @@ def _validate_api_key() -> None:
         )
 
 
-def get_chat_llm() -> Any:
-    """Get or create the chat LLM instance."""
-    global _chat_llm
-    if _chat_llm is None:
-        _validate_api_key()
-        ChatGoogleGenerativeAI = _get_chat_google_generative_ai()
-        _chat_llm = ChatGoogleGenerativeAI(
-            model=settings.chat_model_id,
-            google_api_key=settings.google_api_key,
-            temperature=0.7,
-        )
-    return _chat_llm
+def _api_keys() -> List[str]:
+    return [settings.google_api_key] + [k for k in settings.google_api_key_fallbacks if k]
 
 
-def get_chat_llm_streaming() -> Any:
-    """Get a streaming-enabled chat LLM instance."""
+def _create_llm(role: str, model: str, api_key: Optional[str] = None, **kwargs: Any) -> Any:
+    """Create an LLM for a role using the configured provider."""
+    if settings.llm_provider == "fake":
+        from app.services.fake_providers import FakeChatModel
+        return FakeChatModel(role=role, model_name=model)
     _validate_api_key()
     ChatGoogleGenerativeAI = _get_chat_google_generative_ai()
     return ChatGoogleGenerativeAI(
-        model=settings.chat_model_id,
-        google_api_key=settings.google_api_key,
-        temperature=0.7,
-        streaming=True,
+        model=model,
+        google_api_key=api_key or settings.google_api_key,
+        **kwargs,
     )
 
 
+class _ClientPool:
+    """Reusable chat clients for one route.
+
+    Each client owns one long-lived gRPC channel (HTTP/2), so requests skip
+    client construction and TLS setup. langchain_google_genai doesn't expose
+    the channel's keep-alive or connection-limit options, so those stay at
+    the library defaults; the pool bounds connections instead (one per
+    client, CHAT_CLIENT_POOL_SIZE per route). Clients are created lazily up
+    to the pool size (or all at once by warm()); a lease hands out the least
+    busy one and is held for the whole call or stream. The pool never
+    blocks: concurrent requests share clients, which multiplex streams.
+    """
+
+    def __init__(self, role: str, route: Route, size: int):
+        self.role = role
+        self.route = route
+        self.size = max(1, size)
+        self._clients: List[Any] = []
+        self._in_flight: List[int] = []
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"created": 0, "leases": 0, "peak_in_flight": 0, "errors": 0}
+
+    def _create(self) -> Any:
+        model_id, key_index = self.route
+        return _create_llm(self.role, model_id, api_key=_api_keys()[key_index], **_ROLE_KWARGS[self.role])
+
+    def _acquire(self) -> int:
+        with self._lock:
+            idle = [i for i, n in enumerate(self._in_flight) if n == 0]
+            if not idle and len(self._clients) < self.size:
+                self._clients.append(self._create())
+                self._in_flight.append(0)
+                self.stats["created"] += 1
+                index = len(self._clients) - 1
+            elif idle:
+                index = idle[0]
+            else:
+                index = min(range(len(self._clients)), key=lambda i: self._in_flight[i])
+            self._in_flight[index] += 1
+            self.stats["leases"] += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], sum(self._in_flight))
+            return index
+
+    def _release(self, index: int, failed: bool = False) -> None:
+        with self._lock:
+            self._in_flight[index] -= 1
+            if failed:
+                self.stats["errors"] += 1
+
+    def client(self) -> Any:
+        """A client without holding a lease (warm-up, legacy callers)."""
+        index = self._acquire()
+        self._release(index)
+        return self._clients[index]
+
+    def warm(self) -> None:
+        """Create every client up front."""
+        with self._lock:
+            while len(self._clients) < self.size:
+                self._clients.append(self._create())
+                self._in_flight.append(0)
+                self.stats["created"] += 1
+
+    @contextmanager
+    def lease(self) -> Iterator[Any]:
+        index = self._acquire()
+        failed = False
+        try:
+            yield self._clients[index]
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._release(index, failed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "clients": len(self._clients),
+                "in_flight": sum(self._in_flight),
+                "reused": self.stats["leases"] - self.stats["created"],
+                **self.stats,
+            }
+
+
+# Chat client pools, keyed by route
+_client_pools: Dict[Route, _ClientPool] = {}
+_client_pools_lock = threading.Lock()
+
+
+def _chat_pool(route: Route) -> _ClientPool:
+    with _client_pools_lock:
+        pool = _client_pools.get(route)
+        if pool is None:
+            pool = _ClientPool(ROLE_CHAT, route, settings.chat_client_pool_size)
+            _client_pools[route] = pool
+    return pool
+
+
+def client_pool_stats() -> Dict[str, Any]:
+    """Per-route chat client pool metrics."""
+    with _client_pools_lock:
+        pools = list(_client_pools.values())
+    return {route_bucket(p.route): p.snapshot() for p in pools}
+
+
+def warm_chat_pool() -> None:
+    """Create all of the primary chat route's clients (startup warm-up)."""
+    _chat_pool((settings.chat_model_id, 0)).warm()
+
+
+def get_chat_llm() -> Any:
+    """Get a pooled chat LLM instance (creates the primary route's pool on first use)."""
+    return _chat_pool((settings.chat_model_id, 0)).client()
+
+
+def get_chat_llm_streaming() -> Any:
+    """Get a pooled chat LLM instance for streaming (same clients serve both paths)."""
+    return _chat_pool((settings.chat_model_id, 0)).client()
+
+
 def get_text_summarizer_llm() -> Any:
     """Get or create the text summarizer LLM instance."""
     global _text_summarizer_llm
     if _text_summarizer_llm is None:
-        _validate_api_key()
-        ChatGoogleGenerativeAI = _get_chat_google_generative_ai()
-        _text_summarizer_llm = ChatGoogleGenerativeAI(
-            model=settings.text_summarizer_model_id,
-            google_api_key=settings.google_api_key,
-            temperature=0.3,
-            max_tokens=512,
-            max_retries=0,  # Disable LangChain's automatic retries - we handle rate limits ourselves
+        _text_summarizer_llm = _create_llm(
+            ROLE_TEXT_SUMMARIZER, settings.text_summarizer_model_id, **_ROLE_KWARGS[ROLE_TEXT_SUMMARIZER]
         )
     return _text_summarizer_llm
 
@@ -84,13 +256,490 @@ def get_image_summarizer_llm() -> Any:
     """Get or create the image summarizer LLM instance."""
     global _image_summarizer_llm
     if _image_summarizer_llm is None:
-        _validate_api_key()
-        ChatGoogleGenerativeAI = _get_chat_google_generative_ai()
-        _image_summarizer_llm = ChatGoogleGenerativeAI(
-            model=settings.image_summarizer_model_id,
-            google_api_key=settings.google_api_key,
-            temperature=0.3,
-            max_retries=0,  # Disable LangChain's automatic retries - we handle rate limits ourselves
+        _image_summarizer_llm = _create_llm(
+            ROLE_IMAGE_SUMMARIZER, settings.image_summarizer_model_id, **_ROLE_KWARGS[ROLE_IMAGE_SUMMARIZER]
         )
     return _image_summarizer_llm
 
+
+def invoke_llm(
+    llm: Any,
+    model_id: str,
+    messages: Any,
+    *,
+    estimated_tokens: Optional[int] = None,
+    lane: Optional[str] = None,
+    on_acquired: Optional[Callable[[], None]] = None,
+) -> Any:
+    """Invoke an LLM after acquiring from the shared quota in a priority lane.
+
+    lane is "interactive", "background" or "batch" (default: the context's
+    lane, see quota.use_lane). A rate limit error pauses model_id for every
+    process (using the server's retry hint) before being re-raised.
+    on_acquired is called once the quota is granted, just before the request.
+    """
+    quota.acquire(
+        model_id,
+        estimated_tokens if estimated_tokens is not None else quota.estimate_tokens(messages),
+        lane=lane,
+    )
+    if on_acquired:
+        on_acquired()
+    try:
+        return llm.invoke(messages)
+    except Exception as e:
+        if is_rate_limit_error(e):
+            quota.report_rate_limit(model_id, extract_wait_seconds_from_error(e))
+        raise
+
+
+async def astream_llm(
+    llm: Any,
+    model_id: str,
+    messages: Any,
+    *,
+    estimated_tokens: Optional[int] = None,
+    lane: Optional[str] = quota.INTERACTIVE,
+    on_acquired: Optional[Callable[[], None]] = None,
+) -> AsyncIterator[Any]:
+    """Stream from an LLM after acquiring from the shared quota (async, interactive by default)."""
+    await quota.acquire_async(
+        model_id,
+        estimated_tokens if estimated_tokens is not None else quota.estimate_tokens(messages),
+        lane=lane,
+    )
+    if on_acquired:
+        on_acquired()
+    try:
+        async for chunk in llm.astream(messages):
+            yield chunk
+    except Exception as e:
+        if is_rate_limit_error(e):
+            quota.report_rate_limit(model_id, extract_wait_seconds_from_error(e))
+        raise
+
+
+# ---------------------------------------------------------------------------
+# Fallback routing
+# ---------------------------------------------------------------------------
+
+def _primary_model(role: str) -> str:
+    return {
+        ROLE_CHAT: settings.chat_model_id,
+        ROLE_TEXT_SUMMARIZER: settings.text_summarizer_model_id,
+        ROLE_IMAGE_SUMMARIZER: settings.image_summarizer_model_id,
+    }[role]
+
+
+def _fallback_models(role: str) -> List[str]:
+    return {
+        ROLE_CHAT: settings.chat_fallback_model_ids,
+        ROLE_TEXT_SUMMARIZER: settings.text_summarizer_fallback_model_ids,
+        ROLE_IMAGE_SUMMARIZER: settings.image_summarizer_fallback_model_ids,
+    }[role]
+
+
+def _latency_budget(role: str) -> float:
+    return {
+        ROLE_CHAT: settings.chat_latency_budget_s,
+        ROLE_TEXT_SUMMARIZER: settings.text_summarizer_latency_budget_s,
+        ROLE_IMAGE_SUMMARIZER: settings.image_summarizer_latency_budget_s,
+    }[role]
+
+
+def get_routes(role: str) -> List[Route]:
+    """Ordered (model_id, key_index) routes for a role."""
+    models: List[str] = []
+    for model in [_primary_model(role)] + list(_fallback_models(role)):
+        if model and model not in models:
+            models.append(model)
+    key_count = len(_api_keys()) if settings.llm_provider != "fake" else 1
+    return [(model, key_index) for model in models for key_index in range(key_count)]
+
+
+def route_bucket(route: Route) -> str:
+    """Quota bucket id for a route (keys have independent quotas)."""
+    model_id, key_index = route
+    return model_id if key_index == 0 else f"{model_id}#key{key_index}"
+
+
+def _route_cooldown(route: Route) -> float:
+    bucket = route_bucket(route)
+    now = time.monotonic()
+    slow = max(0.0, _slow_until.get(bucket, 0.0) - now)
+    limited = max(0.0, _limited_until.get(bucket, 0.0) - now)
+    return max(slow, limited, quota.paused_for(bucket))
+
+
+def cooldown_remaining(role: str) -> float:
+    """Seconds until at least one route for role is out of cooldown."""
+    return min((_route_cooldown(r) for r in get_routes(role)), default=0.0)
+
+
+def _pick_route(role: str, tried: Set[Route]) -> Optional[Route]:
+    """First untried route not in cooldown, else the untried one that recovers soonest."""
+    candidates = [r for r in get_routes(role) if r not in tried]
+    if not candidates:
+        return None
+    cooldowns = [(_route_cooldown(r), i, r) for i, r in enumerate(candidates)]
+    ready = [r for cooldown, _, r in cooldowns if cooldown <= 0]
+    if ready:
+        return ready[0]
+    return min(cooldowns)[2]
+
+
+def _mark_slow(role: str, route: Route) -> None:
+    bucket = route_bucket(route)
+    _slow_until[bucket] = time.monotonic() + settings.llm_slow_cooldown_s
+    logger.warning(
+        "🐢 %s route %s exceeded latency budget (%.1fs) - cooling down for %.0fs",
+        role, bucket, _latency_budget(role), settings.llm_slow_cooldown_s,
+    )
+
+
+def _mark_rate_limited(role: str, route: Route, error: Exception) -> None:
+    bucket = route_bucket(route)
+    pause = extract_wait_seconds_from_error(error) or settings.quota_default_pause_s
+    _limited_until[bucket] = max(_limited_until.get(bucket, 0.0), time.monotonic() + pause)
+    logger.warning("⏳ %s route %s rate limited - cooling down for %.0fs", role, bucket, pause)
+
+
+def _llm_for_route(role: str, route: Route) -> Any:
+    model_id, key_index = route
+    if model_id == _primary_model(role) and key_index == 0:
+        return {
+            ROLE_TEXT_SUMMARIZER: get_text_summarizer_llm,
+            ROLE_IMAGE_SUMMARIZER: get_image_summarizer_llm,
+        }[role]()
+    cache_key = (role, model_id, key_index)
+    with _route_llms_lock:
+        llm = _route_llms.get(cache_key)
+        if llm is None:
+            llm = _create_llm(role, model_id, api_key=_api_keys()[key_index], **_ROLE_KWARGS[role])
+            _route_llms[cache_key] = llm
+    return llm
+
+
+@contextmanager
+def _lease_llm(role: str, route: Route) -> Iterator[Any]:
+    """LLM for a route, leased from the client pool for chat."""
+    if role == ROLE_CHAT:
+        with _chat_pool(route).lease() as llm:
+            yield llm
+    else:
+        yield _llm_for_route(role, route)
+
+
+def _invoke_route(
+    role: str, route: Route, messages: Any, estimated_tokens: Optional[int], lane: Optional[str],
+    on_acquired: Optional[Callable[[], None]] = None,
+) -> Any:
+    with _lease_llm(role, route) as llm:
+        return invoke_llm(
+            llm, route_bucket(route), messages, estimated_tokens=estimated_tokens, lane=lane, on_acquired=on_acquired
+        )
+
+
+async def _astream_route(
+    role: str, route: Route, messages: Any, estimated_tokens: Optional[int], lane: Optional[str],
+    on_acquired: Optional[Callable[[], None]] = None,
+) -> AsyncIterator[Any]:
+    # The lease is held until the stream is exhausted or closed
+    with _lease_llm(role, route) as llm:
+        async for chunk in astream_llm(
+            llm, route_bucket(route), messages, estimated_tokens=estimated_tokens, lane=lane, on_acquired=on_acquired
+        ):
+            yield chunk
+
+
+def invoke_with_fallback(
+    role: str,
+    messages: Any,
+    *,
+    lane: Optional[str] = None,
+    estimated_tokens: Optional[int] = None,
+) -> Any:
+    """Invoke the role's LLM, moving to the next route on 429 or latency budget overrun.
+
+    Raises the last error if every route failed; callers then retry, and the
+    shared quota makes that retry wait for the earliest cooldown.
+    """
+    budget = _latency_budget(role)
+    tried: Set[Route] = set()
+    last_error: Optional[Exception] = None
+    while True:
+        route = _pick_route(role, tried)
+        if route is None:
+            assert last_error is not None
+            raise last_error
+        tried.add(route)
+        bucket = route_bucket(route)
+        try:
+            if budget > 0:
+                # The budget clock starts once the pool lease and shared quota are granted:
+                # a route that is only waiting on the bucket isn't slow
+                acquired = threading.Event()
+                future = _budget_executor.submit(
+                    _invoke_route, role, route, messages, estimated_tokens, lane or quota.current_lane(), acquired.set
+                )
+                future.add_done_callback(lambda _: acquired.set())
+                acquired.wait()
+                try:
+                    return future.result(timeout=budget)
+                except concurrent.futures.TimeoutError:
+                    _mark_slow(role, route)
+                    raise LatencyBudgetExceeded(f"{bucket} exceeded {budget:.1f}s latency budget")
+            return _invoke_route(role, route, messages, estimated_tokens, lane)
+        except LatencyBudgetExceeded as e:
+            last_error = e
+        except Exception as e:
+            if not is_rate_limit_error(e):
+                raise
+            _mark_rate_limited(role, route, e)
+            last_error = e
+        if len(tried) < len(get_routes(role)):
+            logger.warning("↪️  %s route %s unavailable (%s) - trying next route", role, bucket, type(last_error).__name__)
+
+
+async def astream_with_fallback(
+    role: str,
+    messages: Any,
+    *,
+    lane: Optional[str] = quota.INTERACTIVE,
+    estimated_tokens: Optional[int] = None,
+) -> AsyncIterator[Any]:
+    """Stream from the role's LLM, moving to the next route on 429 or slow first token.
+
+    Routing only happens before the first chunk; once tokens flow, errors
+    propagate to the caller.
+    """
+    budget = _latency_budget(role)
+    tried: Set[Route] = set()
+    last_error: Optional[Exception] = None
+    while True:
+        route = _pick_route(role, tried)
+        if route is None:
+            assert last_error is not None
+            raise last_error
+        tried.add(route)
+        bucket = route_bucket(route)
+        acquired = asyncio.Event()
+        stream = _astream_route(role, route, messages, estimated_tokens, lane, acquired.set)
+        first_task = asyncio.ensure_future(_first_chunk(stream))
+        try:
+            if budget > 0:
+                # The first-token budget starts once the pool lease and shared quota are granted
+                acquired_wait = asyncio.ensure_future(acquired.wait())
+                try:
+                    await asyncio.wait({first_task, acquired_wait}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    acquired_wait.cancel()
+                first = await asyncio.wait_for(first_task, timeout=budget)
+            else:
+                first = await first_task
+        except asyncio.CancelledError:
+            first_task.cancel()
+            await asyncio.wait({first_task})
+            await stream.aclose()
+            raise
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            _mark_slow(role, route)
+            last_error = LatencyBudgetExceeded(f"{bucket} exceeded {budget:.1f}s latency budget")
+            await stream.aclose()
+            continue
+        except Exception as e:
+            await stream.aclose()
+            if not is_rate_limit_error(e):
+                raise
+            _mark_rate_limited(role, route, e)
+            last_error = e
+            logger.warning("↪️  %s route %s rate limited - trying next route", role, bucket)
+            continue
+
+        yield first
+        async for chunk in stream:
+            yield chunk
+        return
+
+
+# ---------------------------------------------------------------------------
+# Hedged requests
+# ---------------------------------------------------------------------------
+#
+# When hedging is enabled and a chat request has not produced its first token
+# (streaming) or its answer (non-streaming) within a delay derived from the
+# observed latency percentile, a duplicate request is sent. The first one to
+# respond wins and the other is cancelled (or, for blocking calls that cannot
+# be interrupted, its result is discarded). A per-minute budget caps the
+# extra quota spent on hedges.
+
+_HEDGE_MIN_SAMPLES = 20
+
+_latency_samples: Dict[str, "deque[float]"] = {}
+_hedge_times: "deque[float]" = deque()
+_hedge_lock = threading.Lock()
+_hedge_stats: Dict[str, int] = {
+    "requests": 0,
+    "hedges_sent": 0,
+    "hedges_won": 0,
+    "hedges_skipped_budget": 0,
+}
+
+
+def _record_latency(kind: str, seconds: float) -> None:
+    with _hedge_lock:
+        samples = _latency_samples.setdefault(kind, deque(maxlen=500))
+        samples.append(seconds)
+
+
+def _hedge_delay(kind: str) -> float:
+    """Delay before hedging: the configured percentile of observed latencies."""
+    with _hedge_lock:
+        samples = sorted(_latency_samples.get(kind, ()))
+    if len(samples) < _HEDGE_MIN_SAMPLES:
+        delay = settings.chat_hedge_default_delay_s
+    else:
+        index = min(len(samples) - 1, int(len(samples) * settings.chat_hedge_percentile / 100.0))
+        delay = samples[index]
+    return max(settings.chat_hedge_min_delay_s, delay)
+
+
+def _take_hedge_budget() -> bool:
+    now = time.monotonic()
+    with _hedge_lock:
+        while _hedge_times and now - _hedge_times[0] > 60.0:
+            _hedge_times.popleft()
+        if len(_hedge_times) >= settings.chat_hedge_max_per_minute:
+            _hedge_stats["hedges_skipped_budget"] += 1
+            return False
+        _hedge_times.append(now)
+        _hedge_stats["hedges_sent"] += 1
+        return True
+
+
+def _count(stat: str) -> None:
+    with _hedge_lock:
+        _hedge_stats[stat] += 1
+
+
+def hedge_stats() -> Dict[str, Any]:
+    """Hedging counters plus derived hedge rate and win rate."""
+    with _hedge_lock:
+        stats: Dict[str, Any] = dict(_hedge_stats)
+        stats["recent_hedges"] = len(_hedge_times)
+    stats["enabled"] = settings.chat_hedging_enabled
+    stats["hedge_rate"] = round(stats["hedges_sent"] / stats["requests"], 4) if stats["requests"] else 0.0
+    stats["win_rate"] = round(stats["hedges_won"] / stats["hedges_sent"], 4) if stats["hedges_sent"] else 0.0
+    stats["current_delay_s"] = {
+        "invoke": round(_hedge_delay("invoke"), 3),
+        "first_token": round(_hedge_delay("first_token"), 3),
+    }
+    return stats
+
+
+def invoke_hedged(role: str, messages: Any, *, lane: Optional[str] = None) -> Any:
+    """invoke_with_fallback with an optional hedge request for slow answers."""
+    if not settings.chat_hedging_enabled:
+        return invoke_with_fallback(role, messages, lane=lane)
+
+    lane = lane or quota.current_lane()
+    _count("requests")
+    start = time.monotonic()
+    primary = _hedge_executor.submit(invoke_with_fallback, role, messages, lane=lane)
+    try:
+        result = primary.result(timeout=_hedge_delay("invoke"))
+        _record_latency("invoke", time.monotonic() - start)
+        return result
+    except concurrent.futures.TimeoutError:
+        pass
+
+    if not _take_hedge_budget():
+        result = primary.result()
+        _record_latency("invoke", time.monotonic() - start)
+        return result
+
+    logger.info("🪁 Hedging slow %s request after %.1fs", role, time.monotonic() - start)
+    hedge = _hedge_executor.submit(invoke_with_fallback, role, messages, lane=lane)
+    pending = {primary, hedge}
+    last_error: Optional[BaseException] = None
+    while pending:
+        done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                last_error = future.exception()
+                continue
+            for loser in pending:
+                loser.cancel()  # Already-running calls finish in the background and are discarded
+            if future is hedge:
+                _count("hedges_won")
+            _record_latency("invoke", time.monotonic() - start)
+            return future.result()
+    assert last_error is not None
+    raise last_error
+
+
+async def _first_chunk(stream: AsyncIterator[Any]) -> Any:
+    return await stream.__anext__()
+
+
+async def astream_hedged(
+    role: str, messages: Any, *, lane: Optional[str] = quota.INTERACTIVE
+) -> AsyncIterator[Any]:
+    """astream_with_fallback with an optional hedge stream for a slow first token."""
+    if not settings.chat_hedging_enabled:
+        async for chunk in astream_with_fallback(role, messages, lane=lane):
+            yield chunk
+        return
+
+    _count("requests")
+    start = time.monotonic()
+    primary = astream_with_fallback(role, messages, lane=lane)
+    primary_task = asyncio.create_task(_first_chunk(primary))
+    done, _ = await asyncio.wait({primary_task}, timeout=_hedge_delay("first_token"))
+
+    streams = {primary_task: primary}
+    if not done and _take_hedge_budget():
+        logger.info("🪁 Hedging slow %s stream after %.1fs without a first token", role, time.monotonic() - start)
+        hedge = astream_with_fallback(role, messages, lane=lane)
+        streams[asyncio.create_task(_first_chunk(hedge))] = hedge
+
+    winner_task = None
+    pending = set(streams)
+    last_error: Optional[BaseException] = None
+    try:
+        while pending and winner_task is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None or isinstance(task.exception(), StopAsyncIteration):
+                    winner_task = task
+                    break
+                last_error = task.exception()
+    finally:
+        for task, stream in streams.items():
+            if task is not winner_task:
+                task.cancel()
+                # The generator is still running until the cancelled __anext__ unwinds
+                # (asyncio.wait doesn't raise the task's CancelledError)
+                await asyncio.wait({task})
+                try:
+                    await stream.aclose()
+                except Exception as e:
+                    logger.warning("Could not close losing %s stream: %s", role, e)
+
+    if winner_task is None:
+        assert last_error is not None
+        raise last_error
+    if winner_task is not primary_task:
+        _count("hedges_won")
+    if isinstance(winner_task.exception(), StopAsyncIteration):
+        return
+    _record_latency("first_token", time.monotonic() - start)
+    try:
+        yield winner_task.result()
+        async for chunk in streams[winner_task]:
+            yield chunk
+    finally:
+        # Release the winner's connection too if the consumer stops early
+        await streams[winner_task].aclose()
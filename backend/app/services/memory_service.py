@@ -0,0 +1,180 @@
+"""Rolling conversation memory for chat prompts.
+
+Recent turns are kept verbatim within CHAT_MEMORY_RECENT_TOKENS; older turns
+are folded into a per-session summary stored in the session_memory table and
+updated incrementally after each answer. The history sent to the model is
+therefore bounded no matter how long a session runs.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Dict, List, Optional, cast
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.message import Message
+from app.repositories.memory_repo import get_session_memory, save_session_memory
+from app.repositories.message_repo import get_oldest_messages, get_recent_messages
+from app.services.llm_service import ROLE_TEXT_SUMMARIZER, invoke_with_fallback
+from app.utils import quota
+from app.utils.tokens import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# Legacy window used when rolling memory is disabled
+_RAW_HISTORY_MESSAGES = 10
+# Unsummarized messages considered when building the prompt / folding
+_MAX_UNSUMMARIZED_MESSAGES = 200
+# Latest exchange (question + answer) is never folded
+_MIN_VERBATIM_MESSAGES = 2
+# Summarization calls per refresh (long legacy sessions catch up over several turns)
+_MAX_FOLDS_PER_REFRESH = 3
+
+_SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a user and an assistant "
+    "about the user's documents. Keep facts, names, numbers, decisions, the user's goals "
+    "and open questions; drop greetings and filler. Write at most {max_words} words.\n\n"
+    "Current summary:\n{summary}\n\n"
+    "Content:\n{turns}\n\n"
+    "Summary:"
+)
+
+_refreshing: set = set()
+_refreshing_lock = threading.Lock()
+
+
+def _clip(content: str) -> str:
+    return truncate_to_tokens(content or "", settings.chat_memory_max_message_tokens)
+
+
+def _split_recent(messages: List[Message]) -> int:
+    """Index where the verbatim window starts: messages[i:] fit CHAT_MEMORY_RECENT_TOKENS."""
+    used = 0
+    start = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        used += count_tokens(_clip(messages[i].content))
+        if used > settings.chat_memory_recent_tokens:
+            break
+        start = i
+    return start
+
+
+def load_conversation_memory(
+    db: Session, session_id: str, exclude_id: Optional[str] = None
+) -> List[Dict[str, str]]:
+    """Conversation history for the prompt: the rolling summary (role "summary") plus recent turns.
+
+    exclude_id is the id of the question being answered, so it never appears in its own history.
+    """
+    if not settings.chat_memory_enabled:
+        messages = get_recent_messages(db, session_id, limit=_RAW_HISTORY_MESSAGES, exclude_id=exclude_id)
+        return [{"role": m.role, "content": m.content} for m in messages]
+
+    memory = get_session_memory(db, session_id)
+    after = memory.summarized_until if memory else None
+    messages = get_recent_messages(
+        db, session_id, limit=_MAX_UNSUMMARIZED_MESSAGES, after=after, exclude_id=exclude_id
+    )
+    recent = messages[_split_recent(messages):]
+
+    history: List[Dict[str, str]] = []
+    if memory and memory.summary:
+        history.append({"role": "summary", "content": memory.summary})
+    history.extend({"role": m.role, "content": _clip(m.content)} for m in recent)
+    return history
+
+
+def _summarize(summary: str, messages: List[Message]) -> str:
+    turns = "\n".join(
+        f"{'User' if m.role == 'user' else 'Assistant'}: {_clip(m.content)}" for m in messages
+    )
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+
+    prompt = ChatPromptTemplate.from_template(_SUMMARY_PROMPT)
+    prompt_messages = prompt.format_messages(
+        max_words=max(50, settings.chat_memory_summary_max_tokens * 3 // 4),
+        summary=summary or "(none yet)",
+        turns=turns,
+    )
+    response = invoke_with_fallback(ROLE_TEXT_SUMMARIZER, prompt_messages, lane=quota.BACKGROUND)
+    result = cast(str, StrOutputParser().invoke(response)).strip()
+    return truncate_to_tokens(result, settings.chat_memory_summary_max_tokens)
+
+
+def _refresh(db: Session, session_id: str) -> None:
+    for _ in range(_MAX_FOLDS_PER_REFRESH):
+        memory = get_session_memory(db, session_id)
+        after = memory.summarized_until if memory else None
+        # The newest unsummarized messages decide what stays verbatim...
+        messages = get_recent_messages(db, session_id, limit=_MAX_UNSUMMARIZED_MESSAGES, after=after)
+        if not messages:
+            return
+
+        # Fold until the verbatim window is at half its budget, so the next few
+        # turns fit without another summarization call
+        used = 0
+        keep_from = len(messages)
+        for i in range(len(messages) - 1, -1, -1):
+            used += count_tokens(_clip(messages[i].content))
+            if used > settings.chat_memory_recent_tokens // 2:
+                break
+            keep_from = i
+        # Always keep the latest exchange verbatim
+        keep_from = min(keep_from, max(0, len(messages) - _MIN_VERBATIM_MESSAGES))
+        keep = messages[keep_from] if keep_from < len(messages) else None
+
+        # ...and folding pages forward from the oldest unsummarized one, so long sessions
+        # that predate the memory catch up from the start over several turns
+        batch: List[Message] = []
+        batch_tokens = 0
+        for m in get_oldest_messages(db, session_id, limit=_MAX_UNSUMMARIZED_MESSAGES, after=after):
+            if keep is not None and (m.created_at, m.id) >= (keep.created_at, keep.id):
+                break
+            tokens = count_tokens(_clip(m.content))
+            if batch and batch_tokens + tokens > settings.chat_memory_fold_max_tokens:
+                break
+            batch.append(m)
+            batch_tokens += tokens
+        if not batch:
+            return
+
+        summary = _summarize(memory.summary if memory else "", batch)
+        save_session_memory(
+            db,
+            session_id=session_id,
+            summary=summary,
+            summarized_until=batch[-1].created_at,
+            summarized_count=(memory.summarized_count if memory else 0) + len(batch),
+        )
+        logger.info("🧠 Folded %d messages into memory for session %s", len(batch), session_id)
+
+
+def refresh_conversation_memory(session_id: str) -> None:
+    """Fold turns that no longer fit the verbatim window into the session summary.
+
+    Runs after an answer has been sent (background task) on its own DB
+    session. Failures only leave the older turns out of the prompt until the
+    next refresh succeeds.
+    """
+    if not settings.chat_memory_enabled:
+        return
+    with _refreshing_lock:
+        if session_id in _refreshing:
+            return
+        _refreshing.add(session_id)
+
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        _refresh(db, session_id)
+    except Exception as e:
+        logger.warning("Could not update conversation memory for session %s: %s", session_id, e)
+    finally:
+        db.close()
+        with _refreshing_lock:
+            _refreshing.discard(session_id)
+
@@ -0,0 +1,173 @@
+"""Embeddings from Ollama's batch /api/embed endpoint.
+
+One pooled HTTP client is shared by every caller (chat queries, ingestion
+workers, warm-up), so connections are reused instead of reopened per
+request. Documents are sent in OLLAMA_EMBED_BATCH_SIZE batches, up to
+OLLAMA_EMBED_PARALLELISM at a time, and every request carries
+OLLAMA_KEEP_ALIVE so the model stays loaded between bursts instead of paying
+a multi-second reload. Per-batch latencies are kept as histograms keyed by
+batch size (see embedding_stats(), shown in /api/health/llm).
+"""
+from __future__ import annotations
+
+import bisect
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import httpx
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is open-ended)
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+_stats_lock = threading.Lock()
+_histograms: Dict[int, Dict[str, Any]] = {}
+_errors = 0
+
+
+class OllamaEmbeddingError(RuntimeError):
+    """Ollama returned an error or an unexpected response for /api/embed."""
+
+
+def _get_client() -> httpx.Client:
+    global _client, _executor
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                parallelism = max(1, settings.ollama_embed_parallelism)
+                _executor = ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="ollama-embed")
+                _client = httpx.Client(
+                    base_url=settings.ollama_base_url,
+                    timeout=httpx.Timeout(settings.ollama_embed_timeout_s, connect=5.0),
+                    # A few extra connections for query embeddings arriving during a bulk batch
+                    limits=httpx.Limits(max_connections=parallelism + 4, max_keepalive_connections=parallelism + 4),
+                    transport=httpx.HTTPTransport(retries=2),  # Retries connection failures only
+                )
+    return _client
+
+
+def close_client() -> None:
+    """Close the pooled client (it is recreated on next use)."""
+    global _client, _executor
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+def _size_bucket(batch_size: int) -> int:
+    """Batch sizes are grouped by the next power of two (1, 2, 4, 8, ...)."""
+    return 1 << max(0, batch_size - 1).bit_length()
+
+
+def _record(batch_size: int, elapsed_ms: float) -> None:
+    with _stats_lock:
+        histogram = _histograms.get(_size_bucket(batch_size))
+        if histogram is None:
+            histogram = {"count": 0, "texts": 0, "total_ms": 0.0, "max_ms": 0.0,
+                         "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+            _histograms[_size_bucket(batch_size)] = histogram
+        histogram["count"] += 1
+        histogram["texts"] += batch_size
+        histogram["total_ms"] += elapsed_ms
+        histogram["max_ms"] = max(histogram["max_ms"], elapsed_ms)
+        histogram["buckets"][bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+
+def embedding_stats() -> Dict[str, Any]:
+    """Per-batch-size latency histograms (counts per LATENCY_BUCKETS_MS bucket) and error count."""
+    labels = [f"le_{bound}" for bound in LATENCY_BUCKETS_MS] + ["inf"]
+    with _stats_lock:
+        histograms = {
+            f"batch_le_{size}": {
+                "count": h["count"],
+                "texts": h["texts"],
+                "avg_ms": round(h["total_ms"] / h["count"], 1),
+                "max_ms": round(h["max_ms"], 1),
+                "ms_per_text": round(h["total_ms"] / h["texts"], 2),
+                "latency_ms": dict(zip(labels, h["buckets"])),
+            }
+            for size, h in sorted(_histograms.items())
+        }
+        errors = _errors
+    return {
+        "model": settings.embedding_model_id,
+        "batch_size": settings.ollama_embed_batch_size,
+        "parallelism": settings.ollama_embed_parallelism,
+        "keep_alive": settings.ollama_keep_alive,
+        "errors": errors,
+        "histograms": histograms,
+    }
+
+
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    global _errors
+    payload = {
+        "model": settings.embedding_model_id,
+        "input": texts,
+        "keep_alive": settings.ollama_keep_alive,
+        "truncate": True,
+    }
+    start = time.perf_counter()
+    try:
+        response = _get_client().post("/api/embed", json=payload)
+        if response.status_code != 200:
+            try:
+                detail = response.json().get("error", response.text)
+            except ValueError:
+                detail = response.text
+            raise OllamaEmbeddingError(f"Ollama /api/embed returned {response.status_code}: {detail[:300]}")
+        embeddings = response.json().get("embeddings")
+        if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+            raise OllamaEmbeddingError(
+                f"Ollama /api/embed returned {len(embeddings or [])} embeddings for {len(texts)} inputs"
+            )
+    except Exception:
+        with _stats_lock:
+            _errors += 1
+        raise
+    _record(len(texts), (time.perf_counter() - start) * 1000)
+    return embeddings
+
+
+class OllamaBatchEmbeddings(Embeddings):
+    """LangChain Embeddings backed by the shared /api/embed client."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        size = max(1, settings.ollama_embed_batch_size)
+        batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+        _get_client()
+        if len(batches) == 1 or _executor is None:
+            results = [_embed_batch(batch) for batch in batches]
+        else:
+            results = list(_executor.map(_embed_batch, batches))
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        return _embed_batch([text])[0]
+
+
+_embeddings: Optional[OllamaBatchEmbeddings] = None
+
+
+def get_ollama_embeddings() -> OllamaBatchEmbeddings:
+    global _embeddings
+    if _embeddings is None:
+        _embeddings = OllamaBatchEmbeddings()
+    return _embeddings
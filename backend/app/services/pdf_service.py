@@ -4,18 +4,26 @@ import os
 from typing import Any, Dict, List
 import logging
 
-from unstructured.partition.pdf import partition_pdf
-
 from app.core.config import settings
 from app.utils.file import save_json
 
 
+def preload_layout_models() -> None:
+    """Load the hi_res layout detection model now instead of on the first upload."""
+    from unstructured_inference.models.base import get_model
+
+    get_model()
+
+
 def extract_elements(file_path: str) -> Dict[str, List[Any]]:
     """Extract text, tables, and images from a PDF using unstructured.
 
     Returns a dict with raw unstructured elements.
     When use_ollama_embeddings=False, images are skipped (text-only mode).
     """
+    # Heavy (pulls in the layout models); imported on first use so the API starts fast
+    from unstructured.partition.pdf import partition_pdf
+
     logging.info("Partitioning PDF: %s (Ollama embeddings: %s)", file_path, settings.use_ollama_embeddings)
     
     # Only extract images if Ollama embeddings are enabled
@@ -66,12 +74,13 @@ def extract_elements(file_path: str) -> Dict[str, List[Any]]:
 def normalize_elements(raw: Dict[str, List[Any]]) -> Dict[str, List[Dict[str, Any]]]:
     """Normalize raw elements to serializable parents for storage and later use."""
     normalized_texts: List[Dict[str, Any]] = []
-    for t in raw["texts"]:
+    for i, t in enumerate(raw["texts"]):
         normalized_texts.append({
             "type": "text",
             "text": getattr(t, "text", ""),
             "page_number": getattr(t.metadata, "page_number", None),
             "source": getattr(t.metadata, "filename", None),
+            "chunk_index": i,  # Document order, lets the context builder merge neighbours
         })
 
     normalized_tables: List[Dict[str, Any]] = []
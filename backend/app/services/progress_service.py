@@ -0,0 +1,200 @@
+"""Ingestion progress: an in-process event bus with throttled persistence.
+
+The background ingestion task reports through an IngestProgress. Every update
+is published at once to subscribers of GET /upload/events/{doc_id}; the
+documents table is written only when progress moved by PROGRESS_PERSIST_MIN_DELTA
+or PROGRESS_PERSIST_INTERVAL_S passed (and always on stage changes and at
+the end), instead of once per chunk.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Statuses after which no more events follow
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+# Finished documents whose last event is kept for late subscribers
+_MAX_FINISHED = 256
+
+_lock = threading.Lock()
+_latest: Dict[str, Dict[str, Any]] = {}
+_finished: list = []
+_subscribers: Dict[str, Set["_Subscriber"]] = {}
+
+
+class _Subscriber:
+    """Wakes one SSE stream on its own event loop; only the latest event is ever sent."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.changed = asyncio.Event()
+
+    def notify(self) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self.changed.set)
+        except RuntimeError:
+            pass  # Loop already closed
+
+
+def publish(doc_id: str, event: Dict[str, Any]) -> None:
+    """Record the latest progress event for a document and wake its subscribers."""
+    with _lock:
+        _latest[doc_id] = event
+        if event.get("status") in TERMINAL_STATUSES:
+            _finished.append(doc_id)
+            while len(_finished) > _MAX_FINISHED:
+                _latest.pop(_finished.pop(0), None)
+        subscribers = list(_subscribers.get(doc_id, ()))
+    for subscriber in subscribers:
+        subscriber.notify()
+
+
+def latest_progress(doc_id: str) -> Optional[Dict[str, Any]]:
+    """Most recent progress event for a document in this process, if any."""
+    with _lock:
+        return _latest.get(doc_id)
+
+
+def forget_progress(doc_id: str) -> None:
+    """Drop a document's progress (e.g. after deletion)."""
+    with _lock:
+        _latest.pop(doc_id, None)
+
+
+async def progress_events(doc_id: str, *, idle_timeout_s: float) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """Yield progress events for a document as they are published.
+
+    Yields the current event first (if any), then each newer one; stops after
+    a terminal event. Yields None after idle_timeout_s without news so the
+    caller can check other sources (e.g. the database).
+    """
+    subscriber = _Subscriber(asyncio.get_running_loop())
+    with _lock:
+        _subscribers.setdefault(doc_id, set()).add(subscriber)
+    try:
+        last: Optional[Dict[str, Any]] = None
+        while True:
+            event = latest_progress(doc_id)
+            if event is not None and event is not last:
+                last = event
+                yield event
+                if event.get("status") in TERMINAL_STATUSES:
+                    return
+            try:
+                await asyncio.wait_for(subscriber.changed.wait(), timeout=idle_timeout_s)
+            except asyncio.TimeoutError:
+                yield None
+            subscriber.changed.clear()
+    finally:
+        with _lock:
+            subscribers = _subscribers.get(doc_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    _subscribers.pop(doc_id, None)
+
+
+class IngestProgress:
+    """Progress reporter for one document's ingestion.
+
+    persist(status, percent) writes the document row; it is called through
+    the throttle, so callers don't need to rate-limit updates themselves.
+    """
+
+    def __init__(self, doc_id: str, persist: Callable[[str, int], None]):
+        self.doc_id = doc_id
+        self._persist = persist
+        self._started = time.monotonic()
+        self._stage = "queued"
+        self._stage_started = self._started
+        self._percent = 0
+        self._done: Optional[int] = None
+        self._total: Optional[int] = None
+        self._counts: Dict[str, int] = {}
+        self._persisted: Optional[tuple] = None  # (status, percent) last written
+        self._persisted_at = 0.0
+
+    def set_counts(self, **counts: int) -> None:
+        """Element counts shown with every event (texts, tables, images)."""
+        self._counts.update(counts)
+
+    def stage(self, name: str, percent: int, *, total: Optional[int] = None) -> None:
+        """Enter a new stage (persisted without throttling)."""
+        self._stage = name
+        self._stage_started = time.monotonic()
+        self._done = 0 if total is not None else None
+        self._total = total
+        self._report("processing", percent, force=True)
+
+    def update(self, percent: int, *, done: Optional[int] = None, total: Optional[int] = None) -> None:
+        """Progress within the current stage."""
+        if done is not None:
+            self._done = done
+        if total is not None:
+            self._total = total
+        self._report("processing", percent)
+
+    def complete(self) -> None:
+        self._stage = "completed"
+        self._report("completed", 100, force=True)
+
+    def fail(self, error: str) -> None:
+        self._stage = "failed"
+        self._report("failed", 0, force=True, error=error)
+
+    def cancel(self) -> None:
+        self._stage = "cancelled"
+        self._report("cancelled", self._percent, force=True)
+
+    def _eta(self, now: float) -> Optional[float]:
+        if self._done and self._total and self._done < self._total:
+            # Per-item rate of the current stage (summarization dominates ingestion time)
+            per_item = (now - self._stage_started) / self._done
+            return round(per_item * (self._total - self._done), 1)
+        elapsed = now - self._started
+        if 0 < self._percent < 100 and elapsed >= 1.0:
+            return round(elapsed * (100 - self._percent) / self._percent, 1)
+        return None
+
+    def _report(self, status: str, percent: int, *, force: bool = False, error: Optional[str] = None) -> None:
+        now = time.monotonic()
+        self._percent = max(0, min(100, int(percent)))
+        event: Dict[str, Any] = {
+            "doc_id": self.doc_id,
+            "status": status,
+            "stage": self._stage,
+            "percent": self._percent,
+            "done": self._done,
+            "total": self._total,
+            "eta_s": self._eta(now) if status == "processing" else None,
+            "elapsed_s": round(now - self._started, 1),
+            "counts": dict(self._counts),
+        }
+        if error:
+            event["error"] = error
+        publish(self.doc_id, event)
+
+        # The row only holds status and percent; skip writes that wouldn't change it
+        if self._persisted == (status, self._percent):
+            return
+        due = (
+            force
+            or self._persisted is None
+            or abs(self._percent - self._persisted[1]) >= settings.progress_persist_min_delta
+            or now - self._persisted_at >= settings.progress_persist_interval_s
+        )
+        if not due:
+            return
+        try:
+            self._persist(status, self._percent)
+            self._persisted = (status, self._percent)
+            self._persisted_at = now
+        except Exception as e:
+            logger.warning("Could not persist progress for %s: %s", self.doc_id, e)
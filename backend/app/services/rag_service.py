@@ -1,14 +1,382 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
 
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import HumanMessage
-from langchain_core.output_parsers import StrOutputParser
-
-from app.services.vector_service import retrieve_with_sources
-from app.services.llm_service import get_chat_llm
+from app.core.config import settings
+from app.services.context_builder import build_context
+from app.services.vector_service import (
+    embed_query,
+    get_index_generation,
+    resolve_document_ids,
+    retrieve_with_sources,
+)
+from app.services.llm_service import ROLE_CHAT, invoke_hedged
 from app.utils.rate_limit import with_rate_limit_retry
+from app.utils import quota
+
+# langchain_core is imported on first use so the API starts fast
+if TYPE_CHECKING:
+    from langchain_core.prompts import ChatPromptTemplate
+
+logger = logging.getLogger(__name__)
+
+# Answer cache: (scope, normalized question) -> entry, kept in LRU order.
+# An entry holds the unit-length question embedding (numpy), the index
+# generation it was answered against, and the answer with its sources.
+# _scope_keys keeps each scope's keys in LRU order (for the per-scope cap and
+# stale sweeps) and _scope_matrices the stacked embeddings of a scope, rebuilt
+# after the scope changed, so a similarity lookup is one matrix-vector product.
+_answer_cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+_scope_keys: Dict[str, "OrderedDict[Tuple[str, str], None]"] = {}
+_scope_matrices: Dict[str, Tuple[List[Tuple[str, str]], Any]] = {}
+_answer_cache_lock = threading.Lock()
+_answer_cache_stats = {"hits_exact": 0, "hits_similar": 0, "misses": 0, "stale": 0, "stores": 0}
+
+
+def _normalize_question(question: str) -> str:
+    return re.sub(r"\s+", " ", question).strip().lower().rstrip("?!. ")
+
+
+def _cache_scope(document_ids: Optional[List[str]], include_images: bool) -> str:
+    return f"{','.join(sorted(document_ids)) if document_ids else '*'}|images={int(include_images)}"
+
+
+def scope_generation(document_ids: Optional[List[str]]) -> str:
+    """Index generation of a document scope (changes when any document in it is re-indexed or deleted)."""
+    if not document_ids:
+        return get_index_generation(None)
+    return ",".join(get_index_generation(doc_id) for doc_id in sorted(document_ids))
+
+
+def _unit_vector(embedding: List[float]) -> Any:
+    import numpy as np
+
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+def _cache_usable(conversation_history: Optional[List[Dict[str, str]]]) -> bool:
+    # Follow-up questions depend on the conversation, so by default only
+    # standalone questions (no history) are served from / stored in the cache
+    return settings.answer_cache_enabled and (settings.answer_cache_with_history or not conversation_history)
+
+
+def _drop_entry(key: Tuple[str, str]) -> None:
+    """Remove a cache entry. Caller holds _answer_cache_lock."""
+    _answer_cache.pop(key, None)
+    keys = _scope_keys.get(key[0])
+    if keys is not None:
+        keys.pop(key, None)
+        if not keys:
+            del _scope_keys[key[0]]
+    _scope_matrices.pop(key[0], None)
+
+
+def _touch_entry(key: Tuple[str, str]) -> None:
+    """Mark an entry most recently used. Caller holds _answer_cache_lock."""
+    _answer_cache.move_to_end(key)
+    _scope_keys[key[0]].move_to_end(key)
+
+
+def _scope_matrix(scope: str) -> Optional[Tuple[List[Tuple[str, str]], Any]]:
+    """(keys, stacked unit embeddings) of a scope. Caller holds _answer_cache_lock."""
+    import numpy as np
+
+    keys = _scope_keys.get(scope)
+    if not keys:
+        return None
+    cached = _scope_matrices.get(scope)
+    if cached is None:
+        key_list = list(keys)
+        cached = (key_list, np.stack([_answer_cache[k]["embedding"] for k in key_list]))
+        _scope_matrices[scope] = cached
+    return cached
+
+
+def lookup_cached_answer(
+    question: str,
+    *,
+    document_id: Optional[str] = None,
+    document_ids: Optional[List[str]] = None,
+    include_images: bool = True,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    query_embedding: Optional[List[float]] = None,
+    generation: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """Return a cached {"answer", "sources"} for this question and document scope, or None.
+
+    Exact (normalized) matches are checked first, then the nearest cached
+    question in the same scope above ANSWER_CACHE_SIMILARITY. Entries answered
+    against an older index generation are dropped. Pass the generation if the
+    caller already read it. Blocking (reads generation markers); call from a
+    thread in async code.
+    """
+    if not _cache_usable(conversation_history):
+        return None
+
+    ids = resolve_document_ids(document_id, document_ids)
+    scope = _cache_scope(ids, include_images)
+    if generation is None:
+        generation = scope_generation(ids)
+    now = time.time()
+    key = (scope, _normalize_question(question))
+
+    with _answer_cache_lock:
+        # Drop expired and stale entries for this scope
+        for entry_key in list(_scope_keys.get(scope, ())):
+            entry = _answer_cache[entry_key]
+            if entry["generation"] != generation or now - entry["created_at"] > settings.answer_cache_ttl_s:
+                _drop_entry(entry_key)
+                _answer_cache_stats["stale"] += 1
+
+        entry = _answer_cache.get(key)
+        if entry is not None:
+            _touch_entry(key)
+            _answer_cache_stats["hits_exact"] += 1
+            logger.info("💾 Answer cache hit (exact) for scope %s", scope)
+            return {"answer": entry["answer"], "sources": entry["sources"]}
+        matrix = _scope_matrix(scope) if query_embedding is not None else None
+
+    if matrix is not None:
+        # Scored outside the lock; the matrix is replaced, never mutated, when the scope changes
+        keys, embeddings = matrix
+        scores = embeddings @ _unit_vector(query_embedding)
+        best = int(scores.argmax())
+        best_score = float(scores[best])
+        if best_score >= settings.answer_cache_similarity:
+            with _answer_cache_lock:
+                entry = _answer_cache.get(keys[best])
+                if entry is not None:
+                    _touch_entry(keys[best])
+                    _answer_cache_stats["hits_similar"] += 1
+                    logger.info("💾 Answer cache hit (similarity %.3f) for scope %s", best_score, scope)
+                    return {"answer": entry["answer"], "sources": entry["sources"]}
+
+    with _answer_cache_lock:
+        _answer_cache_stats["misses"] += 1
+    return None
+
+
+def remember_answer(
+    question: str,
+    answer: str,
+    sources: List[Dict[str, Any]],
+    *,
+    document_id: Optional[str] = None,
+    document_ids: Optional[List[str]] = None,
+    include_images: bool = True,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    query_embedding: Optional[List[float]] = None,
+    generation: Optional[str] = None,
+) -> None:
+    """Store an answer for later lookups.
+
+    Pass the generation read before retrieval so an answer built from an index
+    that changed mid-request is never cached as current. Each scope keeps at
+    most ANSWER_CACHE_MAX_ENTRIES_PER_SCOPE entries (least recently used go first).
+    """
+    if not _cache_usable(conversation_history) or query_embedding is None or not answer:
+        return
+    ids = resolve_document_ids(document_id, document_ids)
+    scope = _cache_scope(ids, include_images)
+    key = (scope, _normalize_question(question))
+    entry = {
+        "embedding": _unit_vector(query_embedding),
+        "generation": generation if generation is not None else scope_generation(ids),
+        "answer": answer,
+        "sources": sources,
+        "created_at": time.time(),
+    }
+    with _answer_cache_lock:
+        _answer_cache[key] = entry
+        _answer_cache.move_to_end(key)
+        _scope_keys.setdefault(scope, OrderedDict())[key] = None
+        _scope_keys[scope].move_to_end(key)
+        _scope_matrices.pop(scope, None)
+        while len(_scope_keys[scope]) > max(1, settings.answer_cache_max_entries_per_scope):
+            _drop_entry(next(iter(_scope_keys[scope])))
+        while len(_answer_cache) > max(1, settings.answer_cache_max_entries):
+            _drop_entry(next(iter(_answer_cache)))
+        _answer_cache_stats["stores"] += 1
+
+
+def invalidate_cached_answers(document_id: Optional[str] = None) -> None:
+    """Drop cached answers whose scope includes a document (and every all-documents answer).
+
+    Other processes notice the change through the index generation instead.
+    """
+    with _answer_cache_lock:
+        for scope in list(_scope_keys):
+            scoped_doc = scope.split("|", 1)[0]
+            if document_id is None or scoped_doc == "*" or document_id in scoped_doc.split(","):
+                for entry_key in list(_scope_keys[scope]):
+                    _drop_entry(entry_key)
+
+
+def answer_cache_stats() -> Dict[str, Any]:
+    with _answer_cache_lock:
+        return {"entries": len(_answer_cache), "scopes": len(_scope_keys), **_answer_cache_stats}
+
+
+# Request coalescing (singleflight): identical concurrent questions share one
+# retrieval + generation. Followers of a non-streaming answer await the
+# leader's task on the event loop (no worker thread is parked per follower);
+# streams subscribe to the leader's event stream and get every event from
+# the start, whenever they join. Query embeddings are shared the same way.
+_flights: Dict[Tuple[str, str, str], "asyncio.Task[Any]"] = {}
+_stream_flights: Dict[Tuple[str, str, str], "StreamFlight"] = {}
+_embedding_flights: Dict[str, "asyncio.Task[List[float]]"] = {}
+_flights_lock = threading.Lock()
+_coalesce_stats = {
+    "leaders": 0, "joined": 0, "stream_leaders": 0, "stream_joined": 0, "embeddings": 0, "embeddings_joined": 0,
+}
+
+
+def coalesce_key(
+    question: str,
+    document_id: Optional[str],
+    include_images: bool,
+    conversation_history: Optional[List[Dict[str, str]]],
+    document_ids: Optional[List[str]] = None,
+) -> Tuple[str, str, str]:
+    """(normalized question, document scope, history fingerprint)."""
+    fingerprint = hashlib.sha1(
+        json.dumps(conversation_history or [], sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    scope = _cache_scope(resolve_document_ids(document_id, document_ids), include_images)
+    return _normalize_question(question), scope, fingerprint
+
+
+def _shared_task(flights: Dict[Any, "asyncio.Task[Any]"], key: Any, start: Callable[[], Any]) -> Tuple["asyncio.Task[Any]", bool]:
+    """The in-flight task for key, or a new one running start(); returns (task, started).
+
+    Must be called on the event loop. The task is dropped from flights when it
+    finishes; callers await it through asyncio.shield so one caller going away
+    doesn't cancel it for the others.
+    """
+    with _flights_lock:
+        task = flights.get(key)
+        if task is not None:
+            return task, False
+        task = asyncio.ensure_future(start())
+        flights[key] = task
+
+    def _done(t: "asyncio.Task[Any]") -> None:
+        with _flights_lock:
+            if flights.get(key) is t:
+                del flights[key]
+        # Mark the error retrieved even if every caller went away
+        t.cancelled() or t.exception()
+
+    task.add_done_callback(_done)
+    return task, True
+
+
+def shared_query_embedding(question: str) -> "asyncio.Task[List[float]]":
+    """Embedding of question, computed once for concurrent identical questions (call on the event loop)."""
+    task, started = _shared_task(
+        _embedding_flights, _normalize_question(question), lambda: asyncio.to_thread(embed_query, question)
+    )
+    with _flights_lock:
+        _coalesce_stats["embeddings" if started else "embeddings_joined"] += 1
+    return task
+
+
+class StreamFlight:
+    """One upstream event stream fanned out to every subscriber.
+
+    The producer runs in its own task so a subscriber disconnecting doesn't
+    stop it for the others; it is cancelled once nobody is listening.
+    state is a dict the producer fills in (e.g. sources, completed) for
+    subscribers to read once the stream ends.
+    """
+
+    def __init__(self, key: Tuple[str, str, str], producer: Callable[[Dict[str, Any]], AsyncIterator[Any]]):
+        self.key = key
+        self.state: Dict[str, Any] = {}
+        self._events: List[Any] = []
+        self._finished = False
+        self._error: Optional[BaseException] = None
+        self._subscribers = 0
+        self._cancelled = False
+        self._changed = asyncio.Condition()
+        self._task = asyncio.create_task(self._pump(producer))
+
+    async def _pump(self, producer: Callable[[Dict[str, Any]], AsyncIterator[Any]]) -> None:
+        try:
+            async for event in producer(self.state):
+                async with self._changed:
+                    self._events.append(event)
+                    self._changed.notify_all()
+        except BaseException as e:
+            self._error = e
+            if not isinstance(e, asyncio.CancelledError):
+                logger.error("Coalesced stream failed: %s", e, exc_info=True)
+        finally:
+            with _flights_lock:
+                if _stream_flights.get(self.key) is self:
+                    del _stream_flights[self.key]
+            async with self._changed:
+                self._finished = True
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        self._subscribers += 1
+        index = 0
+        try:
+            while True:
+                async with self._changed:
+                    while index >= len(self._events) and not self._finished:
+                        await self._changed.wait()
+                    pending = self._events[index:]
+                    finished = self._finished
+                for event in pending:
+                    yield event
+                index += len(pending)
+                if finished and index >= len(self._events):
+                    if self._error is not None and not isinstance(self._error, asyncio.CancelledError):
+                        raise self._error
+                    return
+        finally:
+            self._subscribers -= 1
+            if self._subscribers == 0 and not self._finished:
+                self._cancelled = True
+                self._task.cancel()
+
+
+def join_stream(
+    key: Tuple[str, str, str], producer: Callable[[Dict[str, Any]], AsyncIterator[Any]]
+) -> StreamFlight:
+    """Return the in-flight stream for key, starting producer if there is none."""
+    with _flights_lock:
+        flight = _stream_flights.get(key)
+        if flight is not None and not flight._finished and not flight._cancelled:
+            _coalesce_stats["stream_joined"] += 1
+            logger.info("🔗 Joined in-flight answer stream for an identical question")
+            return flight
+        flight = StreamFlight(key, producer)
+        _stream_flights[key] = flight
+        _coalesce_stats["stream_leaders"] += 1
+        return flight
+
+
+def coalesce_stats() -> Dict[str, Any]:
+    with _flights_lock:
+        return {
+            "in_flight": len(_flights),
+            "streams_in_flight": len(_stream_flights),
+            "embeddings_in_flight": len(_embedding_flights),
+            **_coalesce_stats,
+        }
 
 
 def build_prompt(
@@ -16,25 +384,23 @@ def build_prompt(
     parents: list[dict], 
     conversation_history: Optional[List[Dict[str, str]]] = None,
     include_images: bool = True, 
-    max_chars: int = 8000
+    scores: Optional[List[float]] = None,
+    max_tokens: Optional[int] = None,
 ) -> ChatPromptTemplate:
-    context_text = ""
-    for p in parents:
-        if isinstance(p, dict) and p.get("type") in {"text", "table"}:
-            txt = p.get("text") or ""
-            if txt:
-                context_text += txt
-
-    context_text = context_text[:max_chars]
+    # Deduplicated, neighbour-merged context within CHAT_CONTEXT_MAX_TOKENS
+    context_text = build_context(parents, scores, max_tokens=max_tokens)
     
     # Build conversation context from history
     conversation_context = ""
     if conversation_history:
         conv_parts = []
-        for msg in conversation_history[-10:]:  # Keep last 10 messages for context
+        # History is already bounded by the rolling conversation memory
+        for msg in conversation_history:
             role = msg.get("role", "")
             content = msg.get("content", "")
-            if role == "user":
+            if role == "summary":
+                conv_parts.append(f"Summary of earlier conversation: {content}")
+            elif role == "user":
                 conv_parts.append(f"User: {content}")
             elif role == "assistant":
                 conv_parts.append(f"Assistant: {content}")
@@ -68,43 +434,114 @@ Current Question: {question}
                 prompt_content.append(
                     {
                         "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{p['b64']}"},
+                        "image_url": {"url": f"data:{p.get('mime_type', 'image/jpeg')};base64,{p['b64']}"},
                     }
                 )
 
+    from langchain_core.messages import HumanMessage
+    from langchain_core.prompts import ChatPromptTemplate
+
     return ChatPromptTemplate.from_messages([HumanMessage(content=prompt_content)])
 
 
-@with_rate_limit_retry(max_retries=3, default_wait=60.0)
+@with_rate_limit_retry(max_retries=3, default_wait=60.0, shared_quota=True)
 def _chat_via_gemini(prompt: ChatPromptTemplate) -> str:
     """Generate answer using Gemini chat model."""
+    from langchain_core.output_parsers import StrOutputParser
+
     parser = StrOutputParser()
-    llm = get_chat_llm()
-    chain = prompt | llm | parser
-    return chain.invoke({})
+    response = invoke_hedged(ROLE_CHAT, prompt.format_messages(), lane=quota.INTERACTIVE)
+    return parser.invoke(response)
 
 
-def answer_question(
+async def answer_question(
     question: str, 
     *, 
     document_id: str | None, 
+    document_ids: Optional[List[str]] = None,
     session_id: Optional[str] = None,
     conversation_history: Optional[List[Dict[str, str]]] = None,
     include_images: bool = True, 
     k: int = 5
 ) -> Dict[str, Any]:
+    """Answer a question about one, several (document_ids) or all documents.
+
+    The work runs in a worker thread; identical concurrent questions share
+    one retrieval + generation, and followers wait on the event loop.
+    """
+    ids = resolve_document_ids(document_id, document_ids)
+    key = coalesce_key(question, None, include_images, conversation_history, document_ids=ids)
+    task, started = _shared_task(
+        _flights,
+        key,
+        lambda: asyncio.to_thread(
+            _answer_question,
+            question,
+            document_ids=ids,
+            conversation_history=conversation_history,
+            include_images=include_images,
+            k=k,
+        ),
+    )
+    with _flights_lock:
+        _coalesce_stats["leaders" if started else "joined"] += 1
+    if not started:
+        logger.info("🔗 Joined in-flight answer for an identical question")
+    return await asyncio.shield(task)
+
+
+def _answer_question(
+    question: str,
+    *,
+    document_ids: Optional[List[str]],
+    conversation_history: Optional[List[Dict[str, str]]],
+    include_images: bool,
+    k: int,
+) -> Dict[str, Any]:
+    # Embed once: the same vector serves the cache lookup and retrieval
+    query_embedding = embed_query(question)
+    generation = scope_generation(document_ids)
+    cached = lookup_cached_answer(
+        question,
+        document_ids=document_ids,
+        include_images=include_images,
+        conversation_history=conversation_history,
+        query_embedding=query_embedding,
+        generation=generation,
+    )
+    if cached is not None:
+        return cached
+
     bundle = retrieve_with_sources(
         query=question,
         k=k,
-        document_id=document_id,
+        document_ids=document_ids,
         include_images=include_images,
+        query_embedding=query_embedding,
     )
 
     parents = bundle.get("parents", [])
+    sources = bundle.get("sources", [])
 
     # Use Gemini chat model for final answer; ignore images in chat prompt
-    prompt = build_prompt(question, parents, conversation_history=conversation_history, include_images=False)
+    prompt = build_prompt(
+        question,
+        parents,
+        conversation_history=conversation_history,
+        include_images=False,
+        scores=[s.get("score") for s in sources],
+    )
     answer = _chat_via_gemini(prompt)
-    return {"answer": answer, "sources": bundle.get("sources", [])}
+    remember_answer(
+        question,
+        answer,
+        sources,
+        document_ids=document_ids,
+        include_images=include_images,
+        conversation_history=conversation_history,
+        query_embedding=query_embedding,
+        generation=generation,
+    )
+    return {"answer": answer, "sources": sources}
 
 
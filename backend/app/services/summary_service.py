@@ -5,12 +5,15 @@ from typing import Any, Dict, List, cast
 import logging
 import random
 
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import HumanMessage
-from langchain_core.output_parsers import StrOutputParser
-
 from app.core.config import settings
-from app.services.llm_service import get_text_summarizer_llm, get_image_summarizer_llm
+from app.services.llm_service import (
+    ROLE_IMAGE_SUMMARIZER,
+    ROLE_TEXT_SUMMARIZER,
+    cooldown_remaining,
+    invoke_with_fallback,
+)
+from app.services.image_service import preprocess_images
+from app.utils.cancellation import CancelToken
 from app.utils.file import save_json
 from app.utils.rate_limit import is_rate_limit_error, extract_wait_seconds_from_error
 import time
@@ -41,14 +44,18 @@ def _summarize_one_internal(element_truncated: str, is_title_page: bool, max_ret
             "Content:\n{element}\n\n"
             "Summary:"
         )
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+
     prompt = ChatPromptTemplate.from_template(prompt_text)
-    llm = get_text_summarizer_llm()
-    chain = prompt | llm | StrOutputParser()
+    messages = prompt.format_messages(element=element_truncated)
+    parser = StrOutputParser()
     
     last_error = None
     for attempt in range(max_retries):
         try:
-            result = cast(str, chain.invoke({"element": element_truncated}))
+            response = invoke_with_fallback(ROLE_TEXT_SUMMARIZER, messages)
+            result = cast(str, parser.invoke(response))
             result = result.strip() if result else ""
             # Log successful summary generation
             if result:
@@ -59,6 +66,16 @@ def _summarize_one_internal(element_truncated: str, is_title_page: bool, max_ret
             
             # Check if it's a rate limit error (checks wrapped exceptions too)
             if is_rate_limit_error(e):
+                if settings.quota_enabled:
+                    # Every route is rate limited and the shared quota is paused using
+                    # Gemini's hint; the next acquire() waits it out with every other worker
+                    logging.warning(
+                        "⏸️  RATE LIMIT - Text/Table Summarization | All routes cooling down %.1fs | "
+                        "Retry attempt %d/%d",
+                        cooldown_remaining(ROLE_TEXT_SUMMARIZER), attempt + 1, max_retries
+                    )
+                    continue
+
                 # Extract wait time from error message (checks wrapped exceptions)
                 wait_time = extract_wait_seconds_from_error(e)
                 
@@ -188,7 +205,13 @@ def _summarize_one(element: str, page_number: int = None) -> str:
             return element[:200] + "..." if len(element) > 200 else element
 
 
-def summarize_texts_and_tables(items: List[Any], progress_callback=None, start_progress: int = 10, end_progress: int = 80) -> List[str]:
+def summarize_texts_and_tables(
+    items: List[Any],
+    progress_callback=None,
+    start_progress: int = 10,
+    end_progress: int = 80,
+    cancel_token: CancelToken | None = None,
+) -> List[str]:
     """
     Summarize texts and tables sequentially to avoid rate limit collisions.
     
@@ -200,6 +223,7 @@ def summarize_texts_and_tables(items: List[Any], progress_callback=None, start_p
         progress_callback: Optional function(progress: int) to call after each chunk
         start_progress: Starting progress percentage (default 10)
         end_progress: Ending progress percentage (default 80)
+        cancel_token: Checked before each chunk; raises OperationCancelled once cancelled
     """
     inputs: List[tuple[str, int]] = []
     for it in items:
@@ -234,10 +258,13 @@ def summarize_texts_and_tables(items: List[Any], progress_callback=None, start_p
     
     # Process sequentially to avoid rate limit collisions
     for idx, (txt, page_num) in enumerate(inputs):
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
         try:
             # Add a small delay between requests to respect rate limits proactively
             # This helps prevent hitting the rate limit in the first place
-            if idx > 0:
+            # (not needed when the shared quota manager paces requests)
+            if idx > 0 and not settings.quota_enabled:
                 delay = random.uniform(0.5, 1.5)  # 0.5-1.5 seconds between requests
                 logging.debug("Adding delay %.1fs between text/table requests", delay)
                 time.sleep(delay)
@@ -272,7 +299,14 @@ def summarize_texts_and_tables(items: List[Any], progress_callback=None, start_p
 
 
 
-def summarize_images(images_b64: List[str], progress_callback=None, start_progress: int = 10, end_progress: int = 80) -> List[str]:
+def summarize_images(
+    images_b64: List[str],
+    progress_callback=None,
+    start_progress: int = 10,
+    end_progress: int = 80,
+    mime_types: List[str] | None = None,
+    cancel_token: CancelToken | None = None,
+) -> List[str]:
     """
     Summarize images sequentially to avoid rate limit collisions.
     
@@ -285,11 +319,13 @@ def summarize_images(images_b64: List[str], progress_callback=None, start_progre
         progress_callback: Optional function(progress: int) to call after each chunk
         start_progress: Starting progress percentage (default 10)
         end_progress: Ending progress percentage (default 80)
+        mime_types: Optional MIME type per image (defaults to image/jpeg)
+        cancel_token: Checked before each image; raises OperationCancelled once cancelled
     """
     if not images_b64:
         return []
 
-    def _summ_img_internal(b64: str, max_retries: int = 3) -> str:
+    def _summ_img_internal(b64: str, mime_type: str = "image/jpeg", max_retries: int = 3) -> str:
         """
         Internal function to call Gemini API for image summarization with rate limit retry.
         
@@ -302,13 +338,14 @@ def summarize_images(images_b64: List[str], progress_callback=None, start_progre
         )
         
         # Create message with image for vision model
-        llm = get_image_summarizer_llm()
+        from langchain_core.messages import HumanMessage
+
         message = HumanMessage(
             content=[
                 {"type": "text", "text": prompt_text},
                 {
                     "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{b64}"}
+                    "image_url": {"url": f"data:{mime_type};base64,{b64}"}
                 }
             ]
         )
@@ -316,7 +353,7 @@ def summarize_images(images_b64: List[str], progress_callback=None, start_progre
         last_error = None
         for attempt in range(max_retries):
             try:
-                response = llm.invoke([message])
+                response = invoke_with_fallback(ROLE_IMAGE_SUMMARIZER, [message])
                 result = response.content if hasattr(response, 'content') else str(response)
                 result = result.strip() if result else ""
                 # Log successful summary generation
@@ -329,6 +366,15 @@ def summarize_images(images_b64: List[str], progress_callback=None, start_progre
                 
                 # Check if it's a rate limit error (checks wrapped exceptions too)
                 if is_rate_limit_error(e):
+                    if settings.quota_enabled:
+                        # Every route is cooling down with Gemini's hint - acquire() waits
+                        logging.warning(
+                            "⏸️  RATE LIMIT - Image Summarization | All routes cooling down %.1fs | "
+                            "Retry attempt %d/%d",
+                            cooldown_remaining(ROLE_IMAGE_SUMMARIZER), attempt + 1, max_retries
+                        )
+                        continue
+
                     # Extract wait time from error message (checks wrapped exceptions)
                     wait_time = extract_wait_seconds_from_error(e)
                     
@@ -379,9 +425,9 @@ def summarize_images(images_b64: List[str], progress_callback=None, start_progre
         logging.error("❌ All retries exhausted for image summarization. Last error: %s", type(last_error).__name__)
         raise last_error
 
-    def _summ_img(b64: str) -> str:
+    def _summ_img(b64: str, mime_type: str) -> str:
         try:
-            return _summ_img_internal(b64)
+            return _summ_img_internal(b64, mime_type)
         except Exception as e:
             error_msg = str(e)
             error_type = type(e).__name__
@@ -426,15 +472,19 @@ def summarize_images(images_b64: List[str], progress_callback=None, start_progre
     progress_per_chunk = progress_range / total_images if total_images > 0 else 0
     
     for idx, b64 in enumerate(images_b64):
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
         try:
             # Add a small delay between requests to respect rate limits proactively
             # This helps prevent hitting the rate limit in the first place
-            if idx > 0:
+            # (not needed when the shared quota manager paces requests)
+            if idx > 0 and not settings.quota_enabled:
                 delay = random.uniform(0.5, 1.5)  # 0.5-1.5 seconds between requests
                 logging.debug("Adding delay %.1fs between image requests", delay)
                 time.sleep(delay)
             
-            summary = _summ_img(b64)
+            mime_type = mime_types[idx] if mime_types and idx < len(mime_types) else "image/jpeg"
+            summary = _summ_img(b64, mime_type)
             results[idx] = summary
             
             # Update progress after each chunk
@@ -463,7 +513,11 @@ def summarize_images(images_b64: List[str], progress_callback=None, start_progre
     return results
 
 
-def build_summaries(parents: Dict[str, List[Dict[str, Any]]], progress_callback=None) -> Dict[str, List[str]]:
+def build_summaries(
+    parents: Dict[str, List[Dict[str, Any]]],
+    progress_callback=None,
+    cancel_token: CancelToken | None = None,
+) -> Dict[str, List[str]]:
     """
     Build summaries for all content. Raises exception if failure rate is too high.
     
@@ -473,9 +527,17 @@ def build_summaries(parents: Dict[str, List[Dict[str, Any]]], progress_callback=
     - Progress updates after each chunk is completed
     - When Ollama embeddings are disabled, images are skipped
     
+    Images are preprocessed first (downscaled, recompressed, decorative images
+    dropped). parents["images"] is replaced with the kept images so it stays
+    aligned with image_summaries for indexing. Preprocessing counts are returned
+    under "image_stats".
+    
     Args:
         parents: Dictionary with 'images', 'texts', 'tables' keys
-        progress_callback: Optional function(progress: int) to call with progress updates (0-100)
+        progress_callback: Optional function(progress: int, done: int, total: int) called after
+            each chunk with overall progress (0-100) and the number of chunks summarized so far
+        cancel_token: Optional CancelToken checked between chunks; OperationCancelled
+            propagates to the caller (nothing is persisted here)
     """
     from app.core.config import settings
     
@@ -484,13 +546,17 @@ def build_summaries(parents: Dict[str, List[Dict[str, Any]]], progress_callback=
     PROGRESS_END = 80
     
     # Skip images if Ollama embeddings are disabled
+    image_stats: Dict[str, int] = {}
     if settings.use_ollama_embeddings:
-        images = parents.get("images", [])
-        images_b64 = [img.get("b64") for img in images if img.get("b64")]
+        images, image_stats = preprocess_images(parents.get("images", []))
+        parents["images"] = images
+        images_b64 = [img["b64"] for img in images]
+        image_mime_types = [img.get("mime_type", "image/jpeg") for img in images]
     else:
         logging.info("Image summarization skipped (Ollama embeddings disabled - text-only mode)")
         images = []
         images_b64 = []
+        image_mime_types = []
     
     text_and_tables = parents.get("texts", []) + parents.get("tables", [])
     
@@ -501,12 +567,23 @@ def build_summaries(parents: Dict[str, List[Dict[str, Any]]], progress_callback=
         return {
             "text_table_summaries": [],
             "image_summaries": [],
+            "image_stats": image_stats,
         }
     
     # Calculate progress ranges - images come first, then text/tables
     # All chunks share the 10-80% range equally
     images_count = len(images_b64)
     text_count = len(text_and_tables)
+
+    # The per-stage summarizers report one call per chunk; add the running count
+    chunk_progress = None
+    if progress_callback:
+        chunks_done = 0
+
+        def chunk_progress(progress: int) -> None:
+            nonlocal chunks_done
+            chunks_done = min(chunks_done + 1, total_chunks)
+            progress_callback(progress, chunks_done, total_chunks)
     
     # Calculate where images end and text begins
     if images_count > 0:
@@ -519,9 +596,11 @@ def build_summaries(parents: Dict[str, List[Dict[str, Any]]], progress_callback=
         logging.info("Starting image summarization (%d images)...", len(images_b64))
         image_summaries = summarize_images(
             images_b64, 
-            progress_callback=progress_callback,
+            progress_callback=chunk_progress,
             start_progress=PROGRESS_START,
-            end_progress=images_end_progress
+            end_progress=images_end_progress,
+            mime_types=image_mime_types,
+            cancel_token=cancel_token,
         )
         logging.info("Image summarization completed (progress: %d%%)", images_end_progress)
     else:
@@ -535,9 +614,10 @@ def build_summaries(parents: Dict[str, List[Dict[str, Any]]], progress_callback=
         logging.info("Starting text/table summarization (%d items)...", len(text_and_tables))
         text_table_summaries = summarize_texts_and_tables(
             text_and_tables,
-            progress_callback=progress_callback,
+            progress_callback=chunk_progress,
             start_progress=images_end_progress,
-            end_progress=PROGRESS_END
+            end_progress=PROGRESS_END,
+            cancel_token=cancel_token,
         )
         logging.info("Text/table summarization completed (progress: %d%%)", PROGRESS_END)
     else:
@@ -545,7 +625,7 @@ def build_summaries(parents: Dict[str, List[Dict[str, Any]]], progress_callback=
     
     # Ensure we end at 80% after all summarization
     if progress_callback:
-        progress_callback(PROGRESS_END)
+        progress_callback(PROGRESS_END, total_chunks, total_chunks)
 
     # Check if too many summaries failed (indicating a critical issue like invalid API key)
     # Count failures: empty strings, error messages, or very short summaries (< 20 chars)
@@ -556,6 +636,7 @@ def build_summaries(parents: Dict[str, List[Dict[str, Any]]], progress_callback=
         return {
             "text_table_summaries": text_table_summaries,
             "image_summaries": image_summaries,
+            "image_stats": image_stats,
         }
     
     failed_count = 0
@@ -593,6 +674,7 @@ def build_summaries(parents: Dict[str, List[Dict[str, Any]]], progress_callback=
     return {
         "text_table_summaries": text_table_summaries,
         "image_summaries": image_summaries,
+        "image_stats": image_stats,
     }
 
 
@@ -1,19 +1,19 @@
 from __future__ import annotations
 
 import os
+import time
 import uuid
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional, Tuple, Union, TYPE_CHECKING
 
-import chromadb
-from langchain_chroma import Chroma
-
 from app.core.config import settings
+from app.utils.cancellation import CancelToken, OperationCancelled
 from app.utils.file import load_json, save_json
 
-# Lazy imports for embedding providers (only import when needed)
+# Lazy imports for Chroma and embedding providers (only import when needed)
 if TYPE_CHECKING:
-    from langchain_ollama import OllamaEmbeddings
+    from langchain_chroma import Chroma
     from langchain_google_genai import GoogleGenerativeAIEmbeddings
 
 
@@ -27,10 +27,27 @@ def _parents_index_path(doc_id: str) -> str:
     return os.path.join(_parents_index_dir(), f"{doc_id}.json")
 
 
-def _load_parents_index(doc_id: str) -> Dict[str, Any]:
-    """Load parents index for a document."""
+# Parsed parents indexes for read-only use, keyed by doc_id -> (mtime_ns, index)
+_parents_index_cache: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+_PARENTS_INDEX_CACHE_SIZE = 16
+
+
+def _load_parents_index_cached(doc_id: str) -> Dict[str, Any]:
+    """Parents index for reading, reparsed only when the file changes. Do not mutate."""
     path = _parents_index_path(doc_id)
-    return load_json(path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        _parents_index_cache.pop(doc_id, None)
+        return {}
+    cached = _parents_index_cache.get(doc_id)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    index = load_json(path)
+    if doc_id not in _parents_index_cache and len(_parents_index_cache) >= _PARENTS_INDEX_CACHE_SIZE:
+        _parents_index_cache.pop(next(iter(_parents_index_cache)))
+    _parents_index_cache[doc_id] = (mtime, index)
+    return index
 
 
 def _save_parents_index(doc_id: str, index: Dict[str, Any]) -> None:
@@ -39,22 +56,49 @@ def _save_parents_index(doc_id: str, index: Dict[str, Any]) -> None:
     save_json(path, index)
 
 
+def _generations_dir() -> str:
+    path = os.path.join(settings.data_dir, "index_generations")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_index_generation(doc_id: Optional[str] = None) -> str:
+    """Current index generation for a document (or the whole index when doc_id is None).
+
+    Generations are stored as small marker files so every process sees changes
+    made by any other process; the value changes whenever the document is
+    re-indexed or deleted.
+    """
+    path = os.path.join(_generations_dir(), doc_id or "_all")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip() or "0"
+    except FileNotFoundError:
+        return "0"
+
+
+def _bump_index_generation(doc_id: str) -> None:
+    """Mark a document (and the whole index) as changed."""
+    stamp = str(time.time_ns())
+    for name in (doc_id, "_all"):
+        path = os.path.join(_generations_dir(), name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(stamp)
+        os.replace(tmp_path, path)
+
+
 def _get_embeddings() -> Any:
     """Get the appropriate embedding function based on configuration."""
+    if settings.embedding_provider == "fake":
+        from app.services.fake_providers import FakeEmbeddings
+        logging.info("Using fake hashed-feature embeddings (dim=%d)", settings.fake_embedding_dim)
+        return FakeEmbeddings()
     if settings.use_ollama_embeddings:
-        try:
-            from langchain_ollama import OllamaEmbeddings
-        except ImportError:
-            raise ImportError(
-                "langchain-ollama is not installed. "
-                "Install it with: pip install langchain-ollama "
-                "or: poetry add langchain-ollama"
-            )
-        logging.info("Using Ollama embeddings: %s at %s", settings.embedding_model_id, settings.ollama_base_url)
-        return OllamaEmbeddings(
-            model=settings.embedding_model_id,
-            base_url=settings.ollama_base_url,
-        )
+        # Shared instance: pooled connections, batched /api/embed calls, keep_alive
+        from app.services.ollama_embeddings import get_ollama_embeddings
+
+        return get_ollama_embeddings()
     else:
         try:
             from langchain_google_genai import GoogleGenerativeAIEmbeddings
@@ -78,7 +122,14 @@ def _get_embeddings() -> Any:
 
 def _get_vectorstore() -> Chroma:
     """Get or create the ChromaDB vectorstore."""
-    client = chromadb.PersistentClient(path=settings.chroma_dir)
+    import chromadb
+    from langchain_chroma import Chroma
+
+    if settings.chroma_host:
+        # Shared Chroma server: needed when job workers run in separate processes
+        client = chromadb.HttpClient(host=settings.chroma_host, port=settings.chroma_port)
+    else:
+        client = chromadb.PersistentClient(path=settings.chroma_dir)
     embeddings = _get_embeddings()
     
     collection_name = "multi_modal_rag"
@@ -105,13 +156,40 @@ def _get_vectorstore() -> Chroma:
         )
 
 
-def index_multivector(doc_id: str, parents: Dict[str, List[Dict[str, Any]]], summaries: Dict[str, List[str]]) -> None:
+def embed_query(query: str) -> List[float]:
+    """Embed a query with the configured embedding provider."""
+    return _get_embeddings().embed_query(query)
+
+
+def warm_up_index(query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+    """Open the collection and run one probe query so its index is in memory before the first chat."""
+    vectorstore = _get_vectorstore()
+    if query_embedding is None:
+        query_embedding = embed_query("warm-up")
+    results = _search(vectorstore, "warm-up", query_embedding, 1, None)
+    return {"probe_results": len(results)}
+
+
+def index_multivector(
+    doc_id: str,
+    parents: Dict[str, List[Dict[str, Any]]],
+    summaries: Dict[str, List[str]],
+    cancel_token: Optional[CancelToken] = None,
+) -> None:
     """Index summaries and link to original parents.
 
     parents: { texts: [...], tables: [...], images: [...] }
     summaries: { text_table_summaries: [...], image_summaries: [...] }
+
+    Vectors are added in INDEX_BATCH_SIZE batches with cancel_token checked
+    before each one. Indexing replaces whatever an earlier (failed or
+    interrupted) attempt wrote for doc_id, and on any failure, cancellation
+    included, the vectors already written are removed and the parents index
+    is not saved, so a retried job never leaves orphaned vectors behind.
     """
     vectorstore = _get_vectorstore()
+    # Leftovers of a previous attempt (e.g. a worker killed mid-batch)
+    delete_vectors_for_document(doc_id)
 
     text_and_tables: List[Dict[str, Any]] = parents.get("texts", []) + parents.get("tables", [])
     text_table_summaries: List[str] = summaries.get("text_table_summaries", [])
@@ -119,8 +197,8 @@ def index_multivector(doc_id: str, parents: Dict[str, List[Dict[str, Any]]], sum
     images: List[Dict[str, Any]] = parents.get("images", [])
     image_summaries: List[str] = summaries.get("image_summaries", [])
 
-    # build parent index for this doc
-    parent_index = _load_parents_index(doc_id)
+    # build parent index for this doc (from scratch: its old vectors are gone)
+    parent_index: Dict[str, Any] = {}
 
     # prepare child docs
     from langchain_core.documents import Document as LCDocument
@@ -132,7 +210,8 @@ def index_multivector(doc_id: str, parents: Dict[str, List[Dict[str, Any]]], sum
         if i >= len(text_table_summaries):
             break
         parent_id = str(uuid.uuid4())
-        parent_index[parent_id] = parent
+        # Summary kept with the parent so stored source refs hydrate without Chroma
+        parent_index[parent_id] = {**parent, "summary": text_table_summaries[i]}
         meta = {
             "doc_id": doc_id,
             "parent_id": parent_id,
@@ -147,7 +226,7 @@ def index_multivector(doc_id: str, parents: Dict[str, List[Dict[str, Any]]], sum
         if i >= len(image_summaries):
             break
         parent_id = str(uuid.uuid4())
-        parent_index[parent_id] = parent
+        parent_index[parent_id] = {**parent, "summary": image_summaries[i]}
         meta = {
             "doc_id": doc_id,
             "parent_id": parent_id,
@@ -158,9 +237,80 @@ def index_multivector(doc_id: str, parents: Dict[str, List[Dict[str, Any]]], sum
         child_docs.append(LCDocument(page_content=image_summaries[i], metadata=meta))
 
     # upsert into vectorstore and persist parent index
-    if child_docs:
-        vectorstore.add_documents(child_docs)
+    batch_size = max(1, settings.index_batch_size)
+    try:
+        for start in range(0, len(child_docs), batch_size):
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+            vectorstore.add_documents(child_docs[start:start + batch_size])
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+    except BaseException:
+        delete_vectors_for_document(doc_id)
+        raise
     _save_parents_index(doc_id, parent_index)
+    _bump_index_generation(doc_id)
+
+
+def resolve_document_ids(
+    document_id: Optional[str] = None, document_ids: Optional[List[str]] = None
+) -> Optional[List[str]]:
+    """Merge the single and multi document parameters into a deduplicated list (None = all documents)."""
+    ids: List[str] = []
+    for doc_id in ([document_id] if document_id else []) + list(document_ids or []):
+        if doc_id and doc_id not in ids:
+            ids.append(doc_id)
+    return ids or None
+
+
+def _where(doc_id: Optional[str], include_images: bool) -> Optional[Dict[str, Any]]:
+    conditions: List[Dict[str, Any]] = []
+    if doc_id:
+        conditions.append({"doc_id": doc_id})
+    if not include_images:
+        conditions.append({"type": {"$ne": "image"}})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def _search(
+    vectorstore: Chroma,
+    query: str,
+    query_embedding: Optional[List[float]],
+    k: int,
+    where: Optional[Dict[str, Any]],
+) -> List[Tuple[Any, float]]:
+    """(document, distance) pairs, nearest first. Despite its name the by-vector
+    call returns raw Chroma distances too, so both paths share one scale."""
+    if query_embedding is not None:
+        return vectorstore.similarity_search_by_vector_with_relevance_scores(query_embedding, k=k, filter=where)
+    return vectorstore.similarity_search_with_score(query, k=k, filter=where)
+
+
+def _apply_document_quotas(
+    ranked: List[Tuple[Any, float]], document_ids: List[str], k: int
+) -> List[Tuple[Any, float]]:
+    """Pick k results so every document gets its share before the rest go to the best scores.
+
+    ranked must be best-first. Each document is guaranteed k // len(document_ids)
+    slots (at least one) when it has enough matches.
+    """
+    quota = max(1, k // len(document_ids))
+    taken: Dict[str, int] = {}
+    chosen: List[int] = []
+    for i, (doc, _) in enumerate(ranked):
+        doc_id = (doc.metadata or {}).get("doc_id")
+        if taken.get(doc_id, 0) < quota:
+            taken[doc_id] = taken.get(doc_id, 0) + 1
+            chosen.append(i)
+    chosen_set = set(chosen)
+    for i in range(len(ranked)):
+        if len(chosen) >= k:
+            break
+        if i not in chosen_set:
+            chosen.append(i)
+    return [ranked[i] for i in sorted(chosen)]
 
 
 def retrieve_with_sources(
@@ -168,22 +318,38 @@ def retrieve_with_sources(
     *,
     k: int = 5,
     document_id: Optional[str] = None,
+    document_ids: Optional[List[str]] = None,
     include_images: bool = True,
+    query_embedding: Optional[List[float]] = None,
 ) -> Dict[str, Any]:
-    vectorstore = _get_vectorstore()
+    """Retrieve the best matching children and resolve their parents.
 
-    where: Dict[str, Any] = {}
-    if document_id:
-        where["doc_id"] = document_id
-
-    # langchain_community Chroma doesn't expose where in similarity_search directly
-    # so we use the underlying collection through search kwargs, or filter later.
-    # Easiest approach: retrieve more and filter by metadata doc_id.
-    results: List[Tuple[Any, float]] = vectorstore.similarity_search_with_score(query, k=max(k * 3, 10))
+    With several document ids each document is searched in parallel with its
+    own filter; the results are merged on their raw scores (same collection,
+    same metric) and per-document quotas keep one large document from
+    crowding out the others. Pass query_embedding to reuse an embedding the
+    caller already computed.
+    """
+    vectorstore = _get_vectorstore()
+    ids = resolve_document_ids(document_id, document_ids)
+
+    if ids and len(ids) > 1:
+        if query_embedding is None:
+            query_embedding = embed_query(query)
+        k = max(k, len(ids))  # Every selected document gets at least one slot
+        per_doc_k = max(k, 5)
+        workers = max(1, min(len(ids), settings.retrieval_max_parallel))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="retrieval") as executor:
+            per_doc = list(executor.map(
+                lambda doc_id: _search(vectorstore, query, query_embedding, per_doc_k, _where(doc_id, include_images)),
+                ids,
+            ))
+        results: List[Tuple[Any, float]] = [r for doc_results in per_doc for r in doc_results]
+    else:
+        results = _search(
+            vectorstore, query, query_embedding, max(k * 3, 10), _where(ids[0] if ids else None, include_images)
+        )
 
-    sources: List[Dict[str, Any]] = []
-    parents_resolved: List[Any] = []
-    
     # ChromaDB via LangChain returns distance scores (lower = better) for cosine distance
     # Normalize and convert to similarity scores (higher = better) for better interpretability
     raw_scores = [score for _, score in results if score is not None]
@@ -203,11 +369,20 @@ def retrieve_with_sources(
             # Use max(2.0, max_score) as normalization factor for cosine distance
             normalization_factor = max(2.0, max_score * 1.1)  # Add 10% buffer
 
+    if ids and len(ids) > 1:
+        # Merge per-document lists best-first, then apply the quotas. Both _search
+        # paths return Chroma distances (lower = better) whatever their range
+        results.sort(key=lambda r: r[1] if r[1] is not None else float("inf"))
+        results = _apply_document_quotas(results, ids, k)
+
     # collect results by doc and resolve parents
+    sources: List[Dict[str, Any]] = []
+    parents_resolved: List[Any] = []
     taken = 0
+    parent_indexes: Dict[str, Dict[str, Any]] = {}
     for doc, raw_score in results:
         md = doc.metadata or {}
-        if document_id and md.get("doc_id") != document_id:
+        if ids and md.get("doc_id") not in ids:
             continue
         if not include_images and md.get("type") == "image":
             continue
@@ -215,8 +390,9 @@ def retrieve_with_sources(
         doc_id = md.get("doc_id")
         if not parent_id or not doc_id:
             continue
-        pindex = _load_parents_index(doc_id)
-        parent = pindex.get(parent_id)
+        if doc_id not in parent_indexes:
+            parent_indexes[doc_id] = _load_parents_index_cached(doc_id)
+        parent = parent_indexes[doc_id].get(parent_id)
         if not parent:
             continue
 
@@ -235,6 +411,7 @@ def retrieve_with_sources(
 
         src: Dict[str, Any] = {
             "parent_id": parent_id,
+            "doc_id": doc_id,
             "type": md.get("type"),
             "page_number": md.get("page_number"),
             "source": md.get("source"),
@@ -256,12 +433,84 @@ def retrieve_with_sources(
         if taken >= k:
             break
 
-    # Sort sources by normalized similarity score in descending order (higher score = better match)
-    sources.sort(key=lambda x: x.get("score", 0), reverse=True)
+    # Sort sources by normalized similarity score in descending order (higher score = better match),
+    # keeping parents aligned with their sources
+    order = sorted(range(len(sources)), key=lambda i: sources[i].get("score", 0), reverse=True)
+    sources = [sources[i] for i in order]
+    parents_resolved = [parents_resolved[i] for i in order]
 
     return {"sources": sources, "parents": parents_resolved}
 
 
+def hydrate_source_refs(ref_lists: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+    """Expand stored source refs (see Message.set_sources) into full sources.
+
+    Takes the refs of many messages at once: each document's parents index is
+    loaded once, and summaries missing from older indexes come from a single
+    Chroma lookup. Full sources (legacy rows) pass through unchanged; refs
+    whose parent no longer exists are dropped.
+    """
+    doc_ids = {ref.get("doc_id") for refs in ref_lists for ref in refs if "summary" not in ref}
+    indexes = {doc_id: _load_parents_index_cached(doc_id) for doc_id in doc_ids if doc_id}
+
+    def parent_of(ref: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return indexes.get(ref.get("doc_id"), {}).get(ref.get("parent_id"))
+
+    missing_summaries = sorted({
+        ref["parent_id"]
+        for refs in ref_lists for ref in refs
+        if "summary" not in ref and parent_of(ref) is not None and "summary" not in parent_of(ref)
+    })
+    summaries: Dict[str, str] = {}
+    if missing_summaries:
+        try:
+            found = _get_vectorstore().get(where={"parent_id": {"$in": missing_summaries}})
+            for text, md in zip(found.get("documents") or [], found.get("metadatas") or []):
+                if md and md.get("parent_id"):
+                    summaries[md["parent_id"]] = text or ""
+        except Exception as e:
+            logging.warning(f"Could not load source summaries: {e}")
+
+    hydrated: List[List[Dict[str, Any]]] = []
+    for refs in ref_lists:
+        sources: List[Dict[str, Any]] = []
+        for ref in refs:
+            if "summary" in ref:
+                sources.append(ref)
+                continue
+            parent = parent_of(ref)
+            if parent is None:
+                continue
+            src: Dict[str, Any] = {
+                "parent_id": ref["parent_id"],
+                "doc_id": ref["doc_id"],
+                "type": ref.get("type") or parent.get("type"),
+                "page_number": ref["page_number"] if ref.get("page_number") is not None else parent.get("page_number"),
+                "source": parent.get("source"),
+                "summary": parent.get("summary") or summaries.get(ref["parent_id"], ""),
+                "score": ref.get("score"),
+            }
+            if src["type"] == "image":
+                src["image_b64"] = parent.get("b64")
+            elif src["type"] == "table":
+                src["table_html"] = parent.get("table_html")
+                src["text"] = parent.get("text")
+            else:
+                src["text"] = parent.get("text")
+            sources.append(src)
+        hydrated.append(sources)
+    return hydrated
+
+
+
+def discard_document_index(doc_id: str) -> None:
+    """Remove everything indexing wrote for a document (vectors and parents index)."""
+    delete_vectors_for_document(doc_id)
+    try:
+        os.remove(_parents_index_path(doc_id))
+    except OSError:
+        pass
+
 
 def delete_vectors_for_document(doc_id: str) -> None:
     """Delete all vectors for a given document id from Chroma."""
@@ -272,4 +521,5 @@ def delete_vectors_for_document(doc_id: str) -> None:
     except Exception:
         # Best-effort cleanup; ignore if collection missing
         pass
+    _bump_index_generation(doc_id)
 
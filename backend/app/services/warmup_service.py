@@ -0,0 +1,124 @@
+"""Startup warm-up: pay the cold-start costs before the first request does.
+
+Constructing the LLM clients is cheap; what the first chat or upload really
+waits for is the embedding model load (Ollama loads a model on its first
+call), opening the Chroma collection and reading its index, and, for
+ingestion, the unstructured layout models. run_warmup() does each of those
+once and records how long it took. The web app runs it in a background
+thread and /api/health reports 503 until it has finished, so load
+balancers only route traffic to warm replicas.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+STEP_LLM_CLIENTS = "llm_clients"
+STEP_EMBEDDING = "embedding"
+STEP_VECTOR_INDEX = "vector_index"
+STEP_LAYOUT_MODELS = "layout_models"
+
+_lock = threading.Lock()
+_state: Dict[str, Any] = {"status": "pending", "started_at": None, "finished_at": None, "steps": {}}
+
+
+def warmup_state() -> Dict[str, Any]:
+    """Copy of the warm-up status: pending, running, ready (all steps ok) or degraded (some failed)."""
+    with _lock:
+        state = {**_state, "steps": {name: dict(step) for name, step in _state["steps"].items()}}
+    state["ready"] = state["status"] in ("ready", "degraded")
+    return state
+
+
+def is_ready() -> bool:
+    return warmup_state()["ready"]
+
+
+def _run_step(name: str, fn: Callable[[], Optional[Dict[str, Any]]]) -> bool:
+    start = time.perf_counter()
+    try:
+        details = fn() or {}
+        ok, error = True, None
+    except Exception as e:
+        details, ok, error = {}, False, str(e)[:300]
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+    with _lock:
+        _state["steps"][name] = {"ok": ok, "ms": elapsed_ms, "error": error, **details}
+    if ok:
+        logger.info("✓ Warm-up %s done in %.0f ms", name, elapsed_ms)
+    else:
+        logger.warning("Warm-up %s failed after %.0f ms: %s", name, elapsed_ms, error)
+    return ok
+
+
+def _llm_clients() -> None:
+    from app.services.llm_service import get_image_summarizer_llm, get_text_summarizer_llm, warm_chat_pool
+
+    get_text_summarizer_llm()
+    warm_chat_pool()
+    if settings.use_ollama_embeddings:
+        get_image_summarizer_llm()
+
+
+def run_warmup(steps: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Run the warm-up steps (blocking) and return the final state.
+
+    steps defaults to everything this process needs: LLM clients, a probe
+    embedding, the vector index and, when WARMUP_LAYOUT_MODELS is set and
+    ingestion runs here, the layout models.
+    """
+    if steps is None:
+        steps = [STEP_LLM_CLIENTS, STEP_EMBEDDING, STEP_VECTOR_INDEX]
+        if settings.warmup_layout_models and settings.job_worker_threads > 0:
+            steps.append(STEP_LAYOUT_MODELS)
+
+    with _lock:
+        _state.update(status="running", started_at=datetime.now(timezone.utc).isoformat(), finished_at=None)
+    start = time.perf_counter()
+    probe: Dict[str, Any] = {}
+
+    def embedding() -> Dict[str, Any]:
+        from app.services.vector_service import embed_query
+
+        probe["embedding"] = embed_query("warm-up")
+        return {"dimension": len(probe["embedding"])}
+
+    def vector_index() -> Dict[str, Any]:
+        from app.services.vector_service import warm_up_index
+
+        return warm_up_index(probe.get("embedding"))
+
+    def layout_models() -> None:
+        from app.services.pdf_service import preload_layout_models
+
+        preload_layout_models()
+
+    runners = {
+        STEP_LLM_CLIENTS: _llm_clients,
+        STEP_EMBEDDING: embedding,
+        STEP_VECTOR_INDEX: vector_index,
+        STEP_LAYOUT_MODELS: layout_models,
+    }
+    all_ok = True
+    for name in steps:
+        all_ok = _run_step(name, runners[name]) and all_ok
+
+    with _lock:
+        _state.update(status="ready" if all_ok else "degraded", finished_at=datetime.now(timezone.utc).isoformat())
+    logger.info("🔥 Warm-up %s in %.1f s", "complete" if all_ok else "finished with errors", time.perf_counter() - start)
+    return warmup_state()
+
+
+def start_warmup() -> None:
+    """Run the warm-up in a background thread (or mark ready at once when WARMUP_ENABLED is off)."""
+    if not settings.warmup_enabled:
+        with _lock:
+            _state.update(status="ready", finished_at=datetime.now(timezone.utc).isoformat())
+        logger.info("⏭️  Warm-up disabled (WARMUP_ENABLED=false)")
+        return
+    threading.Thread(target=run_warmup, name="warmup", daemon=True).start()
@@ -0,0 +1,45 @@
+"""Cooperative cancellation for long-running work (document ingestion).
+
+Work loops call token.raise_if_cancelled() between units (a summary, an
+embedding batch). A token is cancelled directly with cancel() (same
+process) or by its probe, a callable polled at most every probe_interval_s
+that looks for a cancellation recorded elsewhere (e.g. in the database by
+another process).
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+
+class OperationCancelled(Exception):
+    """Raised at a checkpoint once the work's token is cancelled."""
+
+
+class CancelToken:
+    def __init__(self, probe: Optional[Callable[[], bool]] = None, probe_interval_s: float = 1.0):
+        self._event = threading.Event()
+        self._probe = probe
+        self._probe_interval_s = probe_interval_s
+        self._probed_at = 0.0
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        if self._probe is not None:
+            now = time.monotonic()
+            if now - self._probed_at >= self._probe_interval_s:
+                self._probed_at = now
+                try:
+                    if self._probe():
+                        self._event.set()
+                except Exception:
+                    pass  # A failing probe must not abort the work
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise OperationCancelled()
@@ -1,7 +1,9 @@
 """File and path utility functions."""
 import os
 import json
-from typing import Any, Dict
+import hashlib
+import tempfile
+from typing import Any, BinaryIO, Dict, Tuple
 
 
 def ensure_dir(path: str) -> None:
@@ -24,3 +26,47 @@ def load_json(file_path: str) -> Dict[str, Any]:
         return json.load(f)
 
 
+class FileTooLargeError(ValueError):
+    """Raised by save_stream when the source exceeds max_bytes."""
+
+
+def save_stream(
+    src: BinaryIO,
+    dest_path: str,
+    *,
+    max_bytes: int,
+    chunk_size: int = 1024 * 1024,
+    temp_dir: str | None = None,
+) -> Tuple[int, str]:
+    """Copy a binary stream to dest_path in chunks, hashing as it goes.
+
+    Writes to a temp file (in temp_dir, default the destination directory;
+    must be on the same filesystem) and renames it into place, so dest_path
+    never holds a partial file. Stops reading as soon as max_bytes is
+    exceeded. Returns (size in bytes, sha256 hex digest).
+    """
+    temp_dir = temp_dir or os.path.dirname(dest_path)
+    ensure_dir(temp_dir)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=temp_dir, prefix=".upload-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise FileTooLargeError(f"exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+        ensure_dir(os.path.dirname(dest_path))
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return size, digest.hexdigest()
@@ -0,0 +1,361 @@
+"""Cross-process quota manager for Gemini requests-per-minute / tokens-per-minute.
+
+Token buckets live in a small SQLite database (data/quota.db by default), so
+every uvicorn worker, background task and ingest worker shares one view of the
+remaining budget. Each bucket is keyed by model id. Updates run inside
+``BEGIN IMMEDIATE`` transactions, which serialize concurrent writers across
+processes.
+
+A 429 anywhere calls ``report_rate_limit`` which pauses the bucket for the
+server-provided "retry in Xs" delay; every process then waits in ``acquire``
+instead of sending requests that are guaranteed to fail.
+
+Requests are scheduled in priority lanes:
+
+- ``interactive`` (chat) may use the whole bucket and marks chat as active.
+- ``background`` (upload summarization) leaves a reserve of the bucket for
+  interactive calls, and a larger one while chat traffic is active.
+- ``batch`` (bulk ingest) leaves an even larger reserve and pauses entirely
+  while chat traffic is active.
+
+Because the reserve is enforced in the shared bucket, a waiting chat request
+effectively jumps ahead of background work in every process. The lane defaults
+to the one set with ``use_lane`` (``background`` if none).
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Gemini bills an image as a fixed number of input tokens
+_IMAGE_TOKENS = 258
+# Longest single sleep inside acquire; we re-check the shared state after it
+_MAX_SLEEP_SLICE = 5.0
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+BATCH = "batch"
+LANES = (INTERACTIVE, BACKGROUND, BATCH)
+
+_current_lane: contextvars.ContextVar[str] = contextvars.ContextVar("quota_lane", default=BACKGROUND)
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized_paths: set[str] = set()
+
+
+def _db_path() -> str:
+    return settings.quota_db_path or os.path.join(settings.data_dir, "quota.db")
+
+
+def _connect() -> sqlite3.Connection:
+    """Return this thread's connection to the quota database."""
+    path = _db_path()
+    conns: Dict[str, sqlite3.Connection] = getattr(_local, "conns", None) or {}
+    _local.conns = conns
+    conn = conns.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=30000")
+        with _init_lock:
+            if path not in _initialized_paths:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS quota_buckets (
+                        bucket TEXT PRIMARY KEY,
+                        requests REAL NOT NULL,
+                        tokens REAL NOT NULL,
+                        updated_at REAL NOT NULL,
+                        paused_until REAL NOT NULL DEFAULT 0,
+                        requests_total INTEGER NOT NULL DEFAULT 0,
+                        tokens_total INTEGER NOT NULL DEFAULT 0,
+                        rate_limits_total INTEGER NOT NULL DEFAULT 0,
+                        interactive_until REAL NOT NULL DEFAULT 0
+                    )
+                    """
+                )
+                columns = [row[1] for row in conn.execute("PRAGMA table_info(quota_buckets)")]
+                if "interactive_until" not in columns:
+                    conn.execute("ALTER TABLE quota_buckets ADD COLUMN interactive_until REAL NOT NULL DEFAULT 0")
+                _initialized_paths.add(path)
+        conns[path] = conn
+    return conn
+
+
+def _limits(model_id: str) -> tuple[float, float]:
+    """(requests per minute, tokens per minute) for a model id."""
+    override = settings.quota_model_limits.get(model_id)
+    if override and len(override) >= 2:
+        return float(override[0]), float(override[1])
+    return float(settings.gemini_rpm), float(settings.gemini_tpm)
+
+
+@contextlib.contextmanager
+def use_lane(lane: str) -> Iterator[None]:
+    """Run LLM calls in this context (thread / task) in the given lane."""
+    if lane not in LANES:
+        raise ValueError(f"Unknown quota lane: {lane}")
+    token = _current_lane.set(lane)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+def current_lane() -> str:
+    return _current_lane.get()
+
+
+def _reserve_ratio(lane: str, interactive_active: bool) -> float:
+    """Fraction of the bucket a lane must leave untouched for higher lanes."""
+    if lane == INTERACTIVE:
+        return 0.0
+    if lane == BATCH:
+        return settings.quota_batch_reserve
+    if interactive_active:
+        return settings.quota_active_background_reserve
+    return settings.quota_interactive_reserve
+
+
+def estimate_tokens(payload: Any) -> int:
+    """Rough token estimate for a prompt (~4 chars per token, fixed cost per image)."""
+    if payload is None:
+        return 0
+    if isinstance(payload, str):
+        return max(1, len(payload) // 4)
+    if isinstance(payload, dict):
+        if payload.get("type") == "image_url":
+            return _IMAGE_TOKENS
+        return estimate_tokens(payload.get("text") or "")
+    if isinstance(payload, (list, tuple)):
+        return sum(estimate_tokens(item) for item in payload)
+    content = getattr(payload, "content", None)
+    if content is not None:
+        return estimate_tokens(content)
+    return estimate_tokens(str(payload))
+
+
+def _refill(row: Optional[tuple], model_id: str, now: float) -> tuple[float, float, float]:
+    """Return (requests, tokens, paused_until) after refilling for elapsed time."""
+    rpm, tpm = _limits(model_id)
+    if row is None:
+        return rpm, tpm, 0.0
+    requests, tokens, updated_at, paused_until = row
+    elapsed = max(0.0, now - updated_at)
+    requests = min(rpm, requests + elapsed * rpm / 60.0)
+    tokens = min(tpm, tokens + elapsed * tpm / 60.0)
+    return requests, tokens, paused_until
+
+
+def _try_acquire(model_id: str, tokens_needed: int, lane: str) -> float:
+    """Take one request and tokens_needed tokens if the lane may use them.
+
+    Returns 0.0 on success, otherwise the number of seconds to wait before
+    trying again.
+    """
+    rpm, tpm = _limits(model_id)
+    tokens_needed = min(float(tokens_needed), tpm)  # Oversized prompts would never fit
+    conn = _connect()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT requests, tokens, updated_at, paused_until, interactive_until "
+            "FROM quota_buckets WHERE bucket = ?",
+            (model_id,),
+        ).fetchone()
+        requests, tokens, paused_until = _refill(row[:4] if row else None, model_id, now)
+        interactive_until = row[4] if row else 0.0
+
+        # A chat request marks interactive traffic as active even while it waits,
+        # so background work in every process starts yielding immediately
+        if lane == INTERACTIVE:
+            interactive_until = max(interactive_until, now + settings.quota_interactive_active_s)
+        interactive_active = interactive_until > now
+
+        reserve = _reserve_ratio(lane, interactive_active)
+        # Clamp so tiny limits can't make a lane's floor unreachable
+        requests_floor = min(1.0 + rpm * reserve, max(1.0, rpm))
+        tokens_floor = min(tokens_needed + tpm * reserve, tpm)
+
+        wait = 0.0
+        if paused_until > now:
+            wait = paused_until - now
+        elif lane == BATCH and interactive_active:
+            wait = interactive_until - now
+        elif requests < requests_floor or tokens < tokens_floor:
+            wait = max(
+                (requests_floor - requests) * 60.0 / rpm if requests < requests_floor else 0.0,
+                (tokens_floor - tokens) * 60.0 / tpm if tokens < tokens_floor else 0.0,
+            )
+        else:
+            requests -= 1.0
+            tokens -= tokens_needed
+
+        conn.execute(
+            """
+            INSERT INTO quota_buckets (bucket, requests, tokens, updated_at, paused_until,
+                                       requests_total, tokens_total, interactive_until)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(bucket) DO UPDATE SET
+                requests = excluded.requests,
+                tokens = excluded.tokens,
+                updated_at = excluded.updated_at,
+                requests_total = requests_total + excluded.requests_total,
+                tokens_total = tokens_total + excluded.tokens_total,
+                interactive_until = excluded.interactive_until
+            """,
+            (model_id, requests, tokens, now, paused_until,
+             0 if wait else 1, 0 if wait else int(tokens_needed), interactive_until),
+        )
+        conn.execute("COMMIT")
+        return wait
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _sleep_slice(wait: float) -> float:
+    # Small jitter so processes released by the same pause don't stampede
+    return min(wait, _MAX_SLEEP_SLICE) + random.uniform(0.0, 0.25)
+
+
+def acquire(
+    model_id: str,
+    estimated_tokens: int = 0,
+    timeout: Optional[float] = None,
+    lane: Optional[str] = None,
+) -> float:
+    """Block until the shared budget allows one request for model_id.
+
+    lane defaults to the current context's lane (see use_lane). Returns the
+    total seconds spent waiting. Raises TimeoutError if timeout (seconds)
+    elapses first.
+    """
+    if not settings.quota_enabled:
+        return 0.0
+    lane = lane or current_lane()
+    start = time.monotonic()
+    logged = False
+    while True:
+        wait = _try_acquire(model_id, estimated_tokens, lane)
+        if wait <= 0:
+            return time.monotonic() - start
+        waited = time.monotonic() - start
+        if timeout is not None and waited + wait > timeout:
+            raise TimeoutError(f"Quota for {model_id} not available within {timeout:.1f}s")
+        if not logged and wait > 1.0:
+            logger.info("⏳ Waiting %.1fs for shared %s quota (%s lane)...", wait, model_id, lane)
+            logged = True
+        time.sleep(_sleep_slice(wait))
+
+
+async def acquire_async(
+    model_id: str,
+    estimated_tokens: int = 0,
+    timeout: Optional[float] = None,
+    lane: Optional[str] = None,
+) -> float:
+    """Async variant of acquire(); waits without blocking the event loop."""
+    if not settings.quota_enabled:
+        return 0.0
+    lane = lane or current_lane()
+    start = time.monotonic()
+    while True:
+        wait = await asyncio.to_thread(_try_acquire, model_id, estimated_tokens, lane)
+        if wait <= 0:
+            return time.monotonic() - start
+        waited = time.monotonic() - start
+        if timeout is not None and waited + wait > timeout:
+            raise TimeoutError(f"Quota for {model_id} not available within {timeout:.1f}s")
+        await asyncio.sleep(_sleep_slice(wait))
+
+
+def report_rate_limit(model_id: str, retry_after: Optional[float] = None) -> float:
+    """Pause model_id for every process after a 429. Returns the pause length."""
+    if not settings.quota_enabled:
+        return 0.0
+    pause = retry_after if retry_after and retry_after > 0 else settings.quota_default_pause_s
+    conn = _connect()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT requests, tokens, updated_at, paused_until FROM quota_buckets WHERE bucket = ?",
+            (model_id,),
+        ).fetchone()
+        _, tokens, paused_until = _refill(row, model_id, now)
+        paused_until = max(paused_until, now + pause)
+        conn.execute(
+            """
+            INSERT INTO quota_buckets (bucket, requests, tokens, updated_at, paused_until, rate_limits_total)
+            VALUES (?, 0, ?, ?, ?, 1)
+            ON CONFLICT(bucket) DO UPDATE SET
+                requests = 0,
+                tokens = excluded.tokens,
+                updated_at = excluded.updated_at,
+                paused_until = excluded.paused_until,
+                rate_limits_total = rate_limits_total + 1
+            """,
+            (model_id, tokens, now, paused_until),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    logger.warning("🚦 Quota paused for %s: %.1fs (shared across workers)", model_id, paused_until - now)
+    return paused_until - now
+
+
+def paused_for(model_id: str) -> float:
+    """Seconds until model_id's shared pause ends (0 if not paused)."""
+    if not settings.quota_enabled:
+        return 0.0
+    row = _connect().execute(
+        "SELECT paused_until FROM quota_buckets WHERE bucket = ?", (model_id,)
+    ).fetchone()
+    return max(0.0, row[0] - time.time()) if row else 0.0
+
+
+def remaining(model_id: str) -> Dict[str, Any]:
+    """Current remaining budget for model_id."""
+    rpm, tpm = _limits(model_id)
+    now = time.time()
+    row = _connect().execute(
+        "SELECT requests, tokens, updated_at, paused_until, requests_total, tokens_total, rate_limits_total, "
+        "interactive_until FROM quota_buckets WHERE bucket = ?",
+        (model_id,),
+    ).fetchone()
+    requests, tokens, paused_until = _refill(row[:4] if row else None, model_id, now)
+    return {
+        "model_id": model_id,
+        "rpm": rpm,
+        "tpm": tpm,
+        "requests_remaining": round(requests, 2),
+        "tokens_remaining": int(tokens),
+        "paused_for_seconds": round(max(0.0, paused_until - now), 1),
+        "requests_total": row[4] if row else 0,
+        "tokens_total": row[5] if row else 0,
+        "rate_limits_total": row[6] if row else 0,
+        "interactive_active": bool(row and row[7] > now),
+    }
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    """Remaining budget for every model id seen so far."""
+    rows = _connect().execute("SELECT bucket FROM quota_buckets ORDER BY bucket").fetchall()
+    return {bucket: remaining(bucket) for (bucket,) in rows}
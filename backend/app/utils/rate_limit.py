@@ -5,6 +5,8 @@ import logging
 from typing import Callable, TypeVar, Any, Optional
 from functools import wraps
 
+from app.core.config import settings
+
 logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
@@ -196,6 +198,7 @@ def with_rate_limit_retry(
     max_retries: int = 3,
     default_wait: float = 60.0,
     backoff_multiplier: float = 1.5,
+    shared_quota: bool = False,
 ) -> Callable[[Callable[..., T]], Callable[..., T]]:
     """
     Decorator to automatically retry on rate limit errors with wait time extraction.
@@ -204,6 +207,9 @@ def with_rate_limit_retry(
         max_retries: Maximum number of retry attempts
         default_wait: Default wait time in seconds if wait time cannot be extracted
         backoff_multiplier: Multiplier for exponential backoff on subsequent retries
+        shared_quota: The wrapped call acquires from the shared quota manager
+            (app.utils.quota), which already pauses every process after a 429.
+            Retries then skip the local sleep and wait in acquire() instead.
     
     Usage:
         @with_rate_limit_retry(max_retries=3, default_wait=60.0)
@@ -224,6 +230,13 @@ def with_rate_limit_retry(
                     
                     # Check if it's a rate limit error
                     if is_rate_limit_error(e):
+                        if shared_quota and settings.quota_enabled and attempt < max_retries:
+                            logger.warning(
+                                f"⚠️  Rate limit detected! Waiting on shared quota pause before retry "
+                                f"(attempt {attempt + 1}/{max_retries + 1})"
+                            )
+                            continue
+
                         # Try to extract wait time from error
                         extracted_wait = extract_wait_seconds_from_error(e)
                         
@@ -0,0 +1,53 @@
+"""Token counting for prompt budgeting.
+
+Uses tiktoken's cl100k_base encoding as an approximation of Gemini's tokenizer.
+If the encoding can't be loaded (e.g. no network to fetch it on first use) a
+~4 characters per token estimate is used instead.
+"""
+import logging
+import threading
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+_encoding: Optional[Any] = None
+_encoding_failed = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding() -> Optional[Any]:
+    global _encoding, _encoding_failed
+    if _encoding is not None or _encoding_failed:
+        return _encoding
+    with _encoding_lock:
+        if _encoding is None and not _encoding_failed:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                _encoding_failed = True
+                logger.warning("tiktoken encoding unavailable (%s); using character-based token estimates", e)
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in text (estimated when tiktoken is unavailable)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens tokens."""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[: max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
@@ -0,0 +1,95 @@
+"""Job worker processes for the durable queue.
+
+Usage:
+    python -m app.worker                 # JOB_WORKER_PROCESSES processes
+    python -m app.worker --processes 4
+
+Runs ingestion jobs outside the web process so they don't compete with
+request handling and can be scaled on their own. Set JOB_WORKER_THREADS=0 on
+the web app when dedicated workers are running. SIGINT/SIGTERM let each
+worker finish its current job; a worker killed mid-job loses its lease and
+the job is picked up again.
+"""
+import argparse
+import logging
+import multiprocessing
+import signal
+import threading
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.logging import setup_logging
+
+
+def _run_worker(index: int) -> None:
+    setup_logging()
+    from app.services import ingest_service  # noqa: F401  (registers the ingest handler)
+    from app.services.job_queue import new_worker_id, work
+    from app.services.warmup_service import STEP_EMBEDDING, STEP_LAYOUT_MODELS, run_warmup
+
+    if settings.warmup_enabled:
+        # Load what the first job would otherwise wait for
+        run_warmup([STEP_EMBEDDING] + ([STEP_LAYOUT_MODELS] if settings.warmup_layout_models else []))
+
+    stop = threading.Event()
+
+    def _request_stop(signum, frame) -> None:
+        logging.info("Stop requested; finishing the current job first")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+    work(new_worker_id(f"proc{index}"), stop)
+
+
+def warn_if_embedded_chroma() -> None:
+    if not settings.chroma_host:
+        logging.warning("CHROMA_HOST is not set: workers and the web app would each open the embedded "
+                        "Chroma store, which is not safe across processes. Run a Chroma server and set CHROMA_HOST.")
+
+
+def spawn_workers(count: int) -> List[multiprocessing.Process]:
+    """Start `count` worker processes (spawned, so each opens its own DB and Chroma connections)."""
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=_run_worker, args=(i,), name=f"job-worker-{i}") for i in range(count)]
+    for process in processes:
+        process.start()
+    logging.info("👷 Started %d job worker processes", count)
+    return processes
+
+
+def stop_workers(processes: List[multiprocessing.Process]) -> None:
+    """Ask workers to stop after their current job."""
+    for process in processes:
+        if process.is_alive():
+            process.terminate()  # Children treat SIGTERM as "stop after the current job"
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run job queue workers")
+    parser.add_argument("--processes", type=int, default=None,
+                        help=f"worker processes (default JOB_WORKER_PROCESSES={settings.job_worker_processes})")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    from app.db.init_db import init_db, init_directories
+
+    init_directories()
+    init_db()
+    warn_if_embedded_chroma()
+
+    count = max(1, args.processes or settings.job_worker_processes)
+    if count == 1:
+        _run_worker(0)
+        return
+
+    processes = spawn_workers(count)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_workers(processes))
+    # Ctrl+C reaches the children directly (same process group)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
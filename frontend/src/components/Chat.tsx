@@ -110,7 +110,11 @@ export function Chat({ sessionId, activeDocumentId, onNewChat }: ChatProps) {
 
   const fetchSourcesForMessage = useCallback(
     async (assistantId: string, question: string) => {
-      if (sourcesFetchedRef.current) return;
+      if (sourcesFetchedRef.current) {
+        // Sources already arrived on the stream's "sources" event
+        setIsLoading(false);
+        return;
+      }
       sourcesFetchedRef.current = true;
 
       try {
@@ -337,6 +341,21 @@ export function Chat({ sessionId, activeDocumentId, onNewChat }: ChatProps) {
       }
     });
 
+    // Sources are sent before the first token
+    es.addEventListener("sources", (evt) => {
+      try {
+        const sources = JSON.parse(evt.data);
+        sourcesFetchedRef.current = true;
+        if (currentAssistantIdRef.current === assistantId) {
+          setMessages((prev) =>
+            prev.map((m) => (m.id === assistantId ? { ...m, sources } : m))
+          );
+        }
+      } catch (e) {
+        console.error("Failed to parse sources event", e);
+      }
+    });
+
     es.addEventListener("end", () => {
       es.close();
       eventSourceRef.current = null;
@@ -1,5 +1,5 @@
 import { useState } from "react";
-import { useQuery, useQueryClient } from "@tanstack/react-query";
+import { useInfiniteQuery, useQueryClient } from "@tanstack/react-query";
 import { fetchChatSessions, deleteChatSession, generateSessionId, setSessionId } from "@/lib/api";
 import { MessageSquare, Plus, Trash2, AlertCircle, AlertTriangle } from "lucide-react";
 import { Button } from "@/components/ui/button";
@@ -37,13 +37,15 @@ export function SidebarChats({
   const [sessionToDelete, setSessionToDelete] = useState<string | null>(null);
   const [sessionTitle, setSessionTitle] = useState<string>("");
   
-  const { data, isLoading, error } = useQuery({
+  const { data, isLoading, error, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
     queryKey: ["chat-sessions"],
-    queryFn: fetchChatSessions,
+    queryFn: ({ pageParam }) => fetchChatSessions(pageParam),
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage.next_cursor,
     refetchInterval: 30000, // Refetch every 30 seconds
   });
 
-  const sessions = data?.sessions || [];
+  const sessions = data?.pages.flatMap((page) => page.sessions) || [];
 
   const handleDeleteClick = (sessionId: string, sessionTitle: string, e: React.MouseEvent) => {
     e.stopPropagation();
@@ -177,6 +179,18 @@ export function SidebarChats({
               </div>
             </Card>
           ))}
+
+          {hasNextPage && (
+            <Button
+              variant="ghost"
+              size="sm"
+              className="w-full text-muted-foreground"
+              onClick={() => fetchNextPage()}
+              disabled={isFetchingNextPage}
+            >
+              {isFetchingNextPage ? "Loading..." : "Load more"}
+            </Button>
+          )}
         </div>
       </ScrollArea>
 
@@ -1,7 +1,7 @@
 import { useState } from "react";
 import { useQuery, useQueryClient } from "@tanstack/react-query";
-import { fetchDocuments, deleteDocumentById } from "@/lib/api";
-import { FileText, Upload, AlertCircle, Trash2, Loader2, XCircle, AlertTriangle } from "lucide-react";
+import { fetchDocuments, deleteDocumentById, cancelDocumentProcessing } from "@/lib/api";
+import { FileText, Upload, AlertCircle, Trash2, Loader2, XCircle, AlertTriangle, Ban } from "lucide-react";
 import { Button } from "@/components/ui/button";
 import { Card } from "@/components/ui/card";
 import { ScrollArea } from "@/components/ui/scroll-area";
@@ -81,6 +81,23 @@ export function SidebarDocuments({ activeDocumentId, onSelectDocument }: Sidebar
     }
   };
 
+  const handleCancelClick = async (docId: string, docName: string) => {
+    try {
+      await cancelDocumentProcessing(docId);
+      await queryClient.invalidateQueries({ queryKey: ["documents"] });
+      toast({
+        title: "Processing Cancelled",
+        description: `Stopped processing "${docName}".`,
+      });
+    } catch (err) {
+      toast({
+        title: "Cancel Failed",
+        description: err instanceof Error ? err.message : "Failed to cancel processing. Please try again.",
+        variant: "destructive",
+      });
+    }
+  };
+
   // Get status icon and badge
   const getStatusIndicator = (status?: string) => {
     switch (status) {
@@ -226,22 +243,18 @@ export function SidebarDocuments({ activeDocumentId, onSelectDocument }: Sidebar
                   variant="ghost"
                   size="icon"
                   className="absolute right-0 top-0 h-7 w-7 opacity-80 hover:opacity-100 hover:text-destructive hover:bg-destructive/10 transition-all shrink-0 z-10 flex-shrink-0"
-                  disabled={isProcessing}
                   onClick={(e) => {
                     if (isProcessing) {
-                      toast({
-                        title: "Processing",
-                        description: "Cannot delete a document that is currently processing.",
-                        variant: "default",
-                      });
+                      e.stopPropagation();
+                      handleCancelClick(doc.id, doc.name);
                       return;
                     }
                     handleDeleteClick(doc.id, doc.name, e);
                   }}
-                  aria-label="Delete document"
-                  title={isProcessing ? "Cannot delete while processing" : "Delete document"}
+                  aria-label={isProcessing ? "Cancel processing" : "Delete document"}
+                  title={isProcessing ? "Cancel processing" : "Delete document"}
                 >
-                  <Trash2 className={cn("h-4 w-4", isProcessing && "opacity-50")} />
+                  {isProcessing ? <Ban className="h-4 w-4" /> : <Trash2 className="h-4 w-4" />}
                 </Button>
               </div>
             </Card>
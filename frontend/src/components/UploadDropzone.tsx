@@ -1,6 +1,6 @@
 import { useState, useEffect, useRef } from "react";
 import { useDropzone } from "react-dropzone";
-import { uploadDocument, getUploadStatus } from "@/lib/api";
+import { uploadDocument, getUploadStatus, buildUploadEventsUrl, UploadProgressEvent } from "@/lib/api";
 import { Card } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
 import { Progress } from "@/components/ui/progress";
@@ -8,24 +8,101 @@ import { Upload, CheckCircle2, XCircle } from "lucide-react";
 import { useToast } from "@/hooks/use-toast";
 import { useNavigate } from "react-router-dom";
 
+const STAGE_LABELS: Record<string, string> = {
+  queued: "Waiting to start...",
+  parsing: "Parsing PDF...",
+  summarizing: "Summarizing",
+  saving: "Saving summaries...",
+  indexing: "Indexing...",
+  completed: "Completed",
+};
+
+function stageLabel(event: UploadProgressEvent): string {
+  let label = STAGE_LABELS[event.stage] || "Processing...";
+  if (event.stage === "summarizing") {
+    label += event.total ? ` ${event.done ?? 0}/${event.total} chunks` : "...";
+  }
+  if (event.eta_s != null && event.eta_s > 0) {
+    const eta = event.eta_s >= 60 ? `${Math.round(event.eta_s / 60)} min` : `${Math.round(event.eta_s)}s`;
+    label += ` · ~${eta} left`;
+  }
+  return label;
+}
+
 export function UploadDropzone() {
   const [isUploading, setIsUploading] = useState(false);
   const [uploadedFile, setUploadedFile] = useState<string | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [progress, setProgress] = useState<number>(0);
+  const [stage, setStage] = useState<UploadProgressEvent | null>(null);
   const pollIntervalRef = useRef<NodeJS.Timeout | null>(null);
+  const eventSourceRef = useRef<EventSource | null>(null);
   const { toast } = useToast();
   const navigate = useNavigate();
 
-  // Cleanup polling on unmount
+  // Cleanup polling / event stream on unmount
   useEffect(() => {
     return () => {
       if (pollIntervalRef.current) {
         clearInterval(pollIntervalRef.current);
       }
+      eventSourceRef.current?.close();
     };
   }, []);
 
+  const onProcessingDone = (name: string) => {
+    setIsUploading(false);
+    setError(null); // Clear any errors
+    setUploadedFile(name);
+    setProgress(100);
+    toast({
+      title: "Upload completed",
+      description: `${name} has been processed successfully`,
+    });
+    setTimeout(() => navigate("/"), 2000);
+  };
+
+  const onProcessingFailed = () => {
+    setIsUploading(false);
+    setUploadedFile(null); // Clear success message
+    setError("Upload processing failed. Check backend logs for details.");
+    setProgress(0);
+    toast({
+      title: "Upload failed",
+      description: "Processing failed. Please check your API configuration.",
+      variant: "destructive",
+    });
+  };
+
+  // Progress is pushed by the backend; fall back to polling if the stream fails
+  const startEvents = (uploadId: string, name: string) => {
+    eventSourceRef.current?.close();
+    const es = new EventSource(buildUploadEventsUrl(uploadId));
+    eventSourceRef.current = es;
+
+    es.addEventListener("progress", (e) => {
+      const event: UploadProgressEvent = JSON.parse((e as MessageEvent).data);
+      setProgress(event.percent || 0);
+      setStage(event);
+      if (event.status === "completed" || event.status === "failed" || event.status === "cancelled") {
+        es.close();
+        eventSourceRef.current = null;
+        if (event.status === "completed") {
+          onProcessingDone(name);
+        } else {
+          onProcessingFailed();
+        }
+      }
+    });
+
+    es.onerror = () => {
+      if (eventSourceRef.current !== es) return;
+      es.close();
+      eventSourceRef.current = null;
+      startPolling(uploadId);
+    };
+  };
+
   const startPolling = (uploadId: string) => {
     // Clear any existing polling
     if (pollIntervalRef.current) {
@@ -38,33 +115,17 @@ export function UploadDropzone() {
         setProgress(status.progress || 0);
 
         if (status.status === "completed") {
-          setIsUploading(false);
-          setError(null); // Clear any errors
-          setUploadedFile(status.name);
-          setProgress(100);
           if (pollIntervalRef.current) {
             clearInterval(pollIntervalRef.current);
             pollIntervalRef.current = null;
           }
-          toast({
-            title: "Upload completed",
-            description: `${status.name} has been processed successfully`,
-          });
-          setTimeout(() => navigate("/"), 2000);
-        } else if (status.status === "failed") {
-          setIsUploading(false);
-          setUploadedFile(null); // Clear success message
-          setError("Upload processing failed. Check backend logs for details.");
-          setProgress(0);
+          onProcessingDone(status.name);
+        } else if (status.status === "failed" || status.status === "cancelled") {
           if (pollIntervalRef.current) {
             clearInterval(pollIntervalRef.current);
             pollIntervalRef.current = null;
           }
-          toast({
-            title: "Upload failed",
-            description: "Processing failed. Please check your API configuration.",
-            variant: "destructive",
-          });
+          onProcessingFailed();
         }
       } catch (err) {
         // Stop polling on error
@@ -95,6 +156,7 @@ export function UploadDropzone() {
     setIsUploading(true);
     setError(null);
     setProgress(0);
+    setStage(null);
 
     try {
       const document = await uploadDocument(file);
@@ -118,7 +180,7 @@ export function UploadDropzone() {
           title: "Upload started",
           description: `${document.name} is being processed...`,
         });
-        startPolling(document.id);
+        startEvents(document.id, document.name);
       }
     } catch (err) {
       const errorMessage = err instanceof Error ? err.message : "Failed to upload file";
@@ -194,7 +256,9 @@ export function UploadDropzone() {
             <Progress value={progress} className="h-2" />
             <div className="flex items-center justify-between text-xs text-muted-foreground">
               <span>
-                {progress < 10 
+                {stage
+                  ? stageLabel(stage)
+                  : progress < 10 
                   ? "Parsing PDF..." 
                   : progress < 30 
                     ? "Summarizing images..." 
@@ -38,6 +38,13 @@ export async function deleteDocumentById(id: string): Promise<{ ok: boolean }> {
   return handleResponse(response);
 }
 
+export async function cancelDocumentProcessing(id: string): Promise<{ ok: boolean; status: string }> {
+  const response = await fetch(`${API_BASE}/api/documents/${id}/cancel`, {
+    method: "POST",
+  });
+  return handleResponse(response);
+}
+
 export async function uploadDocument(file: File): Promise<Document> {
   const formData = new FormData();
   formData.append("file", file);
@@ -55,10 +62,28 @@ export async function getUploadStatus(documentId: string): Promise<Document> {
     return handleResponse(response);
 }
 
+export interface UploadProgressEvent {
+  doc_id: string;
+  status: string; // processing, completed, failed, cancelled
+  stage: string; // parsing, summarizing, saving, indexing, completed, failed, cancelled
+  percent: number;
+  done: number | null;
+  total: number | null;
+  eta_s: number | null;
+  elapsed_s: number | null;
+  counts: { texts?: number; tables?: number; images?: number };
+  error?: string;
+}
+
+export function buildUploadEventsUrl(documentId: string): string {
+  return `${API_BASE}/api/upload/events/${documentId}`;
+}
+
 export interface ChatRequest {
   question: string;
   sessionId: string;
   documentId?: string;
+  documentIds?: string[];  // Compare several documents
   includeImages?: boolean;
   stream?: boolean;
 }
@@ -96,6 +121,7 @@ export function buildStreamUrl(params: {
   question: string;
   sessionId: string;
   documentId?: string;
+  documentIds?: string[];
   includeImages?: boolean;
 }): string {
   const base = API_BASE;
@@ -103,6 +129,7 @@ export function buildStreamUrl(params: {
   url.searchParams.set("question", params.question);
   url.searchParams.set("sessionId", params.sessionId);
   if (params.documentId) url.searchParams.set("documentId", params.documentId);
+  params.documentIds?.forEach((id) => url.searchParams.append("documentIds", id));
   if (params.includeImages !== undefined) url.searchParams.set("includeImages", String(params.includeImages));
   return url.toString();
 }
@@ -140,8 +167,15 @@ export interface ChatSession {
   message_count: number;
 }
 
-export async function fetchChatSessions(): Promise<{ sessions: ChatSession[] }> {
-  const response = await fetch(`${API_BASE}/api/chat/sessions`);
+export interface ChatSessionPage {
+  sessions: ChatSession[];
+  next_cursor: string | null;
+}
+
+export async function fetchChatSessions(cursor?: string | null, limit = 50): Promise<ChatSessionPage> {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (cursor) params.set("cursor", cursor);
+  const response = await fetch(`${API_BASE}/api/chat/sessions?${params.toString()}`);
   return handleResponse(response);
 }
 
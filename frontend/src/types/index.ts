@@ -25,6 +25,12 @@ export interface Document {
   status?: string; // processing, completed, failed
   progress?: number; // 0-100 percentage
   createdAt: string;
+  stats?: {
+    texts: number;
+    tables: number;
+    images: { total: number; kept?: number; skipped?: number; resized?: number; bytes_in?: number; bytes_out?: number };
+    timings_s: { parsing: number; summarizing: number; indexing: number; total: number };
+  } | null;
 }
 
 export interface ChatSettings {